@@ -0,0 +1,82 @@
+from typing import Callable, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+# Tool calls of one turn run concurrently on this many threads
+TOOL_WORKERS = int(os.getenv('TOOL_WORKERS', 4))
+
+class ToolRegistry:
+    """Functions the chat agent can call, with their OpenAI tool schemas.
+
+    Tool functions take the caller's context dict (e.g. {'user_id': ...})
+    followed by the model's arguments as keywords, and return something JSON
+    serializable.
+    """
+
+    def __init__(self, workers: int = TOOL_WORKERS):
+        self._tools = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='agent-tool')
+
+    def register(self, name: str, description: str, parameters: Dict) -> Callable:
+        def decorator(function: Callable) -> Callable:
+            schema = {'type': 'function',
+                      'function': {'name': name, 'description': description, 'parameters': parameters}}
+            self._tools[name] = (schema, function)
+            return function
+        return decorator
+
+    def schemas(self) -> List[Dict]:
+        return [schema for schema, _ in self._tools.values()]
+
+    def call(self, name: str, arguments: str, context: Dict) -> str:
+        """Runs one tool call and returns its result as JSON.
+
+        Errors are returned to the model as {'error': message} rather than
+        raised, so it can correct the call or explain the failure.
+        """
+        if name not in self._tools:
+            return json.dumps({'error': f"Unknown tool '{name}'"})
+        try:
+            kwargs = json.loads(arguments or '{}')
+            result = self._tools[name][1](context, **kwargs)
+        except Exception as e:
+            return json.dumps({'error': f"{type(e).__name__}: {e}"})
+        return json.dumps(result, default=str)
+
+    def execute(self, tool_calls: List[Dict], context: Dict) -> List[Dict]:
+        """Runs the tool calls of one assistant message concurrently.
+
+        Returns:
+            List[Dict]: one 'tool' role message per call, in call order
+        """
+        futures = [self._pool.submit(self.call, c['function']['name'], c['function']['arguments'], context)
+                   for c in tool_calls]
+        return [{'role': 'tool', 'tool_call_id': c['id'], 'content': f.result()}
+                for c, f in zip(tool_calls, futures)]
+
+class ToolCallAssembler:
+    """Rebuilds tool calls from streamed deltas.
+
+    The first delta of each call carries its id and function name, later ones
+    only the call's index and a fragment of the JSON arguments.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    def feed(self, deltas) -> None:
+        for delta in deltas:
+            call = self._calls.setdefault(delta.index, {'id': '', 'type': 'function',
+                                                        'function': {'name': '', 'arguments': ''}})
+            if delta.id:
+                call['id'] = delta.id
+            if delta.function is not None:
+                call['function']['name'] += delta.function.name or ''
+                call['function']['arguments'] += delta.function.arguments or ''
+
+    def tool_calls(self) -> List[Dict]:
+        return [self._calls[index] for index in sorted(self._calls)]
+
+    def __bool__(self):
+        return bool(self._calls)
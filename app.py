@@ -1,11 +1,36 @@
 from typing import Dict, List
+from contextlib import aclosing
+import asyncio
+import gzip
 import os
+import time
 import json
-from flask import Flask, render_template, request, jsonify, Response, stream_with_context, session
+import numpy as np
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, session, g
 from dotenv import load_dotenv
 from openai import OpenAI
 from tenacity import retry, wait_random_exponential, stop_after_attempt
 
+import backtest
+import sweep
+import robustness
+from data_store import CandleStore
+from resample import Resampler, TIMEFRAME_SECONDS
+from indicators import SeriesIndicators, series_key, indicator_cache
+from strategy import StrategyCache, StrategyError
+from strategy_store import StrategyStore
+from conversation_store import create_conversation_store
+from response_cache import ResponseCache
+from result_store import ResultStore, equity_points, trade_page
+from agent_tools import ToolRegistry, ToolCallAssembler
+from automation import AutomationEngine, StrategyRunner, replay_feed
+from market_data import MarketDataBus, synthetic_ticks
+from strategy_generation import (SyncCompletions, run_sync, iterate_sync, generate_single_pass,
+                                 generate_strategy_events)
+import context_window
+import metrics
+import sse
+
 # Load environment variables once
 load_dotenv()
 
@@ -15,34 +40,99 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY")
 STRATEGIES_DIR = 'user_strategies'
 os.makedirs(STRATEGIES_DIR, exist_ok=True)
 
+# Strategies live in SQLite; legacy {user_id}_strategies.json files are imported once
+strategy_store = StrategyStore(os.path.join(STRATEGIES_DIR, 'strategies.db'))
+strategy_store.migrate_legacy_files(STRATEGIES_DIR)
+
+CANDLES_DIR = 'data'
+candle_store = CandleStore(CANDLES_DIR)
+# Serves 4h/1d (and other coarser) series aggregated incrementally from finer stored data
+resampler = Resampler(candle_store)
+# Stored strategies compiled once per stored version
+compiled_strategies = StrategyCache(strategy_store)
+
 GPT_MODEL = 'gpt-4o-mini'
 STREAM = True
-
-# Initialize the OpenAI client once
+# Follow-up completions allowed after tool calls in one turn; the last one can't call tools
+MAX_TOOL_ROUNDS = 3
+# Token budget for the messages sent to the model each turn; older turns are summarized
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 4000))
+
+# Agent conversations are kept server-side; the session cookie only holds the conversation id.
+# Use the sqlite backend when running more than one worker process.
+conversation_store = create_conversation_store(
+    backend=os.getenv('CONVERSATION_BACKEND', 'memory'),
+    path=os.getenv('CONVERSATION_DB', 'conversations.db'),
+    ttl_seconds=int(os.getenv('CONVERSATION_TTL_SECONDS', 7 * 24 * 60 * 60)))
+
+# Non-streaming completions are replayed from here for identical requests (TTL 0 = no expiry)
+response_cache = ResponseCache(
+    os.getenv('RESPONSE_CACHE_DB', 'response_cache.db'),
+    max_bytes=int(os.getenv('RESPONSE_CACHE_BYTES', 64 * 1024 * 1024)),
+    ttl_seconds=float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 0)) or None)
+
+# Backtest results, so the results panel can fetch a downsampled equity curve and pages of trades
+result_store = ResultStore(os.getenv('RESULTS_DB', 'results.db'),
+                           max_bytes=int(os.getenv('RESULTS_MAX_BYTES', 256 * 1024 * 1024)))
+# JSON responses at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = 1024
+
+# Initialize the OpenAI client once (OPENAI_BASE_URL points it at another server, e.g. a local mock)
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+def completion_kwargs(messages: List[Dict], tools: List[Dict] = None, tool_choice: str = None, model: str = GPT_MODEL, stream: bool = STREAM) -> Dict:
+    # Arguments for client.chat.completions.create, shared by the sync and async clients
+    kwargs = {'model': model, 'messages': messages, 'stream': stream}
+    if tools:
+        kwargs['tools'] = tools
+        kwargs['tool_choice'] = tool_choice or 'auto'
+    return kwargs
+
+def create_completion(kwargs: Dict):
+    # Non-streaming client.chat.completions.create through the response cache
+    response = response_cache.lookup(kwargs)
+    if response is None:
+        response = client.chat.completions.create(**kwargs)
+        response_cache.store(kwargs, response)
+    return response
+
 # Retry decorator for API calls to handle temporary failures
-@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(3))
+@retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(3),
+       before_sleep=metrics.count_retry, reraise=True)
+def _chat_completion(kwargs: Dict):
+    if kwargs['stream']:
+        return client.chat.completions.create(**kwargs)  # Stream responses return an iterator
+    return create_completion(kwargs)
+
 def chat_completion_request(messages: List[Dict], tools: List[Dict] = None, tool_choice: str = None, model: str = GPT_MODEL, stream: bool = STREAM):
+    # Failures are returned rather than raised, once the retries are used up
     try:
-        kwargs = {'model': model, 'messages': messages, 'stream': stream}
-        if tools:
-            kwargs['tools'] = tools
-            kwargs['tool_choice'] = tool_choice
-        response = client.chat.completions.create(**kwargs)
-        if stream:
-            return response  # Stream responses return an iterator
-        return response
+        return _chat_completion(completion_kwargs(messages, tools, tool_choice, model, stream))
     except Exception as e:
+        metrics.LLM_ERRORS.inc(client='sync')
         print('Unable to generate ChatCompletion response')
         print(f'Exception: {e}')
         return e
 
 class Agent:
-    def __init__(self, model: str = GPT_MODEL, system_prompt: Dict = None, tools: List[Dict] = None):
+    def __init__(self, model: str = GPT_MODEL, system_prompt: Dict = None, tools: List[Dict] = None,
+                 context_budget: int = CONTEXT_TOKEN_BUDGET):
         self.model = model
         self.memory = []
         self.tools = tools if tools else []
+        self.context_budget = context_budget
+        # Id in the conversation store, set by open_agent
+        self.conversation_id = None
+        # Passed to tool functions, e.g. {'user_id': ...}; set per request
+        self.tool_context = {}
+        # Running summary of the memory entries before summarized_length (not counting the system prompt)
+        self.summary = ''
+        self.summarized_length = 0
+        # Number of memory entries, and summarized entries, already persisted to the conversation store
+        self.saved_length = 0
+        self.saved_summary_length = 0
+        # perf_counter() when the current turn started, until its first token is streamed
+        self.turn_started = None
         if system_prompt:
             self.append_to_memory(system_prompt)
 
@@ -58,344 +148,389 @@ class Agent:
 
     def invoke(self, message: str):
         # Add user message to memory and make API call
+        return chat_completion_request(messages=self.prepare(message), tools=self.tools, model=self.model, stream=STREAM)
+
+    def prepare(self, message: str) -> List[Dict]:
+        # Add user message to memory and return the messages to send for it
+        self.turn_started = time.perf_counter()
         self.append_to_memory({'role': 'user', 'content': message})
-        return chat_completion_request(messages=self.memory, tools=self.tools, model=self.model, stream=STREAM)
+        return self.build_context()
+
+    def build_context(self) -> List[Dict]:
+        """Returns the messages to send: system prompt, running summary and the latest turns.
+
+        When the unsummarized turns outgrow the token budget, the oldest are rolled
+        into the summary until the rest fit in a fraction of the budget, so the
+        summary call happens every few turns and request size stays flat.
+        """
+        system = self.memory[:1] if self.memory and self.memory[0]['role'] == 'system' else []
+        history = self.memory[len(system):]
+        recent = history[self.summarized_length:]
+        available = self.context_budget - context_window.count_tokens(system)
+        if self.summary:
+            available -= context_window.count_message_tokens(context_window.summary_message(self.summary))
+
+        if context_window.count_tokens(recent) > available:
+            keep_from = self.summarized_length + context_window.fit_suffix(
+                recent, int(available * context_window.LOW_WATERMARK))
+            # Never split a tool result from the assistant message that requested it
+            while keep_from < len(history) and history[keep_from]['role'] == 'tool':
+                keep_from += 1
+            summary = self._summarize(history[self.summarized_length:keep_from])
+            if summary is not None:
+                self.summary = summary
+                self.summarized_length = keep_from
+            # If summarizing failed, the older turns are still left out of this request
+            recent = history[keep_from:]
+
+        context = list(system)
+        if self.summary:
+            context.append(context_window.summary_message(self.summary))
+        return context + recent
+
+    def _summarize(self, messages: List[Dict]):
+        response = chat_completion_request(messages=context_window.summary_request(self.summary, messages),
+                                           model=self.model, stream=False)
+        if isinstance(response, Exception):
+            return None
+        return response.choices[0].message.content
+
+    @staticmethod
+    def _chunk_content(chunk, tool_calls: ToolCallAssembler):
+        # Text carried by a streamed chunk, None if it has none; tool call fragments go to the assembler
+        if not chunk.choices:
+            return None
+        delta = chunk.choices[0].delta
+        if getattr(delta, 'tool_calls', None):
+            tool_calls.feed(delta.tool_calls)
+        return getattr(delta, 'content', None)
+
+    def _run_tool_calls(self, content: str, tool_calls: List[Dict]) -> None:
+        # Record the assistant's tool calls, run them concurrently and record their results
+        self.append_to_memory({'role': 'assistant', 'content': content or None, 'tool_calls': tool_calls})
+        for message in tool_registry.execute(tool_calls, self.tool_context):
+            self.append_to_memory(message)
+
+    def _record_first_token(self) -> None:
+        if self.turn_started is not None:
+            metrics.TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - self.turn_started, route='/chat')
+            self.turn_started = None
+
+    def _follow_up_tool_choice(self, tool_round: int) -> str:
+        return 'none' if tool_round == MAX_TOOL_ROUNDS - 1 else 'auto'
 
     def _handle_stream_response(self, response) -> str:
-        # Process streaming response from API
-        final_response = ""
-        for chunk in response:
-            if hasattr(chunk.choices[0].delta, 'content'):
-                chunk_content = chunk.choices[0].delta.content
-                if chunk_content is not None:
-                    final_response += chunk_content
-                    yield f"data: {chunk_content}\n\n" # Format for server-sent events
-            # TODO: Implement tool calls handling for streaming responses
-            elif hasattr(chunk.choices[0].delta, 'tool_calls'):
-                print("Tool call detected in stream response:", chunk.choices[0].delta.tool_calls)
+        # Process streaming response from API as server-sent events, several tokens per frame
+        return sse.stream_events(self._stream_text(response))
+
+    def _stream_text(self, response):
+        # Yields the reply text; tool calls are run and the follow-up streamed as part of the same reply
+        for tool_round in range(MAX_TOOL_ROUNDS + 1):
+            parts = []
+            tool_calls = ToolCallAssembler()
+            for chunk in response:
+                chunk_content = self._chunk_content(chunk, tool_calls)
+                if chunk_content:
+                    self._record_first_token()
+                    parts.append(chunk_content)
+                    yield chunk_content
+            final_response = ''.join(parts)
+            if not tool_calls:
+                break
+            self._run_tool_calls(final_response, tool_calls.tool_calls())
+            response = chat_completion_request(messages=self.build_context(), tools=self.tools,
+                                               tool_choice=self._follow_up_tool_choice(tool_round), model=self.model,
+                                               stream=True)
+            if isinstance(response, Exception):
+                final_response = "Unable to complete the response after running tools."
+                yield final_response
+                break
         # Add complete response to agent's memory
         self.append_to_memory({'role': 'assistant', 'content': final_response})
-        yield "data: [DONE]\n\n" # Signal end of stream
+
+    def _handle_async_stream_response(self, response, follow_up):
+        """Same as _handle_stream_response for a stream from the async client.
+
+        Args:
+            response: async iterator of chunks
+            follow_up: follow_up(messages, tool_choice) returns the async chunk iterator for a follow-up completion
+        """
+        return sse.astream_events(self._astream_text(response, follow_up))
+
+    async def _astream_text(self, response, follow_up):
+        for tool_round in range(MAX_TOOL_ROUNDS + 1):
+            parts = []
+            tool_calls = ToolCallAssembler()
+            try:
+                # Closed with the reply, so a client that goes away also ends the LLM stream
+                async with aclosing(response) as chunks:
+                    async for chunk in chunks:
+                        chunk_content = self._chunk_content(chunk, tool_calls)
+                        if chunk_content:
+                            self._record_first_token()
+                            parts.append(chunk_content)
+                            yield chunk_content
+            except Exception as e:
+                # The first completion's errors are reported by the caller; a failed follow-up
+                # ends the reply as in _stream_text, keeping the tool messages already recorded
+                if not tool_round:
+                    raise
+                metrics.LLM_ERRORS.inc(client='async')
+                print(f'Exception: {e}')
+                final_response = "Unable to complete the response after running tools."
+                yield final_response
+                break
+            final_response = ''.join(parts)
+            if not tool_calls:
+                break
+            await asyncio.to_thread(self._run_tool_calls, final_response, tool_calls.tool_calls())
+            messages = await asyncio.to_thread(self.build_context)
+            response = follow_up(messages, self._follow_up_tool_choice(tool_round))
+        self.append_to_memory({'role': 'assistant', 'content': final_response})
 
     def _handle_non_stream_response(self, response) -> str:
-        # Process non-streaming response from API
-        if response.choices[0].finish_reason == 'stop':
-            chat_response_message = response.choices[0].message.content
-            self.append_to_memory({'role': 'assistant', 'content': chat_response_message})
-            return chat_response_message
-        elif response.choices[0].finish_reason == 'tool_calls':
-            # TODO: Implement tool calls handling for non-streaming responses
-            print("Tool call detected in non-stream response:", response.choices[0].message.tool_calls)
-            return "Tool call detected. This functionality is not yet implemented."
+        # Process non-streaming response from API, running tool calls until the model answers
+        for tool_round in range(MAX_TOOL_ROUNDS + 1):
+            if isinstance(response, Exception):
+                return "Unable to complete the response after running tools."
+            if response.choices[0].finish_reason != 'tool_calls':
+                break
+            message = response.choices[0].message
+            self._run_tool_calls(message.content, [call.model_dump() for call in message.tool_calls])
+            response = chat_completion_request(messages=self.build_context(), tools=self.tools,
+                                               tool_choice=self._follow_up_tool_choice(tool_round), model=self.model,
+                                               stream=False)
+        chat_response_message = response.choices[0].message.content
+        self.append_to_memory({'role': 'assistant', 'content': chat_response_message})
+        return chat_response_message
         
     def to_dict(self):
-        # Serialize agent state for session storage
+        # Serialize agent state
         return {
             'model': self.model,
             'memory': self.memory,
-            'tools': self.tools            
+            'tools': self.tools,
+            'summary': self.summary,
+            'summarized_length': self.summarized_length
         }
     
     @classmethod
     def from_dict(cls, data):
-        # Deserialize agent state from session storage
+        # Deserialize agent state loaded from the conversation store
         agent = cls(model=data['model'])
         agent.memory = data['memory']
         agent.tools = data['tools']
+        agent.summary = data.get('summary', '')
+        agent.summarized_length = data.get('summarized_length', 0)
+        agent.saved_length = len(agent.memory)
+        agent.saved_summary_length = agent.summarized_length
         return agent        
 
-def get_agent():
-    # Retrieve or create agent from session data
-    if 'agent_data' not in session:
-        agent = Agent(system_prompt={"role": "system", "content": "You are a helpful assistant for crypto trading strategies."})
-        session['agent_data'] = agent.to_dict()
+def open_agent(conversation_id: str = None) -> Agent:
+    # Load the agent from the conversation store, or start a new conversation if it is gone
+    data = conversation_store.load(conversation_id) if conversation_id else None
+    if data is None:
+        agent = Agent(system_prompt={"role": "system", "content": "You are a helpful assistant for crypto trading strategies."},
+                      tools=tool_registry.schemas())
+        agent.conversation_id = conversation_store.create(agent.model, agent.tools)
+        save_agent(agent)
     else:
-        agent = Agent.from_dict(session['agent_data'])
+        agent = Agent.from_dict(data)
+        agent.conversation_id = conversation_id
     return agent
 
-def summarize_strategy(chat_history):
-    response = client.chat.completions.create(
-        model=GPT_MODEL,
-        messages=[
-            {"role": "system", "content": "You are a Strategy Summarizer Agent. Your task is to analyze the chat history and extract a clear, concise summary of the trading strategy discussed. Your summary should include the following: 1. Entry Condition 2. Exit Condition 3. Position Sizing 4. Stop Loss Condition 5. Take Profit Condition \n\n"},
-            {"role": "user", "content": f"Summarize the trading strategy from this chat history:\n\n{chat_history}"}
-        ]
-    )
-    return response.choices[0].message.content
-
-def generate_strategy_json(strategy_summary):
-    response = client.chat.completions.create(
-        model=GPT_MODEL,
-        messages=[
-            {"role": "system", "content": """You are an expert in creating trading strategies. Your task is to convert the provided strategy summary into a structured JSON representation.
-             Example strategy summary:
-             Strategy Name: Simple Moving Average Crossover Strategy
-             Strategy Summary: Using a fast period of 10, and slow period of 50, entry condition is when the fast SMA crosses over the slow SMA. Exit condition is when fast SMA crosses below the slow SMA. Use a fixed position size of 100. Stop loss will be 2 percent below entry price. Take profit will be 5 percent above entry price.
-             
-             Example output (not perfect formatting, just to convey the example):
-             strategy_name: Simple Moving Average Crossover Strategy
-
-             entry_condition: {
-             indicator: SMA,
-             parameter_1: {
-             name: fast_period,
-             value: 10
-             },
-             parameter_2: {
-             name: slow_period,
-             value: 50
-             },
-             parameter_3: {
-             name: N/A,
-             value: 0
-             },
-             condition: fast SMA crosses above slow SMA
-             }
-             
-             exit_condition: {
-             indicator: SMA,
-             parameter_1: {
-             name: fast_period,
-             value: 10
-             },
-             parameter_2: {
-             name: slow_period,
-             value: 50
-             },
-             parameter_3: {
-             name: N/A,
-             value: 0
-             },
-             condition: fast SMA crosses below slow SMA
-             }
-
-             position_size: {
-             type: fixed,
-             value: 100
-             }
-
-             stop_loss: {
-             parameter_1: {
-             name: percentage of entry price,
-             value: 2
-             },
-             parameter_2: {
-             name: N/A
-             value: 0
-             },
-             parameter_3: {
-             name: N/A,
-             value: 0
-             },
-             condition: price falls below entry price
-             }
-
-             take_profit: {
-             parameter_1: {
-             name: percentage of entry price,
-             value: 5
-             },
-             parameter_2: {
-             name: N/A
-             value: 0
-             },
-             parameter_3: {
-             name: N/A,
-             value: 0
-             },
-             condition: price goes above entry price             
-             }
-
-             """},
-            {"role": "user", "content": f"Create a JSON representation of this strategy:\n\n{strategy_summary}"}
-        ],
-        response_format={
-            "type": "json_schema",
-            "json_schema": {
-                "name": "strategy_to_json",
-                "strict": True,
-                "schema": {
-                    "type": "object",
-                    "properties": {
-                        "strategy_name": {
-                            "type": "string"
-                        },
-                        "entry_condition": {
-                            "type": "object",
-                            "properties": {
-                                "indicator": {"type": "string"},
-                                "condition": {"type": "string"},
-                                "parameter_1": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },
-                                "parameter_2": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },
-                                "parameter_3": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },                                
-                            },
-                            "required": ["indicator", "condition", "parameter_1", "parameter_2", "parameter_3"],
-                            "additionalProperties": False
-                        },
-                        "exit_condition": {
-                            "type": "object",
-                            "properties": {
-                                "indicator": {"type": "string"},
-                                "condition": {"type": "string"},
-                                "parameter_1": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },
-                                "parameter_2": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },
-                                "parameter_3": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },   
-                            },
-                            "required": ["indicator", "condition", "parameter_1", "parameter_2", "parameter_3"],
-                            "additionalProperties": False
-                        },
-                        "position_size": {
-                            "type": "object",
-                            "properties": {
-                                "type": {"type": "string"},
-                                "value": {"type": "integer"},
-                            },
-                            "required": ["type", "value"],
-                            "additionalProperties": False
-                        },
-                        "stop_loss": {
-                            "type": "object",
-                            "properties": {
-                                "condition": {"type": "string"},
-                                "parameter_1": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },
-                                "parameter_2": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },
-                                "parameter_3": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },   
-                            },
-                            "required": ["condition", "parameter_1", "parameter_2", "parameter_3"],
-                            "additionalProperties": False
-                        },
-                        "take_profit": {
-                            "type": "object",
-                            "properties": {
-                                "condition": {"type": "string"},
-                                "parameter_1": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },
-                                "parameter_2": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },
-                                "parameter_3": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {"type": "string"},
-                                        "value": {"type": "integer"},
-                                    },
-                                    "required": ["name", "value"],
-                                    "additionalProperties": False
-                                },   
-                            },
-                            "required": ["condition", "parameter_1", "parameter_2", "parameter_3"],
-                            "additionalProperties": False
-                        },
-                    },
-                    "required": ["strategy_name", "entry_condition", "exit_condition", "position_size", "stop_loss", "take_profit"],
-                    "additionalProperties": False
-                }
-            }
-        }
-    )
-    return response.choices[0].message.content
+def get_agent():
+    # Retrieve the session's agent; the session cookie only holds the conversation id
+    agent = open_agent(session.get('conversation_id'))
+    session['conversation_id'] = agent.conversation_id
+    agent.tool_context = tool_context(session)
+    return agent
 
-def get_user_strategies_file():
-    user_id = session.get('user_id', 'default_user')  # You should implement proper user authentication
-    return os.path.join(STRATEGIES_DIR, f"{user_id}_strategies.json")
+def save_agent(agent):
+    # Persist only the messages added since the agent was loaded, and the summary if it moved on
+    conversation_id = agent.conversation_id
+    new_messages = agent.memory[agent.saved_length:]
+    if new_messages:
+        conversation_store.append(conversation_id, new_messages)
+        agent.saved_length = len(agent.memory)
+    if agent.summarized_length != agent.saved_summary_length:
+        conversation_store.set_summary(conversation_id, agent.summary, agent.summarized_length)
+        agent.saved_summary_length = agent.summarized_length
 
-def load_user_strategies():
-    file_path = get_user_strategies_file()
-    if os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    return []
+# Strategy generation over the sync client; the flow itself lives in strategy_generation
+strategy_completions = SyncCompletions(create_completion, lambda kwargs: client.chat.completions.create(**kwargs, stream=True),
+                                       response_cache)
 
-def save_user_strategies(strategies):
-    file_path = get_user_strategies_file()
-    with open(file_path, 'w') as f:
-        json.dump(strategies, f, indent=2)
+def strategy_event(payload: Dict) -> str:
+    return sse.encode_event(json.dumps(payload))
 
+def get_user_id():
+    return session.get('user_id', 'default_user')  # You should implement proper user authentication
+
+def load_user_strategies():
+    return strategy_store.list(get_user_id())
+
+def load_window(instrument: str, timeframe: str, start=None, end=None):
+    # Candles between optional epoch-second bounds; slicing the memory-mapped columns is zero-copy
+    series = resampler.load(instrument, timeframe)
+    lo, hi = CandleStore.index_range(series['time'], start, end)
+    candles = {field: values[lo:hi] for field, values in series.items()}
+    # Moving averages come from the process-wide cache, shared across users and strategies
+    return candles, SeriesIndicators(series, series_key(instrument, timeframe, series), lo, hi)
+
+def compressed_json(payload: Dict):
+    response = jsonify(payload)
+    if 'gzip' in request.headers.get('Accept-Encoding', '') and response.content_length >= GZIP_MIN_BYTES:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=5))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def load_result(result_id: str):
+    stored = result_store.load(get_user_id(), result_id)
+    if stored is None:
+        return None, (jsonify({"status": "error", "message": "Backtest result not found; run the backtest again"}), 404)
+    return stored, None
+
+# Paper-trading runners trade either a replay of the stored candles (MARKET_DATA_SOURCE=replay)
+# or bars aggregated from a synthetic tick stream on the market data bus (=synthetic). Replay
+# runners with the same instrument, timeframe, start and speed share one feed, and a runner
+# joining a running replay picks it up at its current bar.
+MARKET_DATA_SOURCE = os.getenv('MARKET_DATA_SOURCE', 'replay')
+AUTOMATION_BARS_PER_SECOND = float(os.getenv('AUTOMATION_BARS_PER_SECOND', 10))
+# Synthetic ticks: simulated seconds between trades, and trades generated per wall-clock second
+SYNTHETIC_SECONDS_PER_TICK = float(os.getenv('SYNTHETIC_SECONDS_PER_TICK', 60))
+SYNTHETIC_TICKS_PER_SECOND = float(os.getenv('SYNTHETIC_TICKS_PER_SECOND', 20))
+# Bars sent to a chart feed when it connects
+CHART_HISTORY_BARS = 200
+
+market_data = MarketDataBus(['BTC/USD', 'ETH/USD'], ['1h', '4h', '1d'])
+tick_sources = {}
+
+def start_tick_source(instrument: str) -> None:
+    # Runs on the automation loop; each instrument's synthetic trades start where its stored candles end
+    if instrument in tick_sources:
+        return
+    try:
+        series = resampler.load(instrument, '1h')
+        price, start = float(series['close'][-1]), int(series['time'][-1]) + TIMEFRAME_SECONDS['1h']
+    except (FileNotFoundError, IndexError):
+        price, start = 100.0, int(time.time()) // TIMEFRAME_SECONDS['1d'] * TIMEFRAME_SECONDS['1d']
+    ticks = synthetic_ticks(price, start, seconds_per_tick=SYNTHETIC_SECONDS_PER_TICK,
+                            ticks_per_second=SYNTHETIC_TICKS_PER_SECOND)
+    tick_sources[instrument] = asyncio.get_running_loop().create_task(market_data.run(instrument, ticks))
+
+def automation_feed(key):
+    if key[0] == 'live':
+        _, instrument, timeframe = key
+        start_tick_source(instrument)
+        return market_data.subscribe(instrument, timeframe)
+    _, instrument, timeframe, start, bars_per_second = key
+    candles, _ = load_window(instrument, timeframe, start)
+    return replay_feed(candles, bars_per_second)
+
+async def open_chart_feed(instrument: str, timeframe: str):
+    # Lossy, so a slow chart never holds up the bus
+    start_tick_source(instrument)
+    return market_data.subscribe(instrument, timeframe, lossless=False, replay=CHART_HISTORY_BARS)
+
+automation_engine = AutomationEngine(automation_feed)
+
+# Tools the chat agent can call; tool calls of one turn run concurrently
+tool_registry = ToolRegistry()
+MAX_INDICATOR_VALUES = 100
+
+def tool_context(session) -> Dict:
+    # Request state the tools need, captured before they run on worker threads
+    return {'user_id': session.get('user_id', 'default_user'),
+            'instrument': session.get('backtest_instrument', 'BTC/USD'),
+            'timeframe': session.get('backtest_timeframe', '1h')}
+
+MARKET_PARAMETERS = {
+    'instrument': {'type': 'string', 'description': "Instrument such as 'BTC/USD'; defaults to the backtest settings"},
+    'timeframe': {'type': 'string', 'enum': list(TIMEFRAME_SECONDS), 'description': "Candle timeframe; defaults to the backtest settings"},
+}
+
+@tool_registry.register(
+    'list_strategies', "List the user's saved trading strategies with their summaries.",
+    {'type': 'object', 'properties': {}})
+def list_strategies_tool(context: Dict):
+    return [{'name': s['name'], 'summary': s['summary']} for s in strategy_store.list(context['user_id'])]
+
+@tool_registry.register(
+    'run_backtest', "Backtest one of the user's saved strategies on historical candles and return its performance metrics.",
+    {'type': 'object',
+     'properties': {'name': {'type': 'string', 'description': "Saved strategy name"},
+                    **MARKET_PARAMETERS,
+                    'start': {'type': 'integer', 'description': "Start time, epoch seconds"},
+                    'end': {'type': 'integer', 'description': "End time, epoch seconds"}},
+     'required': ['name']})
+def run_backtest_tool(context: Dict, name: str, instrument: str = None, timeframe: str = None, start: int = None,
+                      end: int = None):
+    instrument = instrument or context['instrument']
+    timeframe = timeframe or context['timeframe']
+    strategy = compiled_strategies.get(context['user_id'], name)
+    if strategy is None:
+        raise LookupError(f"Strategy '{name}' not found")
+    candles, indicators = load_window(instrument, timeframe, start, end)
+    result = backtest.run_backtest(candles, strategy, timeframe=timeframe, indicators=indicators)
+    return {'strategy': name, 'instrument': instrument, 'timeframe': timeframe, 'metrics': result['metrics']}
+
+@tool_registry.register(
+    'get_indicator_values', "Get the most recent values of a moving average with the closing prices they were computed from.",
+    {'type': 'object',
+     'properties': {'indicator': {'type': 'string', 'enum': ['SMA', 'EMA']},
+                    'period': {'type': 'integer', 'description': "Moving average period in candles"},
+                    **MARKET_PARAMETERS,
+                    'count': {'type': 'integer', 'description': f"Number of recent candles, at most {MAX_INDICATOR_VALUES}"}},
+     'required': ['indicator', 'period']})
+def get_indicator_values_tool(context: Dict, indicator: str, period: int, instrument: str = None, timeframe: str = None,
+                              count: int = 10):
+    instrument = instrument or context['instrument']
+    timeframe = timeframe or context['timeframe']
+    series = resampler.load(instrument, timeframe)
+    values = SeriesIndicators(series, series_key(instrument, timeframe, series)).moving_average(indicator.upper(), int(period))
+    count = max(1, min(int(count), MAX_INDICATOR_VALUES))
+    return {'indicator': f"{indicator.upper()}({int(period)})", 'instrument': instrument, 'timeframe': timeframe,
+            'values': [{'time': int(t), 'close': float(c), 'value': None if np.isnan(v) else float(v)}
+                       for t, c, v in zip(series['time'][-count:], series['close'][-count:], values[-count:])]}
+
+
+ROUTE_LATENCY = metrics.registry.histogram(
+    'http_request_duration_seconds', "Time until a route returned its response (its headers, for streams)")
+STREAM_DURATION = metrics.registry.histogram(
+    'http_stream_duration_seconds', "Time until a streamed response was fully sent")
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # Labelled by route pattern, not path, so ids in URLs don't each get a series
+        labels = {'route': request.url_rule.rule if request.url_rule else 'unmatched',
+                  'method': request.method, 'status': response.status_code}
+        ROUTE_LATENCY.observe(time.perf_counter() - started, **labels)
+        if response.is_streamed:
+            response.call_on_close(lambda: STREAM_DURATION.observe(time.perf_counter() - started, **labels))
+    return response
+
+@metrics.registry.collector
+def cache_metrics():
+    # Hit rates of the process-wide caches, read at scrape time
+    samples = []
+    for cache, stats in (('indicator', indicator_cache.stats()), ('response', response_cache.stats())):
+        labels = {'cache': cache}
+        lookups = stats['hits'] + stats['misses']
+        samples += [('cache_hits', "Cache hits since the process started", labels, stats['hits']),
+                    ('cache_misses', "Cache misses since the process started", labels, stats['misses']),
+                    ('cache_hit_ratio', "Share of cache lookups that hit", labels,
+                     stats['hits'] / lookups if lookups else 0.0),
+                    ('cache_entries', "Entries held in the cache", labels, stats['entries']),
+                    ('cache_bytes', "Bytes held in the cache", labels, stats['bytes'])]
+    return samples
 
 @app.route('/')
 def index():
@@ -409,6 +544,73 @@ def backtesting():
 def automation():
     return render_template('automation.html', title='Automation')
 
+@app.route('/automation/start', methods=['POST'])
+def start_automation():
+    data = request.json or {}
+    strategy_name = data.get('name')
+    instrument = data.get('instrument') or session.get('backtest_instrument', 'BTC/USD')
+    timeframe = data.get('timeframe') or session.get('backtest_timeframe', '1h')
+
+    try:
+        strategy = compiled_strategies.get(get_user_id(), strategy_name)
+    except StrategyError as e:
+        return jsonify({"status": "error", "message": f"Unable to start strategy: {e}"}), 400
+    if strategy is None:
+        return jsonify({"status": "error", "message": f"Strategy '{strategy_name}' not found"}), 404
+
+    try:
+        if MARKET_DATA_SOURCE == 'synthetic':
+            market_data.topic(instrument, timeframe)
+            key = ('live', instrument, timeframe)
+        else:
+            speed = float(data.get('speed', AUTOMATION_BARS_PER_SECOND))
+            start = int(data['start']) if data.get('start') is not None else None
+            # Checked here so a missing series is reported to the caller rather than the engine log
+            resampler.load(instrument, timeframe)
+            key = ('replay', instrument, timeframe, start, speed)
+    except FileNotFoundError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"status": "error", "message": f"Unable to start strategy: {e}"}), 400
+
+    runner = StrategyRunner(strategy, instrument, timeframe)
+    runner_id = automation_engine.add(key, runner, owner=get_user_id())
+    return jsonify({"status": "success", "id": runner_id, "message": f"Started '{strategy_name}' on {instrument} {timeframe}"})
+
+@app.route('/automation/stop', methods=['POST'])
+def stop_automation():
+    runner_id = (request.json or {}).get('id')
+    if automation_engine.remove(runner_id, owner=get_user_id()) is None:
+        return jsonify({"status": "error", "message": f"No running strategy with id {runner_id}"}), 404
+    return jsonify({"status": "success", "message": "Strategy stopped"})
+
+@app.route('/automation/status', methods=['GET'])
+def automation_status():
+    return jsonify({"status": "success", "runners": automation_engine.status(owner=get_user_id())})
+
+@app.route('/market_data/stream', methods=['GET'])
+def stream_market_data():
+    instrument = request.args.get('instrument', 'BTC/USD')
+    timeframe = request.args.get('timeframe', '1h')
+    if MARKET_DATA_SOURCE != 'synthetic':
+        return jsonify({"status": "error", "message": "Live market data is off (MARKET_DATA_SOURCE=replay)"}), 404
+    try:
+        market_data.topic(instrument, timeframe)
+    except KeyError as e:
+        return jsonify({"status": "error", "message": str(e.args[0])}), 404
+
+    def events():
+        # Bars are read on the automation loop; this worker thread only waits for them
+        subscription = automation_engine.call(open_chart_feed(instrument, timeframe))
+        try:
+            while True:
+                bar = automation_engine.call(subscription.__anext__())
+                yield sse.encode_event(json.dumps(bar), event='bar')
+        finally:
+            automation_engine.call(subscription.aclose())
+
+    return Response(events(), content_type='text/event-stream')
+
 @app.route('/chat', methods=['POST'])
 def chat():
     data = request.json
@@ -417,21 +619,27 @@ def chat():
     agent = get_agent()
     response = agent.invoke(user_message)
     
-    # Persist updated agent state in session
-    session['agent_data'] = agent.to_dict()
+    # Persist the user message now, the reply once it is complete
+    save_agent(agent)
     
     if STREAM:
+        def stream():
+            yield from agent._handle_stream_response(response)
+            save_agent(agent)
         # Return streaming response
-        return Response(stream_with_context(agent._handle_stream_response(response)), content_type='text/event-stream')
+        return Response(stream_with_context(stream()), content_type='text/event-stream')
     else:
         # Return non-streaming response
-        return jsonify({"response": agent._handle_non_stream_response(response)})
+        chat_response = agent._handle_non_stream_response(response)
+        save_agent(agent)
+        return jsonify({"response": chat_response})
     
 @app.route('/clear_memory', methods=['POST'])
 def clear_memory():
-    # Remove agent data from session, effectively clearing its memory
-    if 'agent_data' in session:
-        del session['agent_data']
+    # Drop the conversation, effectively clearing the agent's memory
+    conversation_id = session.pop('conversation_id', None)
+    if conversation_id:
+        conversation_store.delete(conversation_id)
     return jsonify({"message": "Memory cleared successfully"})
 
 @app.route('/set_backtest_params', methods=['POST'])
@@ -443,40 +651,185 @@ def set_backtest_params():
     # Store selections in the session
     session['backtest_instrument'] = instrument
     session['backtest_timeframe'] = timeframe
+
+    # Bring the selected aggregate up to date now so the next backtest only reads it
+    try:
+        resampler.load(instrument, timeframe)
+    except FileNotFoundError:
+        return jsonify({"status": "success", "message": f"Backtest parameters set; no candle data for {instrument} {timeframe} yet"})
     
     return jsonify({"status": "success", "message": "Backtest parameters set successfully"})
 
+@app.route('/run_backtest', methods=['POST'])
+def run_backtest():
+    data = request.json or {}
+    strategy_name = data.get('name')
+    instrument = data.get('instrument') or session.get('backtest_instrument', 'BTC/USD')
+    timeframe = data.get('timeframe') or session.get('backtest_timeframe', '1h')
+
+    try:
+        strategy = compiled_strategies.get(get_user_id(), strategy_name)
+    except StrategyError as e:
+        return jsonify({"status": "error", "message": f"Unable to run strategy: {e}"}), 400
+    if strategy is None:
+        return jsonify({"status": "error", "message": f"Strategy '{strategy_name}' not found"}), 404
+
+    try:
+        candles, indicators = load_window(instrument, timeframe, data.get('start'), data.get('end'))
+        result = backtest.run_backtest(candles, strategy, timeframe=timeframe,
+                                       indicators=indicators)
+    except FileNotFoundError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except (KeyError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Unable to run strategy: {e}"}), 400
+
+    # The equity curve and trades are fetched from /results/<result_id>/... as the panel needs them
+    result_id = result_store.save(get_user_id(), candles['time'], result['equity'], result['trades'])
+    payload = {
+        "status": "success",
+        "instrument": instrument,
+        "timeframe": timeframe,
+        "metrics": result['metrics'],
+        "result_id": result_id
+    }
+    if data.get('include_trades'):
+        payload["trades"] = backtest.trades_to_records(result['trades'])
+    return compressed_json(payload)
+
+@app.route('/results/<result_id>/equity', methods=['GET'])
+def result_equity(result_id):
+    stored, error = load_result(result_id)
+    if error:
+        return error
+    try:
+        curve = equity_points(stored[0], request.args.get('points', 1000, type=int), request.args.get('method', 'lttb'),
+                              request.args.get('start', type=int), request.args.get('end', type=int))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return compressed_json({"status": "success", **curve})
+
+@app.route('/results/<result_id>/trades', methods=['GET'])
+def result_trades(result_id):
+    stored, error = load_result(result_id)
+    if error:
+        return error
+    try:
+        page = trade_page(stored[1], request.args.get('page', 1, type=int), request.args.get('page_size', 50, type=int),
+                          request.args.get('sort', 'entry_time'), request.args.get('order', 'asc') == 'desc')
+    except KeyError as e:
+        return jsonify({"status": "error", "message": str(e.args[0])}), 400
+    return compressed_json({"status": "success", **page})
+
+@app.route('/run_sweep', methods=['POST'])
+def run_sweep():
+    data = request.json or {}
+    strategy_name = data.get('name')
+    instrument = data.get('instrument') or session.get('backtest_instrument', 'BTC/USD')
+    timeframe = data.get('timeframe') or session.get('backtest_timeframe', '1h')
+    ranges = data.get('ranges') or {}
+    metric = data.get('metric', 'sharpe')
+    top = data.get('top', 50)
+
+    try:
+        strategy = compiled_strategies.get(get_user_id(), strategy_name)
+    except StrategyError as e:
+        return jsonify({"status": "error", "message": f"Unable to run sweep: {e}"}), 400
+    if strategy is None:
+        return jsonify({"status": "error", "message": f"Strategy '{strategy_name}' not found"}), 404
+    if not ranges:
+        return jsonify({"status": "error", "message": "No parameter ranges given"}), 400
+    if metric not in sweep.METRICS:
+        return jsonify({"status": "error", "message": f"Unknown metric '{metric}'"}), 400
+    if not isinstance(top, int) or isinstance(top, bool) or top <= 0:
+        return jsonify({"status": "error", "message": "top must be a positive integer"}), 400
+
+    try:
+        candles, indicators = load_window(instrument, timeframe, data.get('start'), data.get('end'))
+        results = sweep.run_sweep(candles, strategy, ranges, timeframe=timeframe, metric=metric,
+                                  indicators=indicators)
+    except FileNotFoundError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"status": "error", "message": f"Unable to run sweep: {e}"}), 400
+
+    return jsonify({
+        "status": "success",
+        "instrument": instrument,
+        "timeframe": timeframe,
+        "metric": metric,
+        "combinations": len(results),
+        "results": results[:top]
+    })
+
+@app.route('/run_robustness', methods=['POST'])
+def run_robustness():
+    data = request.json or {}
+    strategy_name = data.get('name')
+    instrument = data.get('instrument') or session.get('backtest_instrument', 'BTC/USD')
+    timeframe = data.get('timeframe') or session.get('backtest_timeframe', '1h')
+
+    try:
+        strategy = compiled_strategies.get(get_user_id(), strategy_name)
+    except StrategyError as e:
+        return jsonify({"status": "error", "message": f"Unable to run robustness analysis: {e}"}), 400
+    if strategy is None:
+        return jsonify({"status": "error", "message": f"Strategy '{strategy_name}' not found"}), 404
+
+    try:
+        candles, indicators = load_window(instrument, timeframe, data.get('start'), data.get('end'))
+        # Defaults to ten test windows, each following a train window five times its length
+        test_bars = int(data.get('test_bars') or max(1, len(candles['close']) // 15))
+        train_bars = int(data.get('train_bars') or 5 * test_bars)
+        result = robustness.run_robustness(candles, strategy, train_bars, test_bars, data.get('step'),
+                                           data.get('ranges'), data.get('metric', 'sharpe'),
+                                           data.get('resamples', 1000), data.get('method', 'bootstrap'),
+                                           data.get('seed'), timeframe=timeframe, indicators=indicators)
+    except FileNotFoundError as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
+    except (KeyError, ValueError, TypeError) as e:
+        return jsonify({"status": "error", "message": f"Unable to run robustness analysis: {e}"}), 400
+
+    return jsonify({
+        "status": "success",
+        "instrument": instrument,
+        "timeframe": timeframe,
+        **result
+    })
+
 @app.route('/generate_strategy', methods=['POST'])
 def generate_strategy():
     chat_history = request.json.get('chat_history')
-    
-    # Step 3: Summarize the strategy
-    strategy_summary = summarize_strategy(chat_history)
-    
-    # Step 4: Generate JSON from the summary
-    strategy_json = generate_strategy_json(strategy_summary)
-    
-    # Store the summary for front-end use
-    session['current_strategy_summary'] = strategy_summary
-    
+
+    # Streamed: the summary arrives as it is generated, then the summary and JSON together
+    if request.json.get('stream'):
+        events = iterate_sync(generate_strategy_events(strategy_completions, chat_history, GPT_MODEL))
+        return Response(stream_with_context(strategy_event(payload) for payload in events),
+                        content_type='text/event-stream')
+
+    strategy_summary, strategy_json = run_sync(generate_single_pass(strategy_completions, chat_history, GPT_MODEL))
     return jsonify({
         "strategy_summary": strategy_summary,
         "strategy_json": strategy_json
     })
 
-@app.route('/get_current_strategy', methods=['GET'])
-def get_current_strategy():
-    return jsonify({
-        "strategy_summary": session.get('current_strategy_summary', "No strategy currently selected.")
-    })
-
 @app.route('/save_strategy', methods=['POST'])
 def save_strategy():
-    new_strategy = request.json
-    strategies = load_user_strategies()
-    strategies.append(new_strategy)
-    save_user_strategies(strategies)
-    return jsonify({"message": "Strategy saved successfully", "strategies": strategies})
+    new_strategy = request.get_json(silent=True)
+    if not isinstance(new_strategy, dict):
+        return jsonify({"status": "error", "message": "Request body must be a JSON object"}), 400
+    name, strategy_json = new_strategy.get('name'), new_strategy.get('json')
+    if not isinstance(name, str) or not name.strip():
+        return jsonify({"status": "error", "message": "Strategy name is required"}), 400
+    if not isinstance(new_strategy.get('summary') or '', str):
+        return jsonify({"status": "error", "message": "Strategy summary must be a string"}), 400
+    try:
+        if not isinstance(json.loads(strategy_json), dict):
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "Strategy json must be a JSON object encoded as a string"}), 400
+    # Name collisions get a ' (n)' suffix, allocated atomically by the store
+    name = strategy_store.add_unique(get_user_id(), new_strategy)
+    return jsonify({"message": "Strategy saved successfully", "name": name, "strategies": load_user_strategies()})
 
 @app.route('/get_strategies', methods=['GET'])
 def get_strategies():
@@ -486,17 +839,21 @@ def get_strategies():
 @app.route('/delete_strategy', methods=['POST'])
 def delete_strategy():
     strategy_name = request.json.get('name')
-    strategies = load_user_strategies()
-    strategies = [s for s in strategies if s['name'] != strategy_name]
-    save_user_strategies(strategies)
-    return jsonify({"message": "Strategy deleted successfully", "strategies": strategies})
+    strategy_store.delete(get_user_id(), strategy_name)
+    compiled_strategies.discard(get_user_id(), strategy_name)
+    return jsonify({"message": "Strategy deleted successfully", "strategies": load_user_strategies()})
 
 @app.route('/check_strategy_name', methods=['POST'])
 def check_strategy_name():
     name = request.json.get('name')
-    strategies = load_user_strategies()
-    exists = any(strategy['name'] == name for strategy in strategies)
-    return jsonify({"exists": exists})
+    return jsonify({"exists": strategy_store.exists(get_user_id(), name)})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text format; ?format=json gives counts, means and percentiles instead
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.registry.snapshot())
+    return Response(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""ASGI entry point.
+
+/chat and /generate_strategy run on the event loop with a pooled async OpenAI
+client, so an open chat stream costs a coroutine instead of a worker thread.
+Every other route is served by the Flask app through asgiref's WSGI adapter.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+from typing import Dict, Optional
+from contextlib import aclosing, suppress
+import asyncio
+import json
+import os
+import time
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.wrappers import Request as WerkzeugRequest, Response as WerkzeugResponse
+
+from app import (app as flask_app, GPT_MODEL, STREAM, open_agent, save_agent, completion_kwargs, strategy_event,
+                 response_cache, tool_context, ROUTE_LATENCY, STREAM_DURATION)
+from async_llm import AsyncLLM, ConcurrencyLimitError
+import metrics
+import sse
+from strategy_generation import AsyncCompletions, generate_single_pass, generate_strategy_events
+
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 256))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 30))
+
+wsgi_application = WsgiToAsgi(flask_app)
+_llm: Optional[AsyncLLM] = None
+
+def get_llm() -> AsyncLLM:
+    # Created on first use so the client belongs to the server's event loop
+    global _llm
+    if _llm is None:
+        _llm = AsyncLLM(api_key=os.getenv("OPENAI_API_KEY"), max_concurrency=LLM_MAX_CONCURRENCY,
+                        queue_timeout=LLM_QUEUE_TIMEOUT)
+    return _llm
+
+class Request:
+    """The parts of an ASGI request the async routes need, with the Flask session.
+
+    The session is opened and saved with the Flask app's own session interface,
+    so both halves of the application read and write the same signed cookie.
+    """
+
+    def __init__(self, scope: Dict, body: bytes):
+        headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+        self.body = body
+        self._environ = {'REQUEST_METHOD': scope['method'], 'PATH_INFO': scope['path'],
+                         'HTTP_COOKIE': headers.get('cookie', ''), 'wsgi.url_scheme': scope.get('scheme', 'http')}
+        self.session = flask_app.session_interface.open_session(flask_app, WerkzeugRequest(self._environ))
+
+    def json(self) -> Dict:
+        return json.loads(self.body or b'{}')
+
+    def session_headers(self) -> list:
+        response = WerkzeugResponse()
+        flask_app.session_interface.save_session(flask_app, self.session, response)
+        return [(b'set-cookie', v.encode('latin-1')) for v in response.headers.getlist('Set-Cookie')]
+
+async def _read_body(receive) -> bytes:
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+async def _send_json(send, request: Request, payload: Dict, status: int = 200) -> None:
+    body = json.dumps(payload).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), *request.session_headers()]})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _send_llm_error(send, request: Request, error: Exception) -> None:
+    if isinstance(error, ConcurrencyLimitError):
+        await _send_json(send, request, {"status": "error", "message": str(error)}, 503)
+    else:
+        metrics.LLM_ERRORS.inc(client='async')
+        print(f'Exception: {error}')
+        await _send_json(send, request, {"status": "error", "message": "The language model request failed"}, 502)
+
+async def _complete(llm: AsyncLLM, kwargs: Dict):
+    # Non-streaming completion through the response cache; hits don't take an LLM slot
+    response = await asyncio.to_thread(response_cache.lookup, kwargs)
+    if response is None:
+        response = await llm.complete(kwargs)
+        await asyncio.to_thread(response_cache.store, kwargs, response)
+    return response
+
+async def _wait_for_disconnect(receive) -> None:
+    # The body has been read, so the next message is the disconnect
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+async def _next_event(events, disconnected: asyncio.Future) -> Optional[str]:
+    # The next event, or None if the client went away first; the pending read is cancelled,
+    # which ends the LLM stream and frees its slot
+    event = asyncio.ensure_future(anext(events))
+    await asyncio.wait({event, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+    if not event.done():
+        event.cancel()
+        with suppress(asyncio.CancelledError):
+            await event
+        return None
+    return event.result()
+
+async def _send_events(send, receive, request: Request, events) -> bool:
+    """Sends a server-sent event stream.
+
+    The first event is awaited before the response starts, so a full queue or a
+    failed request still gets an error status. Returns False in that case, or
+    if the client disconnects, which closes `events`. A failure once the stream
+    has started ends it with an 'error' event.
+    """
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        async with aclosing(events):
+            try:
+                first = await _next_event(events, disconnected)
+            except Exception as e:
+                await _send_llm_error(send, request, e)
+                return False
+            if first is None:
+                return False
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'text/event-stream'), *request.session_headers()]})
+            await send({'type': 'http.response.body', 'body': first.encode(), 'more_body': True})
+            try:
+                while (event := await _next_event(events, disconnected)) is not None:
+                    await send({'type': 'http.response.body', 'body': event.encode(), 'more_body': True})
+                return False
+            except StopAsyncIteration:
+                pass
+            except Exception as e:
+                metrics.LLM_ERRORS.inc(client='async')
+                print(f'Exception: {e}')
+                error = sse.encode_event("The language model request failed", 'error')
+                await send({'type': 'http.response.body', 'body': error.encode(), 'more_body': True})
+    finally:
+        disconnected.cancel()
+    await send({'type': 'http.response.body', 'body': b''})
+    return True
+
+async def chat(request: Request, receive, send) -> None:
+    user_message = request.json().get('message')
+
+    # Conversation store and context summarization calls are blocking, keep them off the loop
+    agent = await asyncio.to_thread(open_agent, request.session.get('conversation_id'))
+    request.session['conversation_id'] = agent.conversation_id
+    agent.tool_context = tool_context(request.session)
+    messages = await asyncio.to_thread(agent.prepare, user_message)
+    await asyncio.to_thread(save_agent, agent)
+    kwargs = completion_kwargs(messages, agent.tools, model=agent.model)
+
+    if not STREAM:
+        try:
+            response = await _complete(get_llm(), kwargs)
+        except Exception as e:
+            await _send_llm_error(send, request, e)
+            return
+        # Tool calls and their follow-up completions use the sync client, on a thread
+        chat_response = await asyncio.to_thread(agent._handle_non_stream_response, response)
+        await asyncio.to_thread(save_agent, agent)
+        await _send_json(send, request, {"response": chat_response})
+        return
+
+    def follow_up(messages, tool_choice):
+        return get_llm().stream(completion_kwargs(messages, agent.tools, tool_choice, model=agent.model))
+
+    events = agent._handle_async_stream_response(get_llm().stream(kwargs), follow_up)
+    if await _send_events(send, receive, request, events):
+        await asyncio.to_thread(save_agent, agent)
+
+def strategy_completions(llm: AsyncLLM) -> AsyncCompletions:
+    # A full queue is reported as a 503 rather than retried through the two-stage path
+    return AsyncCompletions(lambda kwargs: _complete(llm, kwargs), llm.stream, response_cache,
+                            no_fallback=(ConcurrencyLimitError,))
+
+async def _strategy_events(completions: AsyncCompletions, chat_history):
+    async with aclosing(generate_strategy_events(completions, chat_history, GPT_MODEL)) as events:
+        async for payload in events:
+            yield strategy_event(payload)
+
+async def generate_strategy(request: Request, receive, send) -> None:
+    data = request.json()
+    chat_history = data.get('chat_history')
+    completions = strategy_completions(get_llm())
+    if data.get('stream'):
+        await _send_events(send, receive, request, _strategy_events(completions, chat_history))
+        return
+
+    try:
+        strategy_summary, strategy_json = await generate_single_pass(completions, chat_history, GPT_MODEL)
+    except Exception as e:
+        await _send_llm_error(send, request, e)
+        return
+    await _send_json(send, request, {"strategy_summary": strategy_summary, "strategy_json": strategy_json})
+
+ROUTES = {
+    ('POST', '/chat'): chat,
+    ('POST', '/generate_strategy'): generate_strategy,
+}
+
+async def _lifespan(receive, send) -> None:
+    global _llm
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if _llm is not None:
+                await _llm.aclose()
+                _llm = None
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send) -> None:
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    route = ROUTES.get((scope.get('method'), scope.get('path')))
+    if route is None:
+        await wsgi_application(scope, receive, send)
+        return
+    started = time.perf_counter()
+    labels = {'route': scope['path'], 'method': scope['method']}
+    response = {}
+
+    async def timed_send(message):
+        # Latency is taken when the headers go out, as for the Flask routes
+        if message['type'] == 'http.response.start':
+            labels['status'] = message['status']
+            response['streamed'] = (b'content-type', b'text/event-stream') in message['headers']
+            ROUTE_LATENCY.observe(time.perf_counter() - started, **labels)
+        await send(message)
+
+    request = Request(scope, await _read_body(receive))
+    try:
+        request.json()
+    except ValueError:
+        await _send_json(timed_send, request, {"status": "error", "message": "Request body must be JSON"}, 400)
+        return
+    await route(request, receive, timed_send)
+    if response.get('streamed'):
+        STREAM_DURATION.observe(time.perf_counter() - started, **labels)
@@ -0,0 +1,66 @@
+from typing import Dict, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import httpx
+from openai import AsyncOpenAI
+from tenacity import retry, wait_random_exponential, stop_after_attempt
+
+from metrics import count_retry
+
+class ConcurrencyLimitError(RuntimeError):
+    """Raised when no LLM slot frees up within the queue timeout."""
+
+class AsyncLLM:
+    """One pooled AsyncOpenAI client shared by every request on the event loop.
+
+    A semaphore caps the number of completions in flight; requests beyond the
+    cap wait up to `queue_timeout` seconds for a slot. Streams hold their slot
+    until the last chunk has been read or the consumer closes them. The
+    connection pool has one connection per slot, so requests only ever queue
+    on the semaphore (httpcore's own pool queue gets slow with many waiters).
+    """
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None, max_concurrency: int = 256,
+                 queue_timeout: float = 30.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_concurrency)
+        # `transport` replaces the network, e.g. with an httpx.MockTransport in tests
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            timeout=httpx.Timeout(60.0, connect=5.0), transport=transport)
+        # Retries are done by tenacity, as for the sync client
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=self._http, max_retries=0)
+
+    @asynccontextmanager
+    async def _slot(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ConcurrencyLimitError(f"All {self.max_concurrency} LLM slots are busy") from None
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    @retry(wait=wait_random_exponential(multiplier=1, max=40), stop=stop_after_attempt(3), before_sleep=count_retry)
+    async def _create(self, kwargs: Dict):
+        return await self.client.chat.completions.create(**kwargs)
+
+    async def complete(self, kwargs: Dict):
+        """Returns the completion for client.chat.completions.create arguments."""
+        async with self._slot():
+            return await self._create({**kwargs, 'stream': False})
+
+    async def stream(self, kwargs: Dict):
+        """Yields the chunks of a streamed completion."""
+        async with self._slot():
+            response = await self._create({**kwargs, 'stream': True})
+            try:
+                async for chunk in response:
+                    yield chunk
+            finally:
+                await response.close()
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
@@ -0,0 +1,298 @@
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import itertools
+import math
+import threading
+import numpy as np
+
+from strategy import CompiledStrategy, Condition
+
+# Running sums are recomputed from the window this often to stop float drift
+RESUM_INTERVAL = 1024
+# Closed trades and events kept per runner for the status view
+HISTORY_LIMIT = 200
+
+class IncrementalSMA:
+    """Simple moving average updated one value at a time in O(1), matching indicators.sma."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self._window = [0.0] * period
+        self._count = 0
+        self._sum = 0.0
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        slot = self._count % self.period
+        self._sum += x - self._window[slot]
+        self._window[slot] = x
+        self._count += 1
+        if self._count % RESUM_INTERVAL == 0:
+            self._sum = math.fsum(self._window)
+        if self._count >= self.period:
+            self.value = self._sum / self.period
+        return self.value
+
+class IncrementalEMA:
+    """Exponential moving average seeded with the SMA of the first window, matching indicators.ema."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self._count = 0
+        self._sum = 0.0
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        self._count += 1
+        if self._count < self.period:
+            self._sum += x
+        elif self._count == self.period:
+            self.value = (self._sum + x) / self.period
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+INCREMENTAL_AVERAGES = {'SMA': IncrementalSMA, 'EMA': IncrementalEMA}
+
+class IndicatorSet:
+    """Incremental moving averages for one bar stream, shared by every runner on it.
+
+    Each (kind, period) is updated once per bar however many strategies use it.
+    """
+
+    def __init__(self):
+        self._averages = {}
+
+    def require(self, kind: str, period: int) -> None:
+        if (kind, period) not in self._averages:
+            self._averages[(kind, period)] = INCREMENTAL_AVERAGES[kind](period)
+
+    def update(self, close: float) -> None:
+        for average in self._averages.values():
+            average.update(close)
+
+    def value(self, kind: str, period: int) -> float:
+        return self._averages[(kind, period)].value
+
+class _ConditionState:
+    # Tracks whether a crossover condition's state turned on at the latest bar
+    def __init__(self, condition: Condition):
+        self.condition = condition
+        self.above = condition.operator == 'crosses_above'
+        self.previous = None  # state on the previous bar, None while either average is warming up
+
+    def update(self, indicators: IndicatorSet) -> bool:
+        fast = indicators.value(self.condition.fast.kind, self.condition.fast.period)
+        slow = indicators.value(self.condition.slow.kind, self.condition.slow.period)
+        if math.isnan(fast) or math.isnan(slow):
+            self.previous = None
+            return False
+        state = bool(fast > slow) if self.above else bool(fast < slow)
+        fired = state and self.previous is False
+        self.previous = state
+        return fired
+
+class StrategyRunner:
+    """Paper-trades one compiled strategy bar by bar with the fill rules of backtest.run_backtest.
+
+    On each closed bar an open position is first checked against its stop-loss
+    and take-profit (stop first if both are inside the bar, filling at the
+    level or the open if the bar gapped through it), then against the exit
+    signal at the close. A flat runner enters on an entry signal at the close,
+    but not on the bar a position was closed.
+    """
+
+    def __init__(self, strategy: CompiledStrategy, instrument: str, timeframe: str,
+                 initial_capital: float = 10000.0, fee_rate: float = 0.001):
+        self.strategy = strategy
+        self.instrument = instrument
+        self.timeframe = timeframe
+        self.fee_rate = fee_rate
+        self.initial_capital = initial_capital
+        self.realised = initial_capital
+        self.equity = initial_capital
+        self.position = None  # {'entry_time', 'entry_price'}
+        self.trades = []  # the latest HISTORY_LIMIT closed trades
+        self.events = []
+        self.num_trades = 0
+        self.bars = 0
+        self.last_bar = None
+        self._entry = _ConditionState(strategy.entry)
+        self._exit = _ConditionState(strategy.exit)
+
+    def averages(self) -> List[Tuple[str, int]]:
+        conditions = (self.strategy.entry, self.strategy.exit)
+        return [(average.kind, average.period) for c in conditions for average in (c.fast, c.slow)]
+
+    def on_bar(self, bar: Dict, indicators: IndicatorSet) -> None:
+        """Processes one closed bar; `indicators` must already include it."""
+        self.bars += 1
+        self.last_bar = bar
+        entry_signal = self._entry.update(indicators)
+        exit_signal = self._exit.update(indicators)
+        closed = False
+
+        if self.position is not None:
+            closed = self._check_levels(bar)
+            if not closed and exit_signal:
+                self._close(bar, bar['close'], 'signal')
+                closed = True
+        if self.position is None and not closed and entry_signal:
+            self.position = {'entry_time': int(bar['time']), 'entry_price': float(bar['close'])}
+            self._event(bar, 'entry', bar['close'])
+
+        if self.position is not None:
+            move = bar['close'] / self.position['entry_price'] - 1
+            self.equity = self.realised * (1 + self.strategy.position_fraction * move)
+        else:
+            self.equity = self.realised
+
+    def _check_levels(self, bar: Dict) -> bool:
+        entry_price = self.position['entry_price']
+        stop, target = self.strategy.stop_loss, self.strategy.take_profit
+        if stop and bar['low'] <= entry_price * (1 - stop):
+            self._close(bar, min(bar['open'], entry_price * (1 - stop)), 'stop_loss')
+            return True
+        if target and bar['high'] >= entry_price * (1 + target):
+            self._close(bar, max(bar['open'], entry_price * (1 + target)), 'take_profit')
+            return True
+        return False
+
+    def _close(self, bar: Dict, price: float, reason: str) -> None:
+        entry_price = self.position['entry_price']
+        trade_return = (price * (1 - self.fee_rate)) / (entry_price * (1 + self.fee_rate)) - 1
+        self.realised *= 1 + self.strategy.position_fraction * trade_return
+        self.trades.append({'entry_time': self.position['entry_time'], 'exit_time': int(bar['time']),
+                            'entry_price': entry_price, 'exit_price': float(price), 'return': trade_return,
+                            'exit_reason': reason})
+        del self.trades[:-HISTORY_LIMIT]
+        self.num_trades += 1
+        self.position = None
+        self._event(bar, 'exit', price, reason)
+
+    def _event(self, bar: Dict, kind: str, price: float, reason: Optional[str] = None) -> None:
+        self.events.append({'time': int(bar['time']), 'type': kind, 'price': float(price), 'reason': reason})
+        del self.events[:-HISTORY_LIMIT]
+
+    def status(self) -> Dict:
+        return {'strategy': self.strategy.name, 'instrument': self.instrument, 'timeframe': self.timeframe,
+                'bars': self.bars, 'last_time': int(self.last_bar['time']) if self.last_bar else None,
+                'last_close': float(self.last_bar['close']) if self.last_bar else None,
+                'position': self.position, 'equity': self.equity, 'realised': self.realised,
+                'return': self.equity / self.initial_capital - 1, 'num_trades': self.num_trades,
+                'trades': self.trades[-20:], 'events': self.events[-20:]}
+
+async def replay_feed(candles: Dict[str, np.ndarray], bars_per_second: float = 0.0) -> AsyncIterator[Dict]:
+    """Replays historical candle columns as a stream of closed bars.
+
+    bars_per_second of 0 replays as fast as the consumer takes bars, yielding
+    to the event loop between bars.
+    """
+    columns = ('time', 'open', 'high', 'low', 'close', 'volume')
+    arrays = [np.asarray(candles[field]).tolist() for field in columns if field in candles]
+    fields = [field for field in columns if field in candles]
+    interval = 1.0 / bars_per_second if bars_per_second else 0.0
+    for values in zip(*arrays):
+        yield dict(zip(fields, values))
+        await asyncio.sleep(interval)
+
+class _Stream:
+    # One bar feed shared by the runners trading its instrument and timeframe
+    def __init__(self, feed: AsyncIterator[Dict]):
+        self.feed = feed
+        self.indicators = IndicatorSet()
+        self.runners = {}
+        self.task = None
+        self.done = False
+        self.error = None
+
+class AutomationEngine:
+    """Runs paper-trading strategies on bar feeds, all on one asyncio loop in a background thread.
+
+    Runners added with the same stream key (e.g. instrument and timeframe)
+    share one feed and one IndicatorSet; each bar updates the shared averages
+    once and is then passed to every runner on the stream. `feed_factory(key)`
+    returns the async bar iterator for a key when no running stream has it.
+    Runners stay listed after their feed ends until they are removed.
+    """
+
+    def __init__(self, feed_factory: Callable[[Tuple], AsyncIterator[Dict]]):
+        self.feed_factory = feed_factory
+        self._live = {}  # stream key -> running _Stream
+        self._runners = {}  # runner id -> (_Stream, StrategyRunner, owner)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='automation', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def call(self, coroutine):
+        """Runs a coroutine on the engine loop from another thread and returns its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_loop()).result()
+
+    def add(self, key: Tuple, runner: StrategyRunner, owner: Optional[str] = None) -> int:
+        """Starts a runner on the stream for `key` and returns its id."""
+        runner_id = next(self._ids)
+        self.call(self._add(key, runner_id, runner, owner))
+        return runner_id
+
+    async def _add(self, key: Tuple, runner_id: int, runner: StrategyRunner, owner: Optional[str]) -> None:
+        stream = self._live.get(key)
+        if stream is None:
+            stream = self._live[key] = _Stream(self.feed_factory(key))
+            stream.task = asyncio.get_running_loop().create_task(self._pump(key, stream))
+        # A runner joining a running stream starts with averages warmed up on earlier bars,
+        # and any average it adds warms up from here
+        for kind, period in runner.averages():
+            stream.indicators.require(kind, period)
+        stream.runners[runner_id] = runner
+        self._runners[runner_id] = (stream, runner, owner)
+
+    async def _pump(self, key: Tuple, stream: _Stream) -> None:
+        try:
+            async for bar in stream.feed:
+                stream.indicators.update(bar['close'])
+                for runner in list(stream.runners.values()):
+                    runner.on_bar(bar, stream.indicators)
+        except Exception as e:
+            print(f"Automation stream {key} failed: {e}")
+            stream.error = str(e)
+        finally:
+            stream.done = True
+            if self._live.get(key) is stream:
+                del self._live[key]
+            if hasattr(stream.feed, 'aclose'):
+                await stream.feed.aclose()
+
+    def remove(self, runner_id: int, owner: Optional[str] = None) -> Optional[StrategyRunner]:
+        """Stops and forgets a runner; returns None if there is no such runner for `owner`."""
+        return self.call(self._remove(runner_id, owner))
+
+    async def _remove(self, runner_id: int, owner: Optional[str]) -> Optional[StrategyRunner]:
+        entry = self._runners.get(runner_id)
+        if entry is None or (owner is not None and entry[2] != owner):
+            return None
+        del self._runners[runner_id]
+        stream, runner, _ = entry
+        del stream.runners[runner_id]
+        if not stream.runners and not stream.done:
+            # Last runner gone: stop reading the feed
+            stream.task.cancel()
+        return runner
+
+    def status(self, owner: Optional[str] = None) -> List[Dict]:
+        """Status of every runner, or of those added by `owner`, in the order they were added."""
+        return self.call(self._status(owner))
+
+    async def _status(self, owner: Optional[str]) -> List[Dict]:
+        return [{**runner.status(), 'id': runner_id, 'running': not stream.done, 'error': stream.error}
+                for runner_id, (stream, runner, runner_owner) in self._runners.items()
+                if owner is None or runner_owner == owner]
@@ -0,0 +1,199 @@
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from indicators import SeriesIndicators
+from strategy import CompiledStrategy
+
+# Used to annualize per-bar returns when computing the Sharpe ratio
+BARS_PER_YEAR = {'1h': 24 * 365, '4h': 6 * 365, '1d': 365}
+
+EXIT_REASONS = np.array(['signal', 'end', 'stop_loss', 'take_profit'])
+SIGNAL, END, STOP_LOSS, TAKE_PROFIT = range(len(EXIT_REASONS))
+
+def _stop_exit(candles: Dict[str, np.ndarray], bar: np.ndarray, entry_price: np.ndarray,
+               stop: float, target: float) -> Tuple[np.ndarray, np.ndarray]:
+    # Exit price and reason for trades whose stop or target was hit at `bar`.
+    # The stop is assumed to fill first when both levels are inside one bar.
+    stop_price, target_price = entry_price * (1 - stop), entry_price * (1 + target)
+    stopped = (candles['low'][bar] <= stop_price) if stop else np.zeros(len(bar), dtype=bool)
+    price = np.where(stopped, np.minimum(candles['open'][bar], stop_price),
+                     np.maximum(candles['open'][bar], target_price))
+    return price, np.where(stopped, STOP_LOSS, TAKE_PROFIT)
+
+def _level_hits(candles: Dict[str, np.ndarray], bars: np.ndarray, entry_price: np.ndarray,
+                stop: float, target: float) -> np.ndarray:
+    hits = np.zeros(len(bars), dtype=bool)
+    if stop:
+        hits |= candles['low'][bars] <= entry_price * (1 - stop)
+    if target:
+        hits |= candles['high'][bars] >= entry_price * (1 + target)
+    return hits
+
+def _simulate_trades(candles: Dict[str, np.ndarray], entries: np.ndarray, exits: np.ndarray,
+                     stop: float, target: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Finds the trades taken by a long-only strategy that holds one position at a time.
+
+    Entries are grouped by how many exit signals precede them; the first entry of
+    each group opens a trade that the group's closing exit signal ends, so without
+    stops every trade is found in one pass. Stops and targets can only shorten a
+    trade, which matters only if a group holds a second entry that could then
+    open another trade. When no group does (the usual case for a crossover that
+    exits on its own reverse cross), all trades' bars are scanned for levels at
+    once; otherwise trades are walked one by one.
+
+    Returns:
+        (starts, ends, entry prices, exit prices, exit reason codes)
+    """
+    close = candles['close']
+    n = len(close)
+    entry_idx = np.flatnonzero(entries)
+    exit_idx = np.flatnonzero(exits)
+    groups = np.searchsorted(exit_idx, entry_idx, side='right')
+    first = np.ones(len(groups), dtype=bool)
+    first[1:] = groups[1:] != groups[:-1]
+    # An entry on an exit bar is only allowed if no trade closed there, which
+    # grouping can't tell, so that case is also walked
+    if (entries & exits).any() or ((stop or target) and not first.all()):
+        return _simulate_trades_sequential(candles, entry_idx, exit_idx, stop, target)
+
+    starts = entry_idx[first]
+    groups = groups[first]
+    has_exit = groups < len(exit_idx)
+    ends = np.full(len(starts), n - 1, dtype=np.int64)
+    ends[has_exit] = exit_idx[groups[has_exit]]
+    entry_prices = close[starts]
+    exit_prices = close[ends]
+    reasons = np.where(has_exit, SIGNAL, END)
+
+    if (stop or target) and len(starts):
+        # Trade windows (start, end] are disjoint, so lay them end to end and scan once
+        lengths = ends - starts
+        trade = np.repeat(np.arange(len(starts)), lengths)
+        offsets = np.arange(len(trade)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        bars = starts[trade] + 1 + offsets
+        hits = np.flatnonzero(_level_hits(candles, bars, entry_prices[trade], stop, target))
+        hit_trades, first_hit = np.unique(trade[hits], return_index=True)
+        hit_bars = bars[hits[first_hit]]
+        ends[hit_trades] = hit_bars
+        exit_prices[hit_trades], reasons[hit_trades] = _stop_exit(
+            candles, hit_bars, entry_prices[hit_trades], stop, target)
+    return starts, ends, entry_prices, exit_prices, reasons
+
+def _simulate_trades_sequential(candles: Dict[str, np.ndarray], entry_idx: np.ndarray, exit_idx: np.ndarray,
+                                stop: float, target: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Walks trade by trade (not bar by bar): each step finds the next entry after the
+    # previous exit and scans the bars it holds for a stop/target hit in one array op.
+    close = candles['close']
+    n = len(close)
+    starts, ends, entry_prices, exit_prices, reasons = [], [], [], [], []
+    last_exit = -1
+    while True:
+        k = np.searchsorted(entry_idx, last_exit, side='right')
+        if k >= len(entry_idx):
+            break
+        start = entry_idx[k]
+        price = close[start]
+        j = np.searchsorted(exit_idx, start, side='right')
+        end = exit_idx[j] if j < len(exit_idx) else n - 1
+        exit_price, reason = close[end], SIGNAL if j < len(exit_idx) else END
+        hits = _level_hits(candles, np.arange(start + 1, end + 1), price, stop, target)
+        if hits.any():
+            end = start + 1 + int(hits.argmax())
+            exit_price, reason = _stop_exit(candles, np.array([end]), np.array([price]), stop, target)
+            exit_price, reason = exit_price[0], reason[0]
+        starts.append(start)
+        ends.append(end)
+        entry_prices.append(price)
+        exit_prices.append(exit_price)
+        reasons.append(reason)
+        last_exit = end
+    return (np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64),
+            np.array(entry_prices, dtype=np.float64), np.array(exit_prices, dtype=np.float64),
+            np.array(reasons, dtype=np.int64))
+
+def _equity_curve(close: np.ndarray, starts: np.ndarray, ends: np.ndarray, entry_prices: np.ndarray,
+                  returns: np.ndarray, fraction: float, initial_capital: float) -> np.ndarray:
+    n = len(close)
+    # Equity after each closed trade; realised[0] is the starting capital
+    realised = initial_capital * np.concatenate(([1.0], np.cumprod(1 + fraction * returns)))
+    # Trades never share a start or end bar, so marking and summing counts them per bar
+    marks = np.zeros(n + 1, dtype=np.int64)
+    marks[ends] = 1
+    equity = realised[np.cumsum(marks[:n])]
+    if len(starts):
+        # Bars strictly inside a trade are marked to market against the entry price
+        marks[:] = 0
+        marks[starts + 1] = 1
+        trade = np.cumsum(marks[:n]) - 1
+        closed = np.zeros(n + 1, dtype=np.int64)
+        closed[ends] = 1
+        open_mask = (trade >= 0) & (trade == np.cumsum(closed[:n]))
+        open_mask[ends] = False
+        t = trade[open_mask]
+        equity[open_mask] = realised[t] * (1 + fraction * (close[open_mask] / entry_prices[t] - 1))
+    return equity
+
+def run_backtest(candles: Dict[str, np.ndarray], strategy: CompiledStrategy, timeframe: str = '1h',
+                 initial_capital: float = 10000.0, fee_rate: float = 0.001,
+                 indicators: Optional[SeriesIndicators] = None) -> Dict:
+    """Runs a long-only crossover strategy over whole OHLCV columns.
+
+    Entries and exits fill at the close of the signal bar. Stop-loss and
+    take-profit levels are checked against the highs and lows of the following
+    bars, filling at the level (or the open, if the bar gapped through it).
+
+    Args:
+        candles (Dict[str, np.ndarray]): 'time', 'open', 'high', 'low', 'close' arrays
+        strategy (CompiledStrategy): see strategy.compile_strategy
+        timeframe (str): used to annualize the Sharpe ratio
+        initial_capital (float): starting equity
+        fee_rate (float): fee charged on both entry and exit notional
+        indicators (SeriesIndicators): cached indicator source aligned with candles;
+            computed from candles without caching if omitted
+
+    Returns:
+        Dict: {'metrics': Dict, 'trades': Dict[str, np.ndarray], 'equity': np.ndarray}
+    """
+    # Plain ndarray views of memory-mapped columns avoid memmap indexing overhead
+    candles = {field: np.asarray(values) for field, values in candles.items()}
+    close = candles['close']
+    if indicators is None:
+        indicators = SeriesIndicators(candles)
+    entries = strategy.entry.signal(indicators)
+    exits = strategy.exit.signal(indicators)
+    stop, target = strategy.stop_loss, strategy.take_profit
+    fraction = strategy.position_fraction
+
+    starts, ends, entry_prices, exit_prices, reasons = _simulate_trades(candles, entries, exits, stop, target)
+    returns = (exit_prices * (1 - fee_rate)) / (entry_prices * (1 + fee_rate)) - 1
+    equity = _equity_curve(close, starts, ends, entry_prices, returns, fraction, initial_capital)
+
+    trades = {
+        'entry_time': candles['time'][starts],
+        'exit_time': candles['time'][ends],
+        'entry_price': entry_prices,
+        'exit_price': exit_prices,
+        'return': returns,
+        'exit_reason': EXIT_REASONS[reasons],
+    }
+    return {'metrics': compute_metrics(equity, returns, timeframe), 'trades': trades, 'equity': equity}
+
+def compute_metrics(equity: np.ndarray, returns: np.ndarray, timeframe: str = '1h') -> Dict:
+    if len(equity) == 0:
+        return {'total_return': 0.0, 'max_drawdown': 0.0, 'sharpe': 0.0, 'num_trades': 0, 'win_rate': 0.0}
+    bar_returns = np.diff(equity) / equity[:-1]
+    std = bar_returns.std() if len(bar_returns) else 0.0
+    sharpe = bar_returns.mean() / std * np.sqrt(BARS_PER_YEAR.get(timeframe, 365)) if std > 0 else 0.0
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+    return {
+        'total_return': float(equity[-1] / equity[0] - 1),
+        'max_drawdown': float(drawdown.max()),
+        'sharpe': float(sharpe),
+        'num_trades': int(len(returns)),
+        'win_rate': float((returns > 0).mean()) if len(returns) else 0.0,
+    }
+
+def trades_to_records(trades: Dict[str, np.ndarray]) -> List[Dict]:
+    # Converts the column-oriented trade table to JSON-friendly rows
+    columns = {k: v.tolist() for k, v in trades.items()}
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
@@ -0,0 +1,289 @@
+"""Benchmarks for the app's hot paths.
+
+    python benchmarks.py                       # every group
+    python benchmarks.py backtest sse          # some groups
+    python benchmarks.py --save bench.json     # record a baseline
+    python benchmarks.py --baseline bench.json --tolerance 0.25   # exit 1 if any case got slower
+
+Each case reports the best time per operation over several repeats, on
+synthetic candles so results don't depend on the data directory. The OpenAI
+client is replaced by a canned stream, so nothing leaves the machine.
+"""
+from typing import Callable, Dict, Iterator, List, Tuple
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+_tmp = tempfile.mkdtemp(prefix='bench-')
+for key, value in (('OPENAI_API_KEY', 'benchmark'), ('FLASK_SECRET_KEY', 'benchmark'),
+                   ('RESPONSE_CACHE_DB', os.path.join(_tmp, 'response_cache.db')),
+                   ('RESULTS_DB', os.path.join(_tmp, 'results.db'))):
+    os.environ.setdefault(key, value)
+
+from openai.types.chat import ChatCompletionChunk
+
+import app
+import backtest
+import robustness
+import sse
+from automation import IndicatorSet, StrategyRunner
+from conversation_store import create_conversation_store
+from indicators import IndicatorCache, SeriesIndicators, ema, sma
+from market_data import BarAggregator, MarketDataBus
+from result_store import ResultStore, equity_points, trade_page
+from response_cache import ResponseCache
+from strategy import StrategyCache, compile_strategy
+from strategy_store import StrategyStore
+from sweep import apply_params
+
+BASE_DEFINITION = {
+    'strategy_name': 'Benchmark Crossover',
+    'entry_condition': {'indicator': 'SMA', 'condition': 'SMA10 crosses above SMA50',
+                        'parameter_1': {'name': 'fast_period', 'value': 10},
+                        'parameter_2': {'name': 'slow_period', 'value': 50},
+                        'parameter_3': {'name': 'N/A', 'value': 0}},
+    'exit_condition': {'indicator': 'SMA', 'condition': 'SMA10 crosses below SMA50',
+                       'parameter_1': {'name': 'fast_period', 'value': 10},
+                       'parameter_2': {'name': 'slow_period', 'value': 50},
+                       'parameter_3': {'name': 'N/A', 'value': 0}},
+    'position_size': {'type': 'percentage', 'value': 100},
+    'stop_loss': {'condition': 'percentage', 'parameter_1': {'name': 'percentage', 'value': 0},
+                  'parameter_2': {'name': 'N/A', 'value': 0}, 'parameter_3': {'name': 'N/A', 'value': 0}},
+    'take_profit': {'condition': 'percentage', 'parameter_1': {'name': 'percentage', 'value': 0},
+                    'parameter_2': {'name': 'N/A', 'value': 0}, 'parameter_3': {'name': 'N/A', 'value': 0}},
+}
+
+# (case name, seconds per operation, units of work per operation, unit)
+Case = Tuple[str, float, float, str]
+
+def measure(fn: Callable, number: int = 1, repeat: int = 5) -> float:
+    # Best seconds per call over `repeat` runs of `number` calls
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+def synthetic_candles(n: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.005, n)) * close
+    return {'time': 1_600_000_000 + 3600 * np.arange(n, dtype=np.int64), 'open': open_,
+            'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+            'close': close, 'volume': rng.exponential(10, n)}
+
+def strategies(count: int, stops: bool = False) -> List:
+    compiled = []
+    for i in range(count):
+        values = (5 + i % 20, 30 + 5 * (i // 20), 2 if stops else 0, 4 if stops else 0)
+        compiled.append(compile_strategy(apply_params(
+            BASE_DEFINITION, ['fast_period', 'slow_period', 'stop_loss', 'take_profit'], values)))
+    return compiled
+
+def bench_backtest() -> Iterator[Case]:
+    for n in (10_000, 100_000):
+        candles = synthetic_candles(n)
+        for stops in (False, True):
+            batch = strategies(20, stops)
+            indicators = SeriesIndicators(candles, ('bench', n), cache=IndicatorCache())
+            run = lambda: [backtest.run_backtest(candles, s, indicators=indicators) for s in batch]
+            label = 'with stops' if stops else 'signals only'
+            yield f"backtest {n} bars x 20 strategies, {label}", measure(run, repeat=3), n * 20, 'bars'
+    candles = synthetic_candles(30_000)
+    result = backtest.run_backtest(candles, strategies(1)[0])
+    returns = result['trades']['return']
+    yield (f"monte carlo 10000 resamples of {len(returns)} trades",
+           measure(lambda: robustness.monte_carlo(returns, 1.0, 10_000, seed=0), repeat=3), 10_000, 'paths')
+
+def bench_indicators() -> Iterator[Case]:
+    close = synthetic_candles(100_000)['close']
+    yield "sma(50) 100000 bars", measure(lambda: sma(close, 50), 10), 100_000, 'bars'
+    yield "ema(50) 100000 bars", measure(lambda: ema(close, 50), 10), 100_000, 'bars'
+    indicators = SeriesIndicators({'close': close}, ('bench',), cache=IndicatorCache())
+    indicators.moving_average('SMA', 50)
+    yield "cached moving average lookup", measure(lambda: indicators.moving_average('SMA', 50), 10_000), 1, 'lookups'
+
+def bench_automation() -> Iterator[Case]:
+    candles = synthetic_candles(30_000)
+    bars = [dict(zip(candles, values)) for values in zip(*(candles[f].tolist() for f in candles))]
+    def replay():
+        runner = StrategyRunner(strategies(1, stops=True)[0], 'BTC/USD', '1h')
+        indicators = IndicatorSet()
+        for kind, period in runner.averages():
+            indicators.require(kind, period)
+        for bar in bars:
+            indicators.update(bar['close'])
+            runner.on_bar(bar, indicators)
+    yield "paper-trading runner, 30000 bars", measure(replay, repeat=3), len(bars), 'bars'
+
+    ticks = synthetic_candles(200_000)['close'].tolist()
+    def aggregate():
+        aggregator = BarAggregator(['1h', '4h', '1d'])
+        for i, price in enumerate(ticks):
+            aggregator.on_tick(1_600_000_000 + 60 * i, price, 1.0)
+    yield "tick aggregation to 1h/4h/1d", measure(aggregate, repeat=3), len(ticks), 'ticks'
+
+    async def fan_out():
+        bus = MarketDataBus(['BTC/USD'], ['1h'])
+        subscriptions = [bus.subscribe('BTC/USD', '1h') for _ in range(100)]
+        async def drain(subscription):
+            async for _ in subscription:
+                pass
+        readers = [asyncio.create_task(drain(s)) for s in subscriptions]
+        for i, price in enumerate(ticks[:60_000]):
+            await bus.on_tick('BTC/USD', 1_600_000_000 + 60 * i, price, 1.0)
+        for subscription in subscriptions:
+            await subscription.aclose()
+        await asyncio.gather(*readers)
+    yield "market data bus, 60000 ticks to 100 subscribers", measure(lambda: asyncio.run(fan_out()), repeat=3), 60_000, 'ticks'
+
+def bench_strategy_store() -> Iterator[Case]:
+    store = StrategyStore(os.path.join(tempfile.mkdtemp(dir=_tmp), 'strategies.db'))
+    strategy = {'name': 'Benchmark', 'summary': 'SMA crossover', 'json': json.dumps(BASE_DEFINITION)}
+    yield "strategy store add_unique", measure(lambda: store.add_unique('bench', strategy), 50), 1, 'saves'
+    yield "strategy store list (250 strategies)", measure(lambda: store.list('bench'), 50), 1, 'lists'
+    yield "strategy store get", measure(lambda: store.get('bench', 'Benchmark (100)'), 1000), 1, 'gets'
+    cache = StrategyCache(store)
+    cache.get('bench', 'Benchmark')
+    yield "compiled strategy cache hit", measure(lambda: cache.get('bench', 'Benchmark'), 1000), 1, 'gets'
+
+def _conversation(turns: int) -> List[Dict]:
+    memory = [{'role': 'system', 'content': 'You are a helpful assistant for crypto trading strategies.'}]
+    for i in range(turns):
+        memory.append({'role': 'user', 'content': f"Turn {i}: what if the fast SMA period were {i + 5}? " * 4})
+        memory.append({'role': 'assistant', 'content': "With a shorter fast average the strategy trades more. " * 12})
+    return memory
+
+def bench_session() -> Iterator[Case]:
+    agent = app.Agent(tools=app.tool_registry.schemas())
+    agent.memory = _conversation(20)
+    state = agent.to_dict()
+    yield "agent to_dict/from_dict, 41 messages", measure(lambda: app.Agent.from_dict(agent.to_dict()), 1000), 1, 'round trips'
+    serializer = app.app.session_interface.get_signing_serializer(app.app)
+    cookie = {'conversation_id': 'a' * 32, 'user_id': 'default_user', 'backtest_instrument': 'BTC/USD'}
+    yield "session cookie sign + verify", measure(lambda: serializer.loads(serializer.dumps(cookie)), 1000), 1, 'round trips'
+    for backend in ('memory', 'sqlite'):
+        store = create_conversation_store(backend, os.path.join(_tmp, 'conversations.db'))
+        conversation_id = store.create(state['model'], state['tools'])
+        store.append(conversation_id, state['memory'])
+        def turn():
+            store.load(conversation_id)
+            store.append(conversation_id, state['memory'][-2:])
+        yield f"conversation store load + append ({backend})", measure(turn, 200), 1, 'turns'
+
+def _chunks(tokens: List[str]) -> List[ChatCompletionChunk]:
+    return [ChatCompletionChunk.model_validate({
+        'id': 'bench', 'object': 'chat.completion.chunk', 'created': 0, 'model': app.GPT_MODEL,
+        'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}) for token in tokens]
+
+class _CannedClient:
+    # Stands in for OpenAI(): every completion streams the same chunks
+    def __init__(self, chunks):
+        self.chat = self
+        self.completions = self
+        self.chunks = chunks
+
+    def create(self, **kwargs):
+        return iter(self.chunks)
+
+def bench_sse() -> Iterator[Case]:
+    tokens = [f" token{i}" if i % 50 else "\nline" for i in range(2000)]
+    yield "encode_event", measure(lambda: sse.encode_event("Some streamed text\nover two lines"), 10_000), 1, 'events'
+    yield "stream_events, 2000 tokens", measure(lambda: list(sse.stream_events(iter(tokens))), 20), 2000, 'tokens'
+    chunks = _chunks(tokens)
+    client = app.client
+    app.client = _CannedClient(chunks)
+    try:
+        def chat_turn():
+            agent = app.Agent(system_prompt={'role': 'system', 'content': 'Benchmark'})
+            response = agent.invoke('Explain the strategy')
+            return ''.join(agent._handle_stream_response(response))
+        yield "agent streamed reply, 2000 chunks, mocked client", measure(chat_turn, 20), 2000, 'tokens'
+    finally:
+        app.client = client
+
+def bench_caches() -> Iterator[Case]:
+    cache = ResponseCache(os.path.join(_tmp, 'bench_response_cache.db'))
+    kwargs = app.completion_kwargs(_conversation(5), stream=False)
+    content = "summary " * 200
+    yield "response cache store", measure(lambda: cache.store_content(kwargs, content), 200), 1, 'stores'
+    yield "response cache lookup (hit)", measure(lambda: cache.lookup(kwargs), 1000), 1, 'lookups'
+
+    candles = synthetic_candles(30_000)
+    result = backtest.run_backtest(candles, strategies(1, stops=True)[0])
+    results = ResultStore(os.path.join(_tmp, 'bench_results.db'))
+    result_id = results.save('bench', candles['time'], result['equity'], result['trades'])
+    yield "result store save, 30000 bars", measure(
+        lambda: results.save('bench', candles['time'], result['equity'], result['trades']), 20), 1, 'saves'
+    curve, trades = results.load('bench', result_id)
+    yield "result store load", measure(lambda: results.load('bench', result_id), 100), 1, 'loads'
+    yield "equity curve 30000 -> 1000 points (lttb)", measure(lambda: equity_points(curve, 1000), 50), 30_000, 'points'
+    yield "equity curve 30000 -> 1000 points (minmax)", measure(
+        lambda: equity_points(curve, 1000, 'minmax'), 50), 30_000, 'points'
+    yield "trade page sorted by return", measure(lambda: trade_page(trades, 3, 50, 'return', True), 200), 1, 'pages'
+
+GROUPS = {
+    'backtest': bench_backtest,
+    'indicators': bench_indicators,
+    'automation': bench_automation,
+    'strategy_store': bench_strategy_store,
+    'session': bench_session,
+    'sse': bench_sse,
+    'caches': bench_caches,
+}
+
+def _format_seconds(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot paths.")
+    parser.add_argument('groups', nargs='*', help=f"groups to run (default: all): {', '.join(GROUPS)}")
+    parser.add_argument('--save', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare against results saved with --save")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="slowdown over the baseline reported as a regression (default 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+    unknown = [group for group in args.groups if group not in GROUPS]
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(unknown)}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, regressions = {}, []
+    for group in args.groups or list(GROUPS):
+        print(f"== {group}")
+        for name, seconds, work, unit in GROUPS[group]():
+            results[name] = seconds
+            line = f"  {name:<55} {_format_seconds(seconds):>10}  {work / seconds:>14,.0f} {unit}/s"
+            if name in baseline:
+                change = seconds / baseline[name] - 1
+                line += f"  {change:+.0%}"
+                if change > args.tolerance:
+                    regressions.append(name)
+                    line += "  REGRESSION"
+            print(line, flush=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        print(f"{len(regressions)} case(s) slower than the baseline by more than {args.tolerance:.0%}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,62 @@
+from typing import Dict, List
+from functools import lru_cache
+import json
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding('o200k_base')
+except Exception:  # tiktoken is optional; fall back to an estimate
+    _encoding = None
+
+# Chat formatting overhead per message, as documented for OpenAI chat models
+TOKENS_PER_MESSAGE = 4
+# After summarizing, recent history is trimmed to this share of its budget so a
+# summary call is only needed every few turns rather than on every turn
+LOW_WATERMARK = 0.5
+
+SUMMARY_PROMPT = ("You maintain a running summary of a conversation about crypto trading strategies. "
+                  "Merge the previous summary and the new messages into one concise summary that keeps "
+                  "every strategy detail discussed: indicators, periods, entry/exit conditions, stop-loss, "
+                  "take-profit and position sizing.")
+
+@lru_cache(maxsize=8192)
+def count_text_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+def count_message_tokens(message: Dict) -> int:
+    content = message.get('content') or ''
+    if not isinstance(content, str):
+        content = json.dumps(content)
+    tokens = TOKENS_PER_MESSAGE + count_text_tokens(content)
+    if message.get('tool_calls'):
+        tokens += count_text_tokens(json.dumps(message['tool_calls']))
+    return tokens
+
+def count_tokens(messages: List[Dict]) -> int:
+    return sum(count_message_tokens(m) for m in messages)
+
+def fit_suffix(messages: List[Dict], budget: int) -> int:
+    """Returns the start index of the longest suffix of messages that fits in budget.
+
+    The last message is always kept, even if it alone exceeds the budget.
+    """
+    used = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        used += count_message_tokens(messages[i])
+        if used > budget and i < len(messages) - 1:
+            break
+        start = i
+    return start
+
+def summary_request(previous_summary: str, messages: List[Dict]) -> List[Dict]:
+    transcript = '\n'.join(f"{m['role']}: {m.get('content') or ''}" for m in messages)
+    return [
+        {'role': 'system', 'content': SUMMARY_PROMPT},
+        {'role': 'user', 'content': f"Previous summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"},
+    ]
+
+def summary_message(summary: str) -> Dict:
+    return {'role': 'system', 'content': f"Summary of the earlier conversation:\n{summary}"}
@@ -0,0 +1,177 @@
+from typing import Dict, List, Optional
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+# Expired conversations are swept at most this often
+EVICTION_INTERVAL_SECONDS = 60
+
+class InMemoryConversationStore:
+    """Conversations held in this process, evicted after `ttl_seconds` without use.
+
+    Only suitable for a single worker process; use SQLiteConversationStore otherwise.
+    """
+
+    def __init__(self, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._conversations = {}
+        self._lock = threading.Lock()
+        self._last_eviction = time.time()
+
+    def create(self, model: str, tools: List[Dict]) -> str:
+        conversation_id = uuid.uuid4().hex
+        with self._lock:
+            self._evict_expired()
+            self._conversations[conversation_id] = {'model': model, 'tools': tools, 'messages': [],
+                                                    'summary': '', 'summarized_length': 0,
+                                                    'updated_at': time.time()}
+        return conversation_id
+
+    def load(self, conversation_id: str) -> Optional[Dict]:
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None or conversation['updated_at'] < time.time() - self.ttl_seconds:
+                return None
+            conversation['updated_at'] = time.time()
+            return {'model': conversation['model'], 'tools': conversation['tools'],
+                    'memory': list(conversation['messages']), 'summary': conversation['summary'],
+                    'summarized_length': conversation['summarized_length']}
+
+    def append(self, conversation_id: str, messages: List[Dict]) -> None:
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                raise KeyError(f"Unknown conversation {conversation_id}")
+            conversation['messages'].extend(messages)
+            conversation['updated_at'] = time.time()
+
+    def set_summary(self, conversation_id: str, summary: str, summarized_length: int) -> None:
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is None:
+                raise KeyError(f"Unknown conversation {conversation_id}")
+            conversation['summary'] = summary
+            conversation['summarized_length'] = summarized_length
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+    def _evict_expired(self) -> None:
+        now = time.time()
+        if now - self._last_eviction < EVICTION_INTERVAL_SECONDS:
+            return
+        self._last_eviction = now
+        cutoff = now - self.ttl_seconds
+        for conversation_id in [k for k, v in self._conversations.items() if v['updated_at'] < cutoff]:
+            del self._conversations[conversation_id]
+
+class SQLiteConversationStore:
+    """Conversations in SQLite, shared by all worker processes.
+
+    Messages are rows keyed by (conversation_id, seq), so a turn only inserts
+    its new messages instead of rewriting the conversation.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        id TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        tools TEXT NOT NULL,
+        summary TEXT NOT NULL DEFAULT '',
+        summarized_length INTEGER NOT NULL DEFAULT 0,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at);
+    CREATE TABLE IF NOT EXISTS messages (
+        conversation_id TEXT NOT NULL REFERENCES conversations (id) ON DELETE CASCADE,
+        seq INTEGER NOT NULL,
+        message TEXT NOT NULL,
+        PRIMARY KEY (conversation_id, seq)
+    );
+    """
+
+    def __init__(self, path: str, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._last_eviction = 0.0
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+            # Databases created before running summaries were stored
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(conversations)')}
+            if 'summary' not in columns:
+                conn.execute("ALTER TABLE conversations ADD COLUMN summary TEXT NOT NULL DEFAULT ''")
+                conn.execute('ALTER TABLE conversations ADD COLUMN summarized_length INTEGER NOT NULL DEFAULT 0')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+        return conn
+
+    def create(self, model: str, tools: List[Dict]) -> str:
+        conversation_id = uuid.uuid4().hex
+        conn = self._connect()
+        self._evict_expired(conn)
+        with conn:
+            conn.execute('INSERT INTO conversations (id, model, tools, updated_at) VALUES (?, ?, ?, ?)',
+                         (conversation_id, model, json.dumps(tools), time.time()))
+        return conversation_id
+
+    def load(self, conversation_id: str) -> Optional[Dict]:
+        conn = self._connect()
+        row = conn.execute('SELECT model, tools, summary, summarized_length, updated_at FROM conversations WHERE id = ?',
+                           (conversation_id,)).fetchone()
+        if row is None or row[4] < time.time() - self.ttl_seconds:
+            return None
+        messages = conn.execute('SELECT message FROM messages WHERE conversation_id = ? ORDER BY seq',
+                                (conversation_id,))
+        return {'model': row[0], 'tools': json.loads(row[1]), 'memory': [json.loads(m[0]) for m in messages],
+                'summary': row[2], 'summarized_length': row[3]}
+
+    def append(self, conversation_id: str, messages: List[Dict]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute('UPDATE conversations SET updated_at = ? WHERE id = ?', (time.time(), conversation_id))
+            if cursor.rowcount == 0:
+                raise KeyError(f"Unknown conversation {conversation_id}")
+            (start,) = conn.execute('SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE conversation_id = ?',
+                                    (conversation_id,)).fetchone()
+            conn.executemany('INSERT INTO messages (conversation_id, seq, message) VALUES (?, ?, ?)',
+                             [(conversation_id, start + i, json.dumps(m)) for i, m in enumerate(messages)])
+
+    def set_summary(self, conversation_id: str, summary: str, summarized_length: int) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute('UPDATE conversations SET summary = ?, summarized_length = ? WHERE id = ?',
+                         (summary, summarized_length, conversation_id))
+
+    def delete(self, conversation_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM conversations WHERE id = ?', (conversation_id,))
+
+    def _evict_expired(self, conn: sqlite3.Connection) -> None:
+        now = time.time()
+        if now - self._last_eviction < EVICTION_INTERVAL_SECONDS:
+            return
+        self._last_eviction = now
+        with conn:
+            conn.execute('DELETE FROM conversations WHERE updated_at < ?', (now - self.ttl_seconds,))
+
+def create_conversation_store(backend: str = 'memory', path: str = 'conversations.db',
+                              ttl_seconds: int = DEFAULT_TTL_SECONDS):
+    if backend == 'memory':
+        return InMemoryConversationStore(ttl_seconds)
+    if backend == 'sqlite':
+        return SQLiteConversationStore(path, ttl_seconds)
+    raise ValueError(f"Unknown conversation store backend '{backend}', expected 'memory' or 'sqlite'")
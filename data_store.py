@@ -0,0 +1,182 @@
+from typing import Dict, Optional, Tuple
+from contextlib import contextmanager
+import argparse
+import os
+import threading
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DATA_DIR = 'data'
+
+# Each field is stored as a raw little-endian column so it can be appended to
+# in place and memory-mapped without a header
+FIELD_DTYPES = {
+    'time': np.dtype('<i8'),
+    'open': np.dtype('<f8'),
+    'high': np.dtype('<f8'),
+    'low': np.dtype('<f8'),
+    'close': np.dtype('<f8'),
+    'volume': np.dtype('<f8'),
+}
+# 'time' is written last so a reader never sees an index longer than the price columns
+WRITE_ORDER = ('open', 'high', 'low', 'close', 'volume', 'time')
+
+def read_csv(path: str) -> Dict[str, np.ndarray]:
+    """Parses a time,open,high,low,close,volume CSV into column arrays.
+
+    'time' may be epoch seconds or an ISO 8601 timestamp.
+    """
+    raw = np.genfromtxt(path, delimiter=',', names=True, dtype=None, encoding='utf-8')
+    raw = np.atleast_1d(raw)
+    candles = {field: raw[field].astype(np.float64) for field in FIELD_DTYPES if field != 'time'}
+    times = raw['time']
+    if times.dtype.kind in 'iuf':
+        candles['time'] = times.astype(np.int64)
+    else:
+        candles['time'] = np.array(times, dtype='datetime64[s]').astype(np.int64)
+    order = np.argsort(candles['time'], kind='stable')
+    return {field: values[order] for field, values in candles.items()}
+
+class CandleStore:
+    """On-disk columnar OHLCV store, one memory-mapped file per field.
+
+    Layout: {root}/{BTC-USD}/{1h}/{field}.bin. Reads return read-only memmap
+    views, so slicing is zero-copy and processes sharing the store share the
+    OS page cache instead of holding private copies.
+    """
+
+    def __init__(self, root: str = DATA_DIR):
+        self.root = root
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def series_dir(self, instrument: str, timeframe: str) -> str:
+        return os.path.join(self.root, instrument.replace('/', '-'), timeframe)
+
+    def _field_path(self, instrument: str, timeframe: str, field: str) -> str:
+        return os.path.join(self.series_dir(instrument, timeframe), f"{field}.bin")
+
+    def exists(self, instrument: str, timeframe: str) -> bool:
+        return os.path.exists(self._field_path(instrument, timeframe, 'time'))
+
+    def length(self, instrument: str, timeframe: str) -> int:
+        sizes = [os.path.getsize(self._field_path(instrument, timeframe, field)) // dtype.itemsize
+                 for field, dtype in FIELD_DTYPES.items()]
+        return min(sizes)
+
+    def load(self, instrument: str, timeframe: str) -> Dict[str, np.ndarray]:
+        """Returns read-only memory-mapped columns for a series.
+
+        Maps are cached per process and re-opened only when the series has grown
+        or been replaced.
+        """
+        if not self.exists(instrument, timeframe):
+            raise FileNotFoundError(f"No candle data for {instrument} {timeframe}")
+        key = (instrument, timeframe)
+        n = self.length(instrument, timeframe)
+        version = (os.stat(self._field_path(instrument, timeframe, 'time')).st_ino, n)
+        with self._lock:
+            cached = self._maps.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            columns = {}
+            for field, dtype in FIELD_DTYPES.items():
+                if n == 0:
+                    columns[field] = np.empty(0, dtype=dtype)
+                else:
+                    columns[field] = np.memmap(self._field_path(instrument, timeframe, field),
+                                               dtype=dtype, mode='r', shape=(n,))
+            self._maps[key] = (version, columns)
+            return columns
+
+    def slice(self, instrument: str, timeframe: str, start: Optional[int] = None,
+              end: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Returns zero-copy views of the bars with start <= time < end (epoch seconds)."""
+        columns = self.load(instrument, timeframe)
+        lo, hi = self.index_range(columns['time'], start, end)
+        return {field: values[lo:hi] for field, values in columns.items()}
+
+    @staticmethod
+    def index_range(times: np.ndarray, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[int, int]:
+        lo = int(np.searchsorted(times, start, side='left')) if start is not None else 0
+        hi = int(np.searchsorted(times, end, side='left')) if end is not None else len(times)
+        return lo, hi
+
+    def write(self, instrument: str, timeframe: str, candles: Dict[str, np.ndarray]) -> None:
+        # Replaces the series; new files are renamed into place so open maps stay valid
+        directory = self.series_dir(instrument, timeframe)
+        os.makedirs(directory, exist_ok=True)
+        for field in WRITE_ORDER:
+            path = self._field_path(instrument, timeframe, field)
+            np.ascontiguousarray(candles[field], dtype=FIELD_DTYPES[field]).tofile(path + '.tmp')
+            os.replace(path + '.tmp', path)
+        with self._lock:
+            self._maps.pop((instrument, timeframe), None)
+
+    def append(self, instrument: str, timeframe: str, candles: Dict[str, np.ndarray]) -> int:
+        """Appends bars newer than the last stored bar and returns how many were added.
+
+        A bar with the same time as the last stored bar overwrites it in place, so a
+        still-forming bar can be updated without rewriting the series.
+        """
+        if not self.exists(instrument, timeframe):
+            self.write(instrument, timeframe, candles)
+            return len(candles['time'])
+        n = self.length(instrument, timeframe)
+        times = self.load(instrument, timeframe)['time']
+        last = times[-1] if n else None
+        mask = slice(None) if last is None else np.asarray(candles['time']) >= last
+        new = {field: np.asarray(values)[mask] for field, values in candles.items()}
+        if len(new['time']) == 0:
+            return 0
+        replace_last = last is not None and new['time'][0] == last
+        for field in WRITE_ORDER:
+            dtype = FIELD_DTYPES[field]
+            data = np.ascontiguousarray(new[field], dtype=dtype).tobytes()
+            with open(self._field_path(instrument, timeframe, field), 'r+b') as f:
+                f.seek(((n - 1) if replace_last else n) * dtype.itemsize)
+                f.write(data)
+        return len(new['time']) - int(replace_last)
+
+    @contextmanager
+    def lock(self, instrument: str, timeframe: str):
+        # Cross-process exclusive lock for read-modify-write updates of a series
+        directory = self.series_dir(instrument, timeframe)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, '.lock'), 'a+') as f:
+            f.seek(0)
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                else:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def import_csv(self, path: str, instrument: str, timeframe: str, append: bool = False) -> int:
+        candles = read_csv(path)
+        if append:
+            return self.append(instrument, timeframe, candles)
+        self.write(instrument, timeframe, candles)
+        return len(candles['time'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import OHLCV candles from CSV into the columnar store.')
+    parser.add_argument('instrument', help="e.g. BTC/USD")
+    parser.add_argument('timeframe', help="e.g. 1h")
+    parser.add_argument('csv_path')
+    parser.add_argument('--append', action='store_true', help='only add bars newer than the stored series')
+    parser.add_argument('--root', default=DATA_DIR)
+    args = parser.parse_args()
+    count = CandleStore(args.root).import_csv(args.csv_path, args.instrument, args.timeframe, append=args.append)
+    print(f"Imported {count} bars into {args.instrument} {args.timeframe}")
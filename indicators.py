@@ -0,0 +1,124 @@
+from typing import Callable, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import os
+import threading
+import numpy as np
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    # Rolling mean from a cumulative sum, NaN until the window is full
+    out = np.full(values.shape, np.nan)
+    if period <= 0 or period > len(values):
+        return out
+    csum = np.cumsum(np.insert(values, 0, 0.0))
+    out[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return out
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    # Exponential moving average seeded with the SMA of the first window
+    out = np.full(values.shape, np.nan)
+    if period <= 0 or period > len(values):
+        return out
+    if period == 1:
+        return values.astype(np.float64)
+    alpha = 2.0 / (period + 1)
+    decay = 1.0 - alpha
+    prev = values[:period].mean()
+    out[period - 1] = prev
+    # Evaluate the recursion in closed form over blocks short enough that
+    # decay ** -k stays well inside float precision
+    block = max(1, int(np.log(1e-6) / np.log(decay)))
+    powers = decay ** np.arange(1, block + 1)
+    for start in range(period, len(values), block):
+        chunk = values[start:start + block]
+        w = powers[:len(chunk)]
+        ys = w * (prev + np.cumsum(alpha * chunk / w))
+        out[start:start + len(chunk)] = ys
+        prev = ys[-1]
+    return out
+
+MOVING_AVERAGES = {'SMA': sma, 'EMA': ema}
+
+class IndicatorCache:
+    """Thread-safe LRU cache of indicator arrays bounded by total size in bytes.
+
+    Cached arrays are marked read-only since they are shared between requests.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        # Computed outside the lock; a concurrent miss on the same key just does the work twice
+        value = compute()
+        value.flags.writeable = False
+        if value.nbytes > self.max_bytes:
+            return value
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = value
+                self.bytes += value.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+# Process-wide cache shared by all users and strategies
+indicator_cache = IndicatorCache(int(os.getenv('INDICATOR_CACHE_BYTES', 256 * 1024 * 1024)))
+
+def series_key(instrument: str, timeframe: str, candles: Dict[str, np.ndarray]) -> Tuple:
+    # Identifies a version of a series: growth changes the length, an in-place
+    # update of the forming bar changes its close
+    n = len(candles['time'])
+    if n == 0:
+        return (instrument, timeframe, 0)
+    return (instrument, timeframe, n, int(candles['time'][-1]), float(candles['close'][-1]))
+
+class SeriesIndicators:
+    """Indicator lookups for one candle series, optionally restricted to a window.
+
+    Indicators are computed over the whole series and then sliced, so every
+    window of the same series shares one cached array and has no warm-up gap.
+    Without a key nothing is cached.
+    """
+
+    def __init__(self, candles: Dict[str, np.ndarray], key: Optional[Tuple] = None,
+                 lo: int = 0, hi: Optional[int] = None, cache: IndicatorCache = indicator_cache):
+        self.candles = candles
+        self.key = key
+        self.lo = lo
+        self.hi = len(candles['close']) if hi is None else hi
+        self.cache = cache
+
+    def window(self, lo: int, hi: int) -> 'SeriesIndicators':
+        # lo/hi are relative to the current window
+        return SeriesIndicators(self.candles, self.key, self.lo + lo, self.lo + hi, self.cache)
+
+    def moving_average(self, kind: str, period: int) -> np.ndarray:
+        compute = lambda: MOVING_AVERAGES[kind](np.asarray(self.candles['close'], dtype=np.float64), period)
+        if self.key is None:
+            values = compute()
+        else:
+            values = self.cache.get(self.key + (kind, (period,)), compute)
+        return values[self.lo:self.hi]
@@ -0,0 +1,240 @@
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import numpy as np
+
+from resample import TIMEFRAME_SECONDS
+
+# Closed bars kept per instrument and timeframe; also how far a subscriber may fall behind
+RING_CAPACITY = 1024
+
+class BarAggregator:
+    """Builds bars for several timeframes of one instrument from a tick stream in a single pass.
+
+    Each tick only updates the forming bar of the finest timeframe; when that
+    bar closes it is merged into the forming bars of the coarser timeframes,
+    which must be multiples of it. Buckets are aligned to the epoch and bars
+    are stamped with the start of their bucket, as in resample.resample. A bar
+    closes as soon as a tick (or advance()) reaches the end of its bucket.
+    """
+
+    def __init__(self, timeframes: Iterable[str]):
+        self.timeframes = sorted(timeframes, key=TIMEFRAME_SECONDS.get)
+        self.seconds = [TIMEFRAME_SECONDS[tf] for tf in self.timeframes]
+        for tf, seconds in zip(self.timeframes[1:], self.seconds[1:]):
+            if seconds % self.seconds[0]:
+                raise ValueError(f"{tf} is not a multiple of {self.timeframes[0]}")
+        self._forming = [None] * len(self.timeframes)
+
+    def on_tick(self, time: float, price: float, size: float = 0.0) -> List[Tuple[str, Dict]]:
+        """Adds one trade and returns the (timeframe, bar) pairs it closed, finest first."""
+        closed = self.advance(time)
+        bar = self._forming[0]
+        if bar is None:
+            start = int(time) // self.seconds[0] * self.seconds[0]
+            self._forming[0] = {'time': start, 'open': price, 'high': price, 'low': price, 'close': price,
+                                'volume': size}
+        else:
+            # A late tick for an already closed bucket is counted in the forming bar
+            if price > bar['high']:
+                bar['high'] = price
+            elif price < bar['low']:
+                bar['low'] = price
+            bar['close'] = price
+            bar['volume'] += size
+        return closed
+
+    def advance(self, now: float) -> List[Tuple[str, Dict]]:
+        """Closes the bars whose buckets ended by `now`; advance(inf) closes every forming bar."""
+        closed = []
+        fine = self._forming[0]
+        if fine is not None and fine['time'] + self.seconds[0] <= now:
+            closed.append((self.timeframes[0], fine))
+            self._forming[0] = None
+            for i in range(1, len(self.timeframes)):
+                closed.extend(self._merge(i, fine))
+        for i in range(1, len(self.timeframes)):
+            bar = self._forming[i]
+            if bar is not None and bar['time'] + self.seconds[i] <= now:
+                closed.append((self.timeframes[i], bar))
+                self._forming[i] = None
+        return closed
+
+    def _merge(self, i: int, fine: Dict) -> List[Tuple[str, Dict]]:
+        start = fine['time'] // self.seconds[i] * self.seconds[i]
+        bar = self._forming[i]
+        closed = []
+        if bar is not None and bar['time'] != start:
+            closed.append((self.timeframes[i], bar))
+            bar = None
+        if bar is None:
+            self._forming[i] = dict(fine, time=start)
+        else:
+            bar['high'] = max(bar['high'], fine['high'])
+            bar['low'] = min(bar['low'], fine['low'])
+            bar['close'] = fine['close']
+            bar['volume'] += fine['volume']
+        return closed
+
+class BarTopic:
+    """Ring buffer of the latest closed bars of one instrument and timeframe.
+
+    Bars are published once and every subscriber reads the same objects
+    through its own cursor, so fan-out costs nothing per subscriber until it
+    reads. Subscribers must treat bars as read-only.
+    """
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.capacity = capacity
+        self._ring = [None] * capacity
+        self.seq = 0  # bars published so far; bar n lives at slot n % capacity
+        self._subscriptions = set()
+        self._changed = asyncio.Condition()
+        self._publisher_waiting = False
+
+    def _min_lossless_cursor(self) -> Optional[int]:
+        cursors = [s.cursor for s in self._subscriptions if s.lossless]
+        return min(cursors) if cursors else None
+
+    async def publish(self, bar: Dict) -> None:
+        """Appends a closed bar, first waiting for lossless subscribers to free its slot."""
+        async with self._changed:
+            if self._ring_full():
+                self._publisher_waiting = True
+                try:
+                    await self._changed.wait_for(lambda: not self._ring_full())
+                finally:
+                    self._publisher_waiting = False
+            self._ring[self.seq % self.capacity] = bar
+            self.seq += 1
+            self._changed.notify_all()
+
+    def _ring_full(self) -> bool:
+        slowest = self._min_lossless_cursor()
+        return slowest is not None and self.seq - slowest >= self.capacity
+
+    def subscribe(self, lossless: bool = True, replay: int = 0) -> 'Subscription':
+        """Subscribes from the next published bar, or from up to `replay` bars back."""
+        start = max(self.seq - min(replay, self.capacity), 0)
+        subscription = Subscription(self, start, lossless)
+        self._subscriptions.add(subscription)
+        return subscription
+
+class Subscription:
+    """Async iterator over a topic's bars from a read cursor.
+
+    A lossless subscription never misses a bar: once the publisher is a whole
+    ring ahead of it, publishing waits for it (and so, upstream, does the tick
+    source). A lossy one, such as a chart feed, never holds the publisher up;
+    if it falls a ring behind it skips to the oldest bar still held and counts
+    the bars it missed in `dropped`.
+    """
+
+    def __init__(self, topic: BarTopic, cursor: int, lossless: bool):
+        self.topic = topic
+        self.cursor = cursor
+        self.lossless = lossless
+        self.dropped = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict:
+        topic = self.topic
+        if self.closed:
+            raise StopAsyncIteration
+        if self.cursor >= topic.seq:
+            async with topic._changed:
+                await topic._changed.wait_for(lambda: self.cursor < topic.seq or self.closed)
+            if self.closed:
+                raise StopAsyncIteration
+        oldest = topic.seq - topic.capacity
+        if self.cursor < oldest:
+            self.dropped += oldest - self.cursor
+            self.cursor = oldest
+        bar = topic._ring[self.cursor % topic.capacity]
+        self.cursor += 1
+        if self.lossless and topic._publisher_waiting:
+            async with topic._changed:
+                topic._changed.notify_all()
+        return bar
+
+    async def aclose(self) -> None:
+        # Unsubscribes; a publisher waiting on this subscription is released
+        self.closed = True
+        self.topic._subscriptions.discard(self)
+        async with self.topic._changed:
+            self.topic._changed.notify_all()
+
+class MarketDataBus:
+    """Aggregates ticks per instrument into bars for every timeframe and fans them out to subscribers.
+
+    Must be used from a single event loop, such as the AutomationEngine's.
+    """
+
+    def __init__(self, instruments: Iterable[str], timeframes: Iterable[str], capacity: int = RING_CAPACITY):
+        self.timeframes = list(timeframes)
+        self._aggregators = {instrument: BarAggregator(self.timeframes) for instrument in instruments}
+        self._topics = {(instrument, tf): BarTopic(capacity) for instrument in instruments for tf in self.timeframes}
+        self.ticks = 0
+
+    def topic(self, instrument: str, timeframe: str) -> BarTopic:
+        topic = self._topics.get((instrument, timeframe))
+        if topic is None:
+            raise KeyError(f"No market data for {instrument} {timeframe}")
+        return topic
+
+    def subscribe(self, instrument: str, timeframe: str, lossless: bool = True, replay: int = 0) -> Subscription:
+        return self.topic(instrument, timeframe).subscribe(lossless, replay)
+
+    async def on_tick(self, instrument: str, time: float, price: float, size: float = 0.0) -> None:
+        self.ticks += 1
+        for timeframe, bar in self._aggregators[instrument].on_tick(time, price, size):
+            await self._topics[(instrument, timeframe)].publish(bar)
+
+    async def advance(self, instrument: str, now: float) -> None:
+        for timeframe, bar in self._aggregators[instrument].advance(now):
+            await self._topics[(instrument, timeframe)].publish(bar)
+
+    async def run(self, instrument: str, ticks: AsyncIterator[Tuple[float, float, float]]) -> None:
+        """Feeds a tick stream of (time, price, size) into the bus until it ends.
+
+        Bars close when a tick reaches the end of their bucket, in the stream's
+        own time, so a paused stream holds its forming bars; when the stream
+        ends they are closed and published, as resample.resample keeps a
+        partial last bucket.
+        """
+        async for time, price, size in ticks:
+            await self.on_tick(instrument, time, price, size)
+        await self.advance(instrument, float('inf'))
+
+async def synthetic_ticks(start_price: float, start_time: float, seconds_per_tick: float = 1.0,
+                          volatility: float = 0.8, ticks_per_second: float = 0.0, seed: Optional[int] = None,
+                          limit: Optional[int] = None, batch: int = 4096) -> AsyncIterator[Tuple[float, float, float]]:
+    """Generates (time, price, size) trades on a geometric random walk, for testing without an exchange.
+
+    Args:
+        seconds_per_tick (float): simulated time between trades
+        volatility (float): annualized volatility of the walk
+        ticks_per_second (float): wall-clock pacing; 0 generates as fast as the consumer reads
+        limit (Optional[int]): number of ticks to generate; None runs forever
+    """
+    rng = np.random.default_rng(seed)
+    step = volatility * np.sqrt(seconds_per_tick / (365 * 24 * 60 * 60))
+    price, time, produced = float(start_price), float(start_time), 0
+    interval = 1.0 / ticks_per_second if ticks_per_second else 0.0
+    while limit is None or produced < limit:
+        n = batch if limit is None else min(batch, limit - produced)
+        # Prices and sizes are drawn a batch at a time; only the yield is per tick
+        prices = (price * np.exp(np.cumsum(rng.normal(-0.5 * step * step, step, n)))).tolist()
+        sizes = rng.exponential(0.05, n).tolist()
+        for i in range(n):
+            yield time, prices[i], sizes[i]
+            time += seconds_per_tick
+            if interval:
+                await asyncio.sleep(interval)
+            elif i % 256 == 255:
+                # Let other tasks on the loop run during an unpaced burst
+                await asyncio.sleep(0)
+        price = prices[-1]
+        produced += n
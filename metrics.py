@@ -0,0 +1,158 @@
+from typing import Callable, Dict, Iterable, List, Tuple
+import bisect
+import threading
+
+# Seconds; covers cached lookups up to slow model calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted(labels.items()))
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(key: Tuple) -> str:
+    if not key:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in key) + '}'
+
+class Counter:
+    """Monotonic count per label set."""
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self) -> List[Dict]:
+        with self._lock:
+            return [{'labels': dict(key), 'value': value} for key, value in self._values.items()]
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, as Prometheus expects."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [per-bucket counts (last is +Inf), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += n
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    samples.append((f"{self.name}_bucket", key + (('le', le),), cumulative))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+    def snapshot(self) -> List[Dict]:
+        # Count, mean and bucket-interpolated quantiles per label set
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        return [{'labels': dict(key), 'count': count, 'mean': total / count if count else 0.0,
+                 **{f"p{int(q * 100)}": self._quantile(counts, count, q) for q in (0.5, 0.9, 0.99)}}
+                for key, (counts, total, count) in series.items()]
+
+    def _quantile(self, counts: List[int], count: int, q: float) -> float:
+        # Linear interpolation inside the bucket holding the quantile; the +Inf bucket reports its lower bound
+        if not count:
+            return 0.0
+        rank = q * count
+        cumulative, lower = 0, 0.0
+        for bound, n in zip(self.buckets, counts):
+            if cumulative + n >= rank and n:
+                return lower + (bound - lower) * (rank - cumulative) / n
+            cumulative += n
+            lower = bound
+        return self.buckets[-1]
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text format or as JSON.
+
+    Collectors are called at scrape time for values kept elsewhere, such as
+    cache statistics; they return (name, help, labels, value) gauge samples.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric):
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._register(Counter(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, buckets))
+
+    def collector(self, collect: Callable[[], List[Tuple[str, str, Dict, float]]]) -> Callable:
+        self._collectors.append(collect)
+        return collect
+
+    def _gauges(self) -> Dict[str, Tuple[str, List[Tuple[Tuple, float]]]]:
+        gauges = {}
+        for collect in self._collectors:
+            for name, help, labels, value in collect():
+                gauges.setdefault(name, (help, []))[1].append((_label_key(labels), value))
+        return gauges
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{_format_labels(key)} {value}" for name, key, value in metric.samples())
+        for name, (help, samples) in self._gauges().items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{_format_labels(key)} {value}" for key, value in samples)
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self) -> Dict:
+        snapshot = {name: metric.snapshot() for name, metric in self._metrics.items()}
+        for name, (_, samples) in self._gauges().items():
+            snapshot[name] = [{'labels': dict(key), 'value': value} for key, value in samples]
+        return snapshot
+
+registry = MetricsRegistry()
+
+# Shared by the sync and async OpenAI clients
+LLM_RETRIES = registry.counter('llm_retries_total', "Completion attempts that failed and were retried")
+LLM_ERRORS = registry.counter('llm_errors_total', "Completion requests that failed after all retries")
+TIME_TO_FIRST_TOKEN = registry.histogram('llm_time_to_first_token_seconds',
+                                         "Time from the start of a turn to its first streamed text")
+
+def count_retry(retry_state) -> None:
+    # tenacity before_sleep hook
+    LLM_RETRIES.inc(function=retry_state.fn.__name__)
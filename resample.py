@@ -0,0 +1,115 @@
+from typing import Dict, Optional
+import json
+import os
+import numpy as np
+
+from data_store import CandleStore
+
+TIMEFRAME_SECONDS = {
+    '1m': 60,
+    '5m': 5 * 60,
+    '15m': 15 * 60,
+    '1h': 60 * 60,
+    '4h': 4 * 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+META_FILE = 'resampled.json'
+
+def resample(candles: Dict[str, np.ndarray], seconds: int) -> Dict[str, np.ndarray]:
+    """Aggregates OHLCV bars into buckets of `seconds`, aligned to the epoch.
+
+    Each output bar is stamped with the start of its bucket.
+    """
+    times = np.asarray(candles['time'])
+    if len(times) == 0:
+        return {field: np.asarray(values)[:0] for field, values in candles.items()}
+    buckets = times // seconds * seconds
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+    ends = np.concatenate((starts[1:], [len(times)])) - 1
+    return {
+        'time': buckets[starts],
+        'open': np.asarray(candles['open'])[starts],
+        'high': np.maximum.reduceat(candles['high'], starts),
+        'low': np.minimum.reduceat(candles['low'], starts),
+        'close': np.asarray(candles['close'])[ends],
+        'volume': np.add.reduceat(candles['volume'], starts),
+    }
+
+class Resampler:
+    """Builds coarser timeframes from the finest stored base series and keeps them current.
+
+    Aggregates are persisted in the CandleStore next to native series, with a
+    resampled.json marker recording which base they came from and how much of it
+    they cover. When the base grows only the last (possibly partial) aggregate
+    bar and the bars after it are recomputed.
+    """
+
+    def __init__(self, store: CandleStore):
+        self.store = store
+
+    def _meta_path(self, instrument: str, timeframe: str) -> str:
+        return os.path.join(self.store.series_dir(instrument, timeframe), META_FILE)
+
+    def read_meta(self, instrument: str, timeframe: str) -> Optional[Dict]:
+        path = self._meta_path(instrument, timeframe)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def is_native(self, instrument: str, timeframe: str) -> bool:
+        return self.store.exists(instrument, timeframe) and self.read_meta(instrument, timeframe) is None
+
+    def base_timeframe(self, instrument: str, timeframe: str) -> Optional[str]:
+        # The coarsest native series that evenly divides the target needs the least work
+        target = TIMEFRAME_SECONDS.get(timeframe)
+        if target is None:
+            return None
+        candidates = [tf for tf, seconds in TIMEFRAME_SECONDS.items()
+                      if seconds < target and target % seconds == 0 and self.is_native(instrument, tf)]
+        return max(candidates, key=TIMEFRAME_SECONDS.get) if candidates else None
+
+    def _base_version(self, instrument: str, base: str) -> Dict:
+        # Length alone misses in-place updates of the base's last bar, so include the mtime
+        stat = os.stat(os.path.join(self.store.series_dir(instrument, base), 'time.bin'))
+        return {'base_length': self.store.length(instrument, base), 'base_mtime_ns': stat.st_mtime_ns}
+
+    def update(self, instrument: str, timeframe: str) -> int:
+        """Brings a derived timeframe up to date with its base and returns the number of new bars."""
+        with self.store.lock(instrument, timeframe):
+            meta = self.read_meta(instrument, timeframe)
+            base = meta['base'] if meta else self.base_timeframe(instrument, timeframe)
+            if base is None:
+                raise FileNotFoundError(f"No candle data for {instrument} {timeframe} or a finer timeframe")
+            version = self._base_version(instrument, base)
+            exists = self.store.exists(instrument, timeframe)
+            if meta and exists and all(meta.get(k) == v for k, v in version.items()):
+                return 0
+
+            seconds = TIMEFRAME_SECONDS[timeframe]
+            base_candles = self.store.load(instrument, base)
+            if meta and exists:
+                times = self.store.load(instrument, timeframe)['time']
+                lo = int(np.searchsorted(base_candles['time'], times[-1])) if len(times) else 0
+                added = self.store.append(instrument, timeframe,
+                                          resample({k: v[lo:] for k, v in base_candles.items()}, seconds))
+            else:
+                aggregated = resample(base_candles, seconds)
+                self.store.write(instrument, timeframe, aggregated)
+                added = len(aggregated['time'])
+
+            with open(self._meta_path(instrument, timeframe), 'w') as f:
+                json.dump({'base': base, **version}, f)
+            return added
+
+    def load(self, instrument: str, timeframe: str) -> Dict[str, np.ndarray]:
+        # Native series are served as-is; derived ones are refreshed first
+        if not self.is_native(instrument, timeframe):
+            self.update(instrument, timeframe)
+        return self.store.load(instrument, timeframe)
+
+    def slice(self, instrument: str, timeframe: str, start: Optional[int] = None,
+              end: Optional[int] = None) -> Dict[str, np.ndarray]:
+        if not self.is_native(instrument, timeframe):
+            self.update(instrument, timeframe)
+        return self.store.slice(instrument, timeframe, start, end)
@@ -0,0 +1,150 @@
+from typing import Dict, Optional
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from openai.types.chat import ChatCompletion
+
+# Completions that ended for these reasons are complete and safe to replay
+CACHEABLE_FINISH_REASONS = {'stop', 'tool_calls'}
+
+class ResponseCache:
+    """Persistent cache of non-streaming chat completions, keyed by a hash of the request.
+
+    The key covers every request argument except `stream` (model, messages
+    including the system prompt, response schema, tools), so any change to the
+    prompt or schema misses. Entries are evicted least recently used first
+    once the stored responses exceed `max_bytes`, and expire after
+    `ttl_seconds` if set. The entry count and stored size live in `totals`.
+    Hit/miss counters are per process.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        response TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+    CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at);
+    CREATE TABLE IF NOT EXISTS totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        entries INTEGER NOT NULL,
+        bytes INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO totals (id, entries, bytes) SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM responses;
+    CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses BEGIN
+        UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS responses_delete AFTER DELETE ON responses BEGIN
+        UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS responses_resize AFTER UPDATE OF size ON responses BEGIN
+        UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 1;
+    END;
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()  # hits and misses are counted from many request threads
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def key(kwargs: Dict) -> str:
+        request = {k: v for k, v in kwargs.items() if k != 'stream'}
+        canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        row = conn.execute('SELECT response, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.ttl_seconds and row[1] < now - self.ttl_seconds):
+            with self._counter_lock:
+                self.misses += 1
+            return None
+        with self._counter_lock:
+            self.hits += 1
+        with conn:
+            conn.execute('UPDATE responses SET last_used = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete doesn't fire the delete trigger
+            conn.execute('INSERT INTO responses (key, response, size, created_at, last_used) VALUES (?, ?, ?, ?, ?) '
+                         'ON CONFLICT (key) DO UPDATE SET response = excluded.response, size = excluded.size, '
+                         'created_at = excluded.created_at, last_used = excluded.last_used',
+                         (key, response, len(response), now, now))
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl_seconds:
+            conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl_seconds,))
+        (total,) = conn.execute('SELECT bytes FROM totals').fetchone()
+        if total <= self.max_bytes:
+            return
+        # Oldest first until the rest fit
+        evict = []
+        for key, size in conn.execute('SELECT key, size FROM responses ORDER BY last_used'):
+            if total <= self.max_bytes:
+                break
+            evict.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM responses WHERE key = ?', evict)
+
+    def lookup(self, kwargs: Dict) -> Optional[ChatCompletion]:
+        cached = self.get(self.key(kwargs))
+        return ChatCompletion.model_validate_json(cached) if cached is not None else None
+
+    def store(self, kwargs: Dict, response: ChatCompletion) -> None:
+        # Truncated or filtered completions are not cached
+        if response.choices and response.choices[0].finish_reason in CACHEABLE_FINISH_REASONS:
+            self.put(self.key(kwargs), response.model_dump_json())
+
+    def store_content(self, kwargs: Dict, content: str) -> None:
+        # A completed stream, cached as the completion the same request would return unstreamed
+        response = ChatCompletion.model_validate({
+            'id': f"cached-{uuid.uuid4().hex}", 'object': 'chat.completion', 'created': int(time.time()),
+            'model': kwargs['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+        })
+        self.store(kwargs, response)
+
+    def discard(self, kwargs: Dict) -> None:
+        # For responses that turned out to be unusable
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM responses WHERE key = ?', (self.key(kwargs),))
+
+    def clear(self) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM responses')
+
+    def stats(self) -> Dict:
+        entries, size = self._connect().execute('SELECT entries, bytes FROM totals').fetchone()
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        return {'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes, 'hits': hits, 'misses': misses}
@@ -0,0 +1,194 @@
+from typing import Dict, List, Optional, Tuple
+import io
+import sqlite3
+import threading
+import time
+import uuid
+import numpy as np
+
+MAX_PAGE_SIZE = 500
+# Equity samples served per request, whatever `points` asks for
+MAX_POINTS = 5000
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of `points` samples that keep a line's visual shape.
+
+    The first and last samples are always kept; each bucket in between keeps
+    the sample forming the largest triangle with the previously kept sample
+    and the mean of the next bucket.
+    """
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1])
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    # Means of every bucket up front, from cumulative sums
+    cx, cy = np.concatenate(([0.0], np.cumsum(x))), np.concatenate(([0.0], np.cumsum(y)))
+    counts = edges[1:] - edges[:-1]
+    mean_x = (cx[edges[1:]] - cx[edges[:-1]]) / counts
+    mean_y = (cy[edges[1:]] - cy[edges[:-1]]) / counts
+    keep = np.empty(points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for b in range(points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        # The last bucket's "next" is the final sample
+        nx, ny = (mean_x[b + 1], mean_y[b + 1]) if b + 1 < len(mean_x) else (x[-1], y[-1])
+        area = np.abs((x[a] - nx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (ny - y[a]))
+        a = lo + int(area.argmax())
+        keep[b + 1] = a
+    return keep
+
+def min_max(y: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each of (points - 2) // 2 buckets, in order, plus both ends."""
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    buckets = max(1, (points - 2) // 2)
+    y = np.asarray(y, dtype=np.float64)
+    starts = np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+    lows = _reduce_arg(y, starts, np.minimum)
+    highs = _reduce_arg(y, starts, np.maximum)
+    return np.unique(np.concatenate(([0, n - 1], lows, highs)))
+
+def _reduce_arg(y: np.ndarray, starts: np.ndarray, reducer) -> np.ndarray:
+    # First index in each bucket where y equals the bucket's reduced value
+    extremes = np.repeat(reducer.reduceat(y, starts), np.diff(np.append(starts, len(y))))
+    hits = np.flatnonzero(y == extremes)
+    return hits[np.searchsorted(hits, starts)]
+
+DOWNSAMPLERS = {
+    'lttb': lambda times, values, points: lttb(times, values, points),
+    'minmax': lambda times, values, points: min_max(values, points),
+}
+
+class ResultStore:
+    """Backtest results kept in SQLite so the results panel can page through them after the run.
+
+    Each result is stored once as numpy columns (equity curve and trades) in
+    one blob; the panel then asks for a downsampled equity curve and pages of
+    trades instead of receiving everything in the run_backtest response.
+    Results are owned by a user and evicted least recently used first once
+    they exceed `max_bytes`; triggers keep the stored total in `totals`, so a
+    save doesn't have to sum the table.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS results (
+        id TEXT PRIMARY KEY,
+        user_id TEXT NOT NULL,
+        payload BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+    CREATE TABLE IF NOT EXISTS totals (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        bytes INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO totals (id, bytes) SELECT 1, COALESCE(SUM(size), 0) FROM results;
+    CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+        UPDATE totals SET bytes = bytes + NEW.size WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+        UPDATE totals SET bytes = bytes - OLD.size WHERE id = 1;
+    END;
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def save(self, user_id: str, times: np.ndarray, equity: np.ndarray, trades: Dict[str, np.ndarray]) -> str:
+        """Stores a run_backtest result with the times of its equity curve and returns its id."""
+        buffer = io.BytesIO()
+        np.savez(buffer, time=np.asarray(times), equity=np.asarray(equity),
+                 **{f"trade_{field}": np.asarray(values) for field, values in trades.items()})
+        payload = buffer.getvalue()
+        result_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT INTO results (id, user_id, payload, size, created_at, last_used) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', (result_id, user_id, payload, len(payload), now, now))
+            self._evict(conn)
+        return result_id
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        (total,) = conn.execute('SELECT bytes FROM totals').fetchone()
+        if total <= self.max_bytes:
+            return
+        evict = []
+        for result_id, size in conn.execute('SELECT id, size FROM results ORDER BY last_used'):
+            if total <= self.max_bytes:
+                break
+            evict.append((result_id,))
+            total -= size
+        conn.executemany('DELETE FROM results WHERE id = ?', evict)
+
+    def load(self, user_id: str, result_id: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]]:
+        """Returns ({'time', 'equity'}, trade columns), or None if the result is gone or not the user's."""
+        conn = self._connect()
+        row = conn.execute('SELECT payload FROM results WHERE id = ? AND user_id = ?',
+                           (result_id, user_id)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute('UPDATE results SET last_used = ? WHERE id = ?', (time.time(), result_id))
+        with np.load(io.BytesIO(row[0])) as data:
+            curve = {'time': data['time'], 'equity': data['equity']}
+            trades = {name[len('trade_'):]: data[name] for name in data.files if name.startswith('trade_')}
+        return curve, trades
+
+    def delete(self, user_id: str, result_id: str) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM results WHERE id = ? AND user_id = ?', (result_id, user_id))
+
+def equity_points(curve: Dict[str, np.ndarray], points: int, method: str = 'lttb', start: Optional[int] = None,
+                  end: Optional[int] = None) -> Dict[str, List]:
+    """The equity curve between optional epoch-second bounds, reduced to about `points` samples (MAX_POINTS at most)."""
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Unknown downsampling method '{method}'")
+    times, equity = curve['time'], curve['equity']
+    lo = np.searchsorted(times, start, side='left') if start is not None else 0
+    hi = np.searchsorted(times, end, side='right') if end is not None else len(times)
+    times, equity = times[lo:hi], equity[lo:hi]
+    keep = DOWNSAMPLERS[method](times, equity, max(2, min(int(points), MAX_POINTS)))
+    return {'time': times[keep].tolist(), 'equity': np.round(equity[keep], 2).tolist(), 'total_points': len(times)}
+
+def trade_page(trades: Dict[str, np.ndarray], page: int = 1, page_size: int = 50, sort: str = 'entry_time',
+               descending: bool = False) -> Dict:
+    """One page of the trade table, sorted by any trade column (stable, so ties keep time order)."""
+    if sort not in trades:
+        raise KeyError(f"Unknown trade column '{sort}'")
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    total = len(trades[sort])
+    values = trades[sort]
+    if descending:
+        # Sorting the reversed column and flipping back keeps equal keys in time order
+        order = len(values) - 1 - np.argsort(values[::-1], kind='stable')[::-1]
+    else:
+        order = np.argsort(values, kind='stable')
+    page = max(1, int(page))
+    rows = order[(page - 1) * page_size:page * page_size]
+    columns = {field: values[rows].tolist() for field, values in trades.items()}
+    return {'total': total, 'page': page, 'page_size': page_size, 'pages': -(-total // page_size),
+            'sort': sort, 'descending': descending,
+            'trades': [dict(zip(columns, row)) for row in zip(*columns.values())]}
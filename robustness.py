@@ -0,0 +1,164 @@
+from typing import Dict, List, Optional
+import numpy as np
+
+import backtest
+import sweep
+from indicators import SeriesIndicators
+from strategy import CompiledStrategy, compile_strategy
+
+MAX_RESAMPLES = 100000
+# Walk-forward runs combinations x windows backtests on the request thread, so both are bounded;
+# larger grids belong in /run_sweep
+MAX_WALK_FORWARD_COMBINATIONS = 100
+MAX_WALK_FORWARD_BACKTESTS = 2000
+# Resampled paths evaluated per batch; bounds the (batch, trades) matrices to a few MB
+RESAMPLE_BATCH = 2048
+PERCENTILES = (5, 25, 50, 75, 95)
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+def distribution(values: np.ndarray) -> Dict:
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return {'mean': 0.0, **{f"p{p}": 0.0 for p in PERCENTILES}}
+    return {'mean': float(values.mean()),
+            **{f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}}
+
+def _slice(candles: Dict[str, np.ndarray], lo: int, hi: int) -> Dict[str, np.ndarray]:
+    return {field: values[lo:hi] for field, values in candles.items()}
+
+def walk_forward(candles: Dict[str, np.ndarray], strategy: CompiledStrategy, train_bars: int, test_bars: int,
+                 step: Optional[int] = None, ranges: Optional[Dict] = None, metric: str = 'sharpe',
+                 timeframe: str = '1h', indicators: Optional[SeriesIndicators] = None) -> Dict:
+    """Rolls a train/test window over the candles and backtests each out-of-sample test window.
+
+    With parameter ranges (as for sweep.run_sweep) the combination that scores
+    best on each train window is the one tested; without them the strategy is
+    tested as is. Every window reads moving averages from one SeriesIndicators,
+    so each (kind, period) is computed once for the whole series however many
+    windows and combinations use it, and windows have no warm-up gap.
+
+    Returns:
+        Dict: {'windows': [{'train_start', 'test_start', 'test_end', 'params', 'train', 'test'}],
+               'test': distributions of the test metrics, 'efficiency': mean test / mean train metric}
+    """
+    n = len(candles['close'])
+    step = step or test_bars
+    if train_bars <= 0 or test_bars <= 0 or step <= 0:
+        raise ValueError("train_bars, test_bars and step must be positive")
+    if train_bars + test_bars > n:
+        raise ValueError(f"Need at least {train_bars + test_bars} candles for one window, have {n}")
+    if indicators is None:
+        indicators = SeriesIndicators(candles, ('walk_forward',))
+
+    starts = range(0, n - train_bars - test_bars + 1, step)
+    names, grid = sweep.build_grid(ranges) if ranges else ([], [()])
+    if len(grid) > MAX_WALK_FORWARD_COMBINATIONS:
+        raise ValueError(f"Walk-forward has {len(grid)} combinations, the limit is {MAX_WALK_FORWARD_COMBINATIONS}")
+    backtests = len(starts) * (len(grid) + 1)
+    if backtests > MAX_WALK_FORWARD_BACKTESTS:
+        raise ValueError(f"Walk-forward needs {backtests} backtests ({len(starts)} windows), the limit is "
+                         f"{MAX_WALK_FORWARD_BACKTESTS}; use fewer windows or combinations")
+
+    # Candidates are compiled once and reused for every window
+    if ranges:
+        candidates = [(dict(zip(names, values)), compile_strategy(sweep.apply_params(strategy.definition, names, values)))
+                      for values in grid]
+    else:
+        candidates = [({}, strategy)]
+    descending = metric not in sweep.ASCENDING_METRICS
+
+    def evaluate(candidate: CompiledStrategy, lo: int, hi: int) -> Dict:
+        return backtest.run_backtest(_slice(candles, lo, hi), candidate, timeframe=timeframe,
+                                     indicators=indicators.window(lo, hi))['metrics']
+
+    windows = []
+    for lo in starts:
+        mid, hi = lo + train_bars, lo + train_bars + test_bars
+        scored = [(evaluate(candidate, lo, mid), params, candidate) for params, candidate in candidates]
+        train, params, best = (max if descending else min)(scored, key=lambda s: s[0][metric])
+        windows.append({'train_start': int(candles['time'][lo]), 'test_start': int(candles['time'][mid]),
+                        'test_end': int(candles['time'][hi - 1]), 'params': params, 'train': train,
+                        'test': evaluate(best, mid, hi)})
+
+    test = {key: distribution([w['test'][key] for w in windows])
+            for key in ('total_return', 'max_drawdown', 'sharpe', 'num_trades', 'win_rate')}
+    train_mean = np.mean([w['train'][metric] for w in windows])
+    efficiency = float(test[metric]['mean'] / train_mean) if train_mean else 0.0
+    return {'windows': windows, 'test': test, 'efficiency': efficiency}
+
+def monte_carlo(returns: np.ndarray, fraction: float = 1.0, resamples: int = 1000, years: Optional[float] = None,
+                method: str = 'bootstrap', seed: Optional[int] = None) -> Dict:
+    """Distribution of outcomes over resampled orderings of a backtest's trades.
+
+    'bootstrap' draws each path's trades with replacement; 'shuffle' permutes
+    the actual trades, which keeps the total return and varies only the path
+    (drawdowns). Paths are evaluated a batch at a time as (batch, trades)
+    matrices, with equity compounded as in backtest.run_backtest.
+
+    Args:
+        returns (np.ndarray): per-trade returns after fees
+        fraction (float): share of equity committed per trade
+        years (Optional[float]): span the trades were taken over, to annualize the Sharpe ratio
+            by trades per year; the Sharpe ratio is per trade if omitted
+
+    Returns:
+        Dict: {'resamples', 'trades', 'total_return', 'max_drawdown', 'sharpe' (distributions),
+               'probability_of_loss'}
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    if method not in ('bootstrap', 'shuffle'):
+        raise ValueError(f"Unknown resampling method '{method}'")
+    resamples = int(resamples)
+    if not 0 < resamples <= MAX_RESAMPLES:
+        raise ValueError(f"resamples must be between 1 and {MAX_RESAMPLES}")
+    n = len(returns)
+    if n == 0:
+        empty = distribution([])
+        return {'resamples': resamples, 'trades': 0, 'total_return': empty, 'max_drawdown': empty,
+                'sharpe': empty, 'probability_of_loss': 0.0}
+
+    rng = np.random.default_rng(seed)
+    growth = 1 + fraction * returns
+    annualize = np.sqrt(n / years) if years else 1.0
+    totals, drawdowns, sharpes = [], [], []
+    for start in range(0, resamples, RESAMPLE_BATCH):
+        size = min(RESAMPLE_BATCH, resamples - start)
+        if method == 'bootstrap':
+            paths = growth[rng.integers(0, n, (size, n))]
+        else:
+            paths = rng.permuted(np.broadcast_to(growth, (size, n)), axis=1)
+        equity = np.cumprod(paths, axis=1)
+        # Drawdowns are measured from the running peak including the starting equity of 1
+        peaks = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+        drawdowns.append((1 - equity / peaks).max(axis=1))
+        totals.append(equity[:, -1] - 1)
+        std = paths.std(axis=1)
+        sharpes.append(np.divide(paths.mean(axis=1) - 1, std, out=np.zeros(size), where=std > 0) * annualize)
+
+    totals = np.concatenate(totals)
+    return {'resamples': resamples, 'trades': n, 'total_return': distribution(totals),
+            'max_drawdown': distribution(np.concatenate(drawdowns)), 'sharpe': distribution(np.concatenate(sharpes)),
+            'probability_of_loss': float((totals < 0).mean())}
+
+def run_robustness(candles: Dict[str, np.ndarray], strategy: CompiledStrategy, train_bars: int, test_bars: int,
+                   step: Optional[int] = None, ranges: Optional[Dict] = None, metric: str = 'sharpe',
+                   resamples: int = 1000, method: str = 'bootstrap', seed: Optional[int] = None,
+                   timeframe: str = '1h', indicators: Optional[SeriesIndicators] = None) -> Dict:
+    """Walk-forward analysis plus a Monte Carlo of the strategy's trades over the whole window.
+
+    Returns:
+        Dict: {'metrics': the plain backtest's metrics, 'walk_forward': see walk_forward,
+               'monte_carlo': see monte_carlo}
+    """
+    if indicators is None:
+        indicators = SeriesIndicators(candles, ('robustness',))
+    result = backtest.run_backtest(candles, strategy, timeframe=timeframe, indicators=indicators)
+    times = candles['time']
+    years = (int(times[-1]) - int(times[0])) / SECONDS_PER_YEAR if len(times) > 1 else None
+    return {
+        'metrics': result['metrics'],
+        'walk_forward': walk_forward(candles, strategy, train_bars, test_bars, step, ranges, metric,
+                                     timeframe, indicators),
+        'monte_carlo': monte_carlo(result['trades']['return'], strategy.position_fraction, resamples, years,
+                                   method, seed),
+    }
@@ -0,0 +1,106 @@
+from typing import AsyncIterator, Iterable, Iterator, Optional
+from contextlib import suppress
+import asyncio
+import time
+
+# Tokens are coalesced into one frame until this much time has passed since
+# the last frame, or this much text is buffered
+FLUSH_INTERVAL_SECONDS = 0.05
+FLUSH_BYTES = 2048
+
+DONE_EVENT = "event: done\ndata: [DONE]\n\n"
+
+def encode_event(data: str, event: Optional[str] = None) -> str:
+    """Encodes one server-sent event.
+
+    Each line of data becomes its own 'data:' field, which the client joins
+    back with newlines, so text containing newlines survives intact.
+    """
+    lines = data.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    frame = ''.join(f"data: {line}\n" for line in lines)
+    if event:
+        frame = f"event: {event}\n" + frame
+    return frame + '\n'
+
+class _Batch:
+    # Pending text as a list of parts, joined once per frame
+    def __init__(self, interval: float, max_bytes: int):
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.parts = []
+        self.size = 0
+        self.last_flush = float('-inf')
+
+    def add(self, text: str) -> None:
+        self.parts.append(text)
+        self.size += len(text)
+
+    def due(self) -> bool:
+        return self.size >= self.max_bytes or time.monotonic() - self.last_flush >= self.interval
+
+    def remaining(self) -> float:
+        return max(0.0, self.interval - (time.monotonic() - self.last_flush))
+
+    def flush(self) -> str:
+        frame = encode_event(''.join(self.parts))
+        self.parts = []
+        self.size = 0
+        self.last_flush = time.monotonic()
+        return frame
+
+def stream_events(tokens: Iterable[str], interval: float = FLUSH_INTERVAL_SECONDS,
+                  max_bytes: int = FLUSH_BYTES) -> Iterator[str]:
+    """Frames a stream of text tokens as server-sent events, ending with a 'done' event.
+
+    The first token is sent at once; after that tokens are coalesced into one
+    frame per `interval` seconds or `max_bytes` characters. Pending text is
+    flushed when the next token arrives or the stream ends.
+    """
+    batch = _Batch(interval, max_bytes)
+    for token in tokens:
+        if not token:
+            continue
+        batch.add(token)
+        if batch.due():
+            yield batch.flush()
+    if batch.parts:
+        yield batch.flush()
+    yield DONE_EVENT
+
+async def astream_events(tokens: AsyncIterator[str], interval: float = FLUSH_INTERVAL_SECONDS,
+                         max_bytes: int = FLUSH_BYTES) -> AsyncIterator[str]:
+    """Async stream_events; pending text is also flushed when the interval ends with no new token."""
+    batch = _Batch(interval, max_bytes)
+    tokens = aiter(tokens)
+    pending = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(tokens))
+            # Wait for the next token, but not past the end of the current window if text is buffered
+            done, _ = await asyncio.wait({pending}, timeout=batch.remaining() if batch.parts else None)
+            if not done:
+                yield batch.flush()
+                continue
+            try:
+                token = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+            if not token:
+                continue
+            batch.add(token)
+            if batch.due():
+                yield batch.flush()
+    finally:
+        if pending is not None:
+            # The token generator is still running until the cancelled anext finishes
+            pending.cancel()
+            with suppress(asyncio.CancelledError, StopAsyncIteration):
+                await pending
+        if hasattr(tokens, 'aclose'):
+            await tokens.aclose()
+    if batch.parts:
+        yield batch.flush()
+    yield DONE_EVENT
@@ -0,0 +1,130 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Get DOM elements
+    const strategySelect = document.getElementById('automation-strategy-select');
+    const instrumentSelect = document.getElementById('automation-instrument-select');
+    const timeframeSelect = document.getElementById('automation-timeframe-select');
+    const speedInput = document.getElementById('automation-speed-input');
+    const startButton = document.getElementById('start-automation-button');
+    const runnersContainer = document.getElementById('automation-runners');
+    const output = document.getElementById('automation-output');
+
+    // How often the runner table is refreshed
+    const STATUS_INTERVAL_MS = 1000;
+
+    function addOutput(message) {
+        const line = document.createElement('p');
+        line.textContent = message;
+        output.appendChild(line);
+        output.scrollTop = output.scrollHeight;
+    }
+
+    function loadStrategies() {
+        fetch('/get_strategies')
+            .then(response => response.json())
+            .then(strategies => {
+                strategySelect.innerHTML = '';
+                strategies.forEach(strategy => {
+                    const option = document.createElement('option');
+                    option.value = strategy.name;
+                    option.textContent = strategy.name;
+                    strategySelect.appendChild(option);
+                });
+            })
+            .catch(error => console.error('Error loading strategies:', error));
+    }
+
+    function formatPercent(value) {
+        return (value * 100).toFixed(2) + '%';
+    }
+
+    function formatTime(seconds) {
+        return seconds === null ? '' : new Date(seconds * 1000).toISOString().slice(0, 16).replace('T', ' ');
+    }
+
+    function renderRunners(runners) {
+        if (runners.length === 0) {
+            runnersContainer.textContent = 'No strategies running.';
+            return;
+        }
+        const table = document.createElement('table');
+        table.className = 'table table-sm table-dark';
+        const header = table.createTHead().insertRow();
+        ['Strategy', 'Market', 'Bar', 'Close', 'Position', 'Equity', 'Return', 'Trades', ''].forEach(label => {
+            const cell = document.createElement('th');
+            cell.textContent = label;
+            header.appendChild(cell);
+        });
+        const body = table.createTBody();
+        runners.forEach(runner => {
+            const row = body.insertRow();
+            const state = runner.error ? ` (error: ${runner.error})` : (runner.running ? '' : ' (feed ended)');
+            row.insertCell().textContent = runner.strategy + state;
+            row.insertCell().textContent = `${runner.instrument} ${runner.timeframe}`;
+            row.insertCell().textContent = formatTime(runner.last_time);
+            row.insertCell().textContent = runner.last_close === null ? '' : runner.last_close.toFixed(2);
+            row.insertCell().textContent = runner.position ? `Long @ ${runner.position.entry_price.toFixed(2)}` : 'Flat';
+            row.insertCell().textContent = runner.equity.toFixed(2);
+            row.insertCell().textContent = formatPercent(runner.return);
+            row.insertCell().textContent = runner.num_trades;
+            const stopButton = document.createElement('button');
+            stopButton.className = 'btn btn-danger btn-sm';
+            stopButton.textContent = 'Stop';
+            stopButton.addEventListener('click', () => stopRunner(runner.id));
+            row.insertCell().appendChild(stopButton);
+        });
+        runnersContainer.innerHTML = '';
+        runnersContainer.appendChild(table);
+    }
+
+    function refreshStatus() {
+        fetch('/automation/status')
+            .then(response => response.json())
+            .then(result => renderRunners(result.runners))
+            .catch(error => console.error('Error loading automation status:', error));
+    }
+
+    function stopRunner(id) {
+        fetch('/automation/stop', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({id: id}),
+        })
+        .then(response => response.json())
+        .then(result => {
+            addOutput(result.message);
+            refreshStatus();
+        })
+        .catch(error => console.error('Error stopping strategy:', error));
+    }
+
+    startButton.addEventListener('click', function() {
+        const selectedStrategyName = strategySelect.value;
+        if (!selectedStrategyName) {
+            addOutput('Please select a strategy to start.');
+            return;
+        }
+        fetch('/automation/start', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                name: selectedStrategyName,
+                instrument: instrumentSelect.value,
+                timeframe: timeframeSelect.value,
+                speed: parseFloat(speedInput.value) || 0
+            }),
+        })
+        .then(response => response.json())
+        .then(result => {
+            addOutput(result.message);
+            refreshStatus();
+        })
+        .catch(error => {
+            console.error('Error starting strategy:', error);
+            addOutput('An error occurred while starting the strategy.');
+        });
+    });
+
+    loadStrategies();
+    refreshStatus();
+    setInterval(refreshStatus, STATUS_INTERVAL_MS);
+});
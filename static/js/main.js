@@ -11,6 +11,11 @@ document.addEventListener('DOMContentLoaded', function() {
     const jsonDisplay = document.getElementById('json-display');
     const strategySelector = document.getElementById('strategy-selector');
     const deleteStrategyButton = document.getElementById('delete-strategy-button');
+    const runBacktestButton = document.getElementById('run-backtest-button');
+    const runRobustnessButton = document.getElementById('run-robustness-button');
+    const tableContainer = document.getElementById('table-container');
+    const chartContainer = document.getElementById('chart-container');
+    const systemOutput = document.getElementById('system-output');
 
     // Configure marked options
     marked.setOptions({
@@ -20,6 +25,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
     let currentMessageBuffer = '';
     let currentMessageElement = null;
+    let renderScheduled = false;
 
     function startNewMessage(sender) {
         currentMessageBuffer = '';
@@ -31,10 +37,22 @@ document.addEventListener('DOMContentLoaded', function() {
     
     function appendToMessage(content) {
         currentMessageBuffer += content;
-        currentMessageElement.querySelector('.message-content').innerHTML = currentMessageBuffer.replace(/\n/g, '<br>');
+        // Re-render at most once per animation frame however fast text arrives
+        if (!renderScheduled) {
+            renderScheduled = true;
+            requestAnimationFrame(renderMessage);
+        }
+    }
+
+    function renderMessage() {
+        renderScheduled = false;
+        if (currentMessageElement) {
+            currentMessageElement.querySelector('.message-content').innerHTML = currentMessageBuffer.replace(/\n/g, '<br>');
+        }
     }
     
     function finalizeMessage() {
+        if (!currentMessageElement) return;
         const parsedContent = parseAndSanitizeMarkdown(currentMessageBuffer);
         currentMessageElement.querySelector('.message-content').innerHTML = parsedContent;
         currentMessageBuffer = '';
@@ -128,6 +146,54 @@ document.addEventListener('DOMContentLoaded', function() {
         finalizeMessage();
     }
 
+    // Incremental server-sent events parser: feed it decoded text as it arrives and it
+    // calls onEvent({event, data}) for each complete event. Multi-line data is joined
+    // with newlines, and events split across reads are buffered until complete.
+    function createSSEParser(onEvent) {
+        let buffer = '';
+        return {
+            push(text) {
+                buffer += text.replace(/\r\n?/g, '\n');
+                let end;
+                while ((end = buffer.indexOf('\n\n')) !== -1) {
+                    const block = buffer.slice(0, end);
+                    buffer = buffer.slice(end + 2);
+                    let event = 'message';
+                    const data = [];
+                    block.split('\n').forEach(line => {
+                        if (line.startsWith('data:')) {
+                            data.push(line.slice(line.startsWith('data: ') ? 6 : 5));
+                        } else if (line.startsWith('event:')) {
+                            event = line.slice(6).trim();
+                        }
+                    });
+                    if (data.length > 0) {
+                        onEvent({event: event, data: data.join('\n')});
+                    }
+                }
+            }
+        };
+    }
+
+    // Reads a fetch response body as server-sent events; resolves when the body ends
+    function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        const parser = createSSEParser(onEvent);
+
+        function readStream() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    parser.push(decoder.decode());
+                    return;
+                }
+                parser.push(decoder.decode(value, {stream: true}));
+                return readStream();
+            });
+        }
+        return readStream();
+    }
+
     // Send message to the server and handle the streaming response
     function sendMessage(message) {
         fetch('/chat', {
@@ -138,34 +204,20 @@ document.addEventListener('DOMContentLoaded', function() {
             body: JSON.stringify({message: message}),
         })
         .then(response => {
-            const reader = response.body.getReader();
-            const decoder = new TextDecoder();
-            
-            startNewMessage('AI');  // Start a new AI message
-    
-            function readStream() {
-                reader.read().then(({ done, value }) => {
-                    if (done) {
-                        finalizeMessage();  // Finalize the message when the stream is done
-                        return;
-                    }
-                    const chunk = decoder.decode(value);
-                    const lines = chunk.split('\n');
-                    lines.forEach(line => {
-                        if (line.startsWith('data: ')) {
-                            const data = line.slice(6);
-                            if (data === '[DONE]') {
-                                finalizeMessage();  // Finalize the message when '[DONE]' is received
-                            } else {
-                                appendToMessage(data);  // Append each chunk of data
-                            }
-                        }
-                    });
-                    readStream();  // Continue reading the stream
-                });
+            if (!response.ok) {
+                return response.json().then(data => { throw new Error(data.message); });
             }
-            
-            readStream();
+            startNewMessage('AI');  // Start a new AI message
+            return readEventStream(response, ({ event, data }) => {
+                if (event === 'done') {
+                    finalizeMessage();  // Finalize the message when the done event is received
+                } else if (event === 'error') {
+                    finalizeMessage();  // The stream failed part way; keep what arrived
+                    addMessage('System', data);
+                } else {
+                    appendToMessage(data);  // Append each frame of text
+                }
+            }).then(finalizeMessage);  // Finalize if the stream ended without a done event
         })
         .catch((error) => {
             console.error('Error:', error);
@@ -197,70 +249,57 @@ document.addEventListener('DOMContentLoaded', function() {
         fetch('/generate_strategy', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({chat_history: chatHistory}),
+            body: JSON.stringify({chat_history: chatHistory, stream: true}),
         })
-        .then(response => response.json())
+        .then(response => readStrategyEvents(response))
         .then(data => {
             const strategyJson = JSON.parse(data.strategy_json);
-            let strategyName = strategyJson.strategy_name;
-            
-            // Function to check if a strategy name already exists
-            function strategyNameExists(name) {
-                return fetch('/check_strategy_name', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({ name: name }),
-                })
-                .then(response => response.json())
-                .then(result => result.exists);
-            }
-    
-            // Function to get a unique strategy name
-            function getUniqueStrategyName(baseName) {
-                let nameCounter = 1;
-                let currentName = baseName;
-                
-                return new Promise((resolve) => {
-                    function checkName() {
-                        strategyNameExists(currentName).then(exists => {
-                            if (!exists) {
-                                resolve(currentName);
-                            } else {
-                                currentName = `${baseName} (${nameCounter})`;
-                                nameCounter++;
-                                checkName();
-                            }
-                        });
-                    }
-                    checkName();
-                });
-            }
-    
-            // Get a unique strategy name and then save the strategy
-            getUniqueStrategyName(strategyName).then(uniqueName => {
-                const newStrategy = {
-                    name: uniqueName,
-                    summary: data.strategy_summary,
-                    json: data.strategy_json
-                };
+            const newStrategy = {
+                name: strategyJson.strategy_name,
+                summary: data.strategy_summary,
+                json: data.strategy_json
+            };
     
-                return fetch('/save_strategy', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify(newStrategy),
-                });
+            // The server appends " (n)" if the name is already taken
+            fetch('/save_strategy', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(newStrategy),
             })
             .then(response => response.json())
             .then(result => {
                 updateStrategySelector(result.strategies);
-                strategySelector.value = result.strategies[result.strategies.length - 1].name;
-                displayStrategy(result.strategies[result.strategies.length - 1]);
+                const savedStrategy = result.strategies.find(s => s.name === result.name);
+                strategySelector.value = savedStrategy.name;
+                displayStrategy(savedStrategy);
             })
             .catch(error => console.error('Error saving strategy:', error));
         })
         .catch(error => console.error('Error generating strategy:', error));
     });
 
+    // Show the summary as it streams in; resolves with the final {strategy_summary, strategy_json} event
+    function readStrategyEvents(response) {
+        if (!response.ok) {
+            return response.json().then(data => { throw new Error(data.message); });
+        }
+        let summary = '';
+        let result = null;
+        return readEventStream(response, ({ event, data }) => {
+            if (event === 'error') throw new Error(data);
+            const payload = JSON.parse(data);
+            if (payload.summary_delta !== undefined) {
+                summary += payload.summary_delta;
+                strategyDisplay.innerHTML = parseAndSanitizeMarkdown(summary);
+            } else {
+                result = payload;
+            }
+        }).then(() => {
+            if (!result) throw new Error('Strategy stream ended without a result');
+            return result;
+        });
+    }
+
     function loadStrategies() {
         fetch('/get_strategies')
             .then(response => response.json())
@@ -324,6 +363,239 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    function addSystemOutput(message) {
+        const line = document.createElement('p');
+        line.textContent = message;
+        systemOutput.appendChild(line);
+        systemOutput.scrollTop = systemOutput.scrollHeight;
+    }
+
+    function displayBacktestMetrics(metrics) {
+        const rows = [
+            ['Total Return', (metrics.total_return * 100).toFixed(2) + '%'],
+            ['Max Drawdown', (metrics.max_drawdown * 100).toFixed(2) + '%'],
+            ['Sharpe Ratio', metrics.sharpe.toFixed(2)],
+            ['Trades', metrics.num_trades],
+            ['Win Rate', (metrics.win_rate * 100).toFixed(1) + '%'],
+        ];
+        const table = document.createElement('table');
+        table.className = 'table table-sm table-dark';
+        rows.forEach(([label, value]) => {
+            const row = table.insertRow();
+            row.insertCell().textContent = label;
+            row.insertCell().textContent = value;
+        });
+        tableContainer.innerHTML = '';
+        tableContainer.appendChild(table);
+    }
+
+    // Stored backtest result shown in the trade table, and its current sort
+    let tradeTable = null;
+    const TRADE_PAGE_SIZE = 20;
+    const TRADE_COLUMNS = [
+        ['entry_time', 'Entry'], ['exit_time', 'Exit'], ['entry_price', 'Entry Price'],
+        ['exit_price', 'Exit Price'], ['return', 'Return'], ['exit_reason', 'Reason'],
+    ];
+
+    function loadEquityCurve(resultId) {
+        // One point per pixel column is all the chart can show
+        const points = Math.max(2, chartContainer.clientWidth);
+        fetch(`/results/${resultId}/equity?points=${points}`)
+            .then(response => response.json())
+            .then(curve => {
+                if (curve.status !== 'success') {
+                    addSystemOutput(curve.message);
+                    return;
+                }
+                drawEquityCurve(curve);
+            })
+            .catch(error => console.error('Error loading equity curve:', error));
+    }
+
+    function drawEquityCurve(curve) {
+        const canvas = document.createElement('canvas');
+        canvas.width = chartContainer.clientWidth;
+        canvas.height = chartContainer.clientHeight;
+        chartContainer.innerHTML = '';
+        chartContainer.appendChild(canvas);
+        if (curve.time.length < 2) {
+            return;
+        }
+        const context = canvas.getContext('2d');
+        const t0 = curve.time[0], t1 = curve.time[curve.time.length - 1];
+        const low = Math.min(...curve.equity), high = Math.max(...curve.equity);
+        const x = t => (t - t0) / (t1 - t0) * (canvas.width - 1);
+        const y = v => high === low ? canvas.height / 2 : (high - v) / (high - low) * (canvas.height - 20) + 10;
+        context.strokeStyle = '#4fc3f7';
+        context.beginPath();
+        curve.time.forEach((t, i) => {
+            const method = i === 0 ? 'moveTo' : 'lineTo';
+            context[method](x(t), y(curve.equity[i]));
+        });
+        context.stroke();
+        context.fillStyle = '#b0b0b0';
+        context.fillText(high.toFixed(2), 4, 10);
+        context.fillText(low.toFixed(2), 4, canvas.height - 4);
+    }
+
+    function loadTradePage(page) {
+        const order = tradeTable.descending ? 'desc' : 'asc';
+        fetch(`/results/${tradeTable.resultId}/trades?page=${page}&page_size=${TRADE_PAGE_SIZE}&sort=${tradeTable.sort}&order=${order}`)
+            .then(response => response.json())
+            .then(result => {
+                if (result.status !== 'success') {
+                    addSystemOutput(result.message);
+                    return;
+                }
+                renderTradePage(result);
+            })
+            .catch(error => console.error('Error loading trades:', error));
+    }
+
+    function renderTradePage(result) {
+        let container = document.getElementById('trades-container');
+        if (!container) {
+            container = document.createElement('div');
+            container.id = 'trades-container';
+            tableContainer.appendChild(container);
+        }
+        const table = document.createElement('table');
+        table.className = 'table table-sm table-dark';
+        const header = table.createTHead().insertRow();
+        TRADE_COLUMNS.forEach(([column, label]) => {
+            const cell = document.createElement('th');
+            const arrow = column === result.sort ? (result.descending ? ' \u25BC' : ' \u25B2') : '';
+            cell.textContent = label + arrow;
+            cell.style.cursor = 'pointer';
+            cell.addEventListener('click', () => {
+                // Clicking the sorted column flips the order, any other sorts by it ascending
+                tradeTable.descending = column === tradeTable.sort ? !tradeTable.descending : false;
+                tradeTable.sort = column;
+                loadTradePage(1);
+            });
+            header.appendChild(cell);
+        });
+        const body = table.createTBody();
+        result.trades.forEach(trade => {
+            const row = body.insertRow();
+            row.insertCell().textContent = new Date(trade.entry_time * 1000).toISOString().slice(0, 16).replace('T', ' ');
+            row.insertCell().textContent = new Date(trade.exit_time * 1000).toISOString().slice(0, 16).replace('T', ' ');
+            row.insertCell().textContent = trade.entry_price.toFixed(2);
+            row.insertCell().textContent = trade.exit_price.toFixed(2);
+            row.insertCell().textContent = (trade.return * 100).toFixed(2) + '%';
+            row.insertCell().textContent = trade.exit_reason;
+        });
+
+        const pager = document.createElement('div');
+        const previous = document.createElement('button');
+        previous.className = 'btn btn-secondary btn-sm me-2';
+        previous.textContent = 'Previous';
+        previous.disabled = result.page <= 1;
+        previous.addEventListener('click', () => loadTradePage(result.page - 1));
+        const next = document.createElement('button');
+        next.className = 'btn btn-secondary btn-sm ms-2';
+        next.textContent = 'Next';
+        next.disabled = result.page >= result.pages;
+        next.addEventListener('click', () => loadTradePage(result.page + 1));
+        const position = document.createElement('span');
+        position.textContent = `Page ${result.page} of ${Math.max(result.pages, 1)} (${result.total} trades)`;
+        pager.append(previous, position, next);
+
+        container.innerHTML = '';
+        container.append(table, pager);
+    }
+
+    runBacktestButton.addEventListener('click', function() {
+        const selectedStrategyName = strategySelector.value;
+        if (!selectedStrategyName) {
+            addSystemOutput('Please select a strategy before running a backtest.');
+            return;
+        }
+        addSystemOutput(`Running backtest for ${selectedStrategyName} on ${instrumentSelect.value} ${timeframeSelect.value}...`);
+
+        fetch('/run_backtest', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                name: selectedStrategyName,
+                instrument: instrumentSelect.value,
+                timeframe: timeframeSelect.value
+            }),
+        })
+        .then(response => response.json())
+        .then(result => {
+            if (result.status !== 'success') {
+                addSystemOutput(result.message);
+                return;
+            }
+            displayBacktestMetrics(result.metrics);
+            loadEquityCurve(result.result_id);
+            tradeTable = {resultId: result.result_id, sort: 'entry_time', descending: false};
+            loadTradePage(1);
+            addSystemOutput(`Backtest complete: ${result.metrics.num_trades} trades.`);
+        })
+        .catch(error => {
+            console.error('Error running backtest:', error);
+            addSystemOutput('An error occurred while running the backtest.');
+        });
+    });
+
+    function displayRobustness(result) {
+        const mc = result.monte_carlo;
+        const wf = result.walk_forward.test;
+        const percent = value => (value * 100).toFixed(2) + '%';
+        const rows = [
+            ['', 'P5', 'Median', 'P95'],
+            ['MC Return', ...['p5', 'p50', 'p95'].map(p => percent(mc.total_return[p]))],
+            ['MC Drawdown', ...['p5', 'p50', 'p95'].map(p => percent(mc.max_drawdown[p]))],
+            ['MC Sharpe', ...['p5', 'p50', 'p95'].map(p => mc.sharpe[p].toFixed(2))],
+            ['WF Return', ...['p5', 'p50', 'p95'].map(p => percent(wf.total_return[p]))],
+            ['WF Sharpe', ...['p5', 'p50', 'p95'].map(p => wf.sharpe[p].toFixed(2))],
+        ];
+        const table = document.createElement('table');
+        table.className = 'table table-sm table-dark';
+        rows.forEach(values => {
+            const row = table.insertRow();
+            values.forEach(value => row.insertCell().textContent = value);
+        });
+        tableContainer.innerHTML = '';
+        tableContainer.appendChild(table);
+    }
+
+    runRobustnessButton.addEventListener('click', function() {
+        const selectedStrategyName = strategySelector.value;
+        if (!selectedStrategyName) {
+            addSystemOutput('Please select a strategy before running a robustness analysis.');
+            return;
+        }
+        addSystemOutput(`Running walk-forward and Monte Carlo analysis for ${selectedStrategyName}...`);
+
+        fetch('/run_robustness', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                name: selectedStrategyName,
+                instrument: instrumentSelect.value,
+                timeframe: timeframeSelect.value
+            }),
+        })
+        .then(response => response.json())
+        .then(result => {
+            if (result.status !== 'success') {
+                addSystemOutput(result.message);
+                return;
+            }
+            displayRobustness(result);
+            addSystemOutput(`Robustness complete: ${result.walk_forward.windows.length} walk-forward windows, ` +
+                            `${result.monte_carlo.resamples} resamples, ` +
+                            `${(result.monte_carlo.probability_of_loss * 100).toFixed(1)}% chance of loss.`);
+        })
+        .catch(error => {
+            console.error('Error running robustness analysis:', error);
+            addSystemOutput('An error occurred while running the robustness analysis.');
+        });
+    });
+
     // Load strategies when the page loads
     loadStrategies();
 
@@ -0,0 +1,180 @@
+from typing import Dict, Optional, Tuple
+import json
+import re
+import threading
+import numpy as np
+
+from indicators import MOVING_AVERAGES, SeriesIndicators
+from strategy_store import StrategyStore
+
+class StrategyError(ValueError):
+    """Raised when a stored strategy can't be turned into something executable."""
+
+def crosses_above(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    return _crossing(fast > slow, fast, slow)
+
+def crosses_below(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    return _crossing(fast < slow, fast, slow)
+
+def _crossing(state: np.ndarray, fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    # True on bars where the state turns on, ignoring the warm-up of either average
+    valid = ~(np.isnan(fast) | np.isnan(slow))
+    signal = np.zeros(len(state), dtype=bool)
+    signal[1:] = state[1:] & ~state[:-1] & valid[1:] & valid[:-1]
+    return signal
+
+OPERATORS = {'crosses_above': crosses_above, 'crosses_below': crosses_below}
+
+# Free-text conditions from the LLM, matched in order
+CONDITION_PATTERNS = [
+    (re.compile(r'\b(below|under|beneath|death cross)\b', re.IGNORECASE), 'crosses_below'),
+    (re.compile(r'\b(above|over|golden cross)\b', re.IGNORECASE), 'crosses_above'),
+]
+
+class MovingAverage:
+    __slots__ = ('kind', 'period')
+
+    def __init__(self, kind: str, period: int):
+        self.kind = kind
+        self.period = period
+
+    def values(self, indicators: SeriesIndicators) -> np.ndarray:
+        return indicators.moving_average(self.kind, self.period)
+
+    def __repr__(self):
+        return f"{self.kind}({self.period})"
+
+class Condition:
+    """A fast/slow moving average comparison with its operator resolved to a function."""
+    __slots__ = ('fast', 'slow', 'operator', 'evaluate')
+
+    def __init__(self, fast: MovingAverage, slow: MovingAverage, operator: str):
+        self.fast = fast
+        self.slow = slow
+        self.operator = operator
+        self.evaluate = OPERATORS[operator]
+
+    def signal(self, indicators: SeriesIndicators) -> np.ndarray:
+        return self.evaluate(self.fast.values(indicators), self.slow.values(indicators))
+
+    def __repr__(self):
+        return f"{self.fast!r} {self.operator} {self.slow!r}"
+
+class CompiledStrategy:
+    """Validated, executable form of a strategy in the generate_strategy_json schema.
+
+    stop_loss and take_profit are fractions of the entry price (0 = disabled);
+    position_fraction is the share of equity committed per trade.
+    """
+    __slots__ = ('name', 'entry', 'exit', 'stop_loss', 'take_profit', 'position_fraction', 'definition')
+
+    def __init__(self, name: str, entry: Condition, exit: Condition, stop_loss: float, take_profit: float,
+                 position_fraction: float, definition: Dict):
+        self.name = name
+        self.entry = entry
+        self.exit = exit
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.position_fraction = position_fraction
+        self.definition = definition
+
+    def __repr__(self):
+        return f"CompiledStrategy({self.name!r}, entry={self.entry!r}, exit={self.exit!r})"
+
+def _param_value(block: Dict, key: str) -> int:
+    param = block.get(key) or {}
+    value = param.get('value') or 0
+    if not isinstance(value, (int, float)) or value < 0:
+        raise StrategyError(f"{key} must be a non-negative number, got {value!r}")
+    return value
+
+def _compile_condition(condition: Dict, label: str) -> Condition:
+    # 'EMA and SMA' style indicators use the first average for the fast line and
+    # the second for the slow line
+    if not isinstance(condition, dict):
+        raise StrategyError(f"{label} is missing")
+    kinds = re.findall(r'\b(SMA|EMA)\b', condition.get('indicator', '').upper())
+    if not kinds:
+        raise StrategyError(f"{label} indicator {condition.get('indicator')!r} is not one of {sorted(MOVING_AVERAGES)}")
+    fast_kind, slow_kind = kinds[0], kinds[1] if len(kinds) > 1 else kinds[0]
+    fast_period = int(_param_value(condition, 'parameter_1'))
+    slow_period = int(_param_value(condition, 'parameter_2'))
+    if not fast_period or not slow_period:
+        raise StrategyError(f"{label} needs two moving average periods")
+    text = condition.get('condition', '')
+    operator = next((op for pattern, op in CONDITION_PATTERNS if pattern.search(text)), 'crosses_above')
+    return Condition(MovingAverage(fast_kind, fast_period), MovingAverage(slow_kind, slow_period), operator)
+
+def _risk_levels(definition: Dict) -> Tuple[float, float]:
+    # A take-profit given as a risk/reward ratio is expressed as a multiple of the stop
+    stop = _param_value(definition.get('stop_loss') or {}, 'parameter_1') / 100.0
+    take_profit = definition.get('take_profit') or {}
+    target = _param_value(take_profit, 'parameter_1')
+    if 'ratio' in (take_profit.get('parameter_1') or {}).get('name', '').lower():
+        return stop, stop * target
+    return stop, target / 100.0
+
+def _position_fraction(definition: Dict) -> float:
+    # Only percentage sizing is interpreted; anything else commits the full equity
+    position_size = definition.get('position_size') or {}
+    value = position_size.get('value') or 0
+    if 'percent' in position_size.get('type', '').lower() and value > 0:
+        return min(value / 100.0, 1.0)
+    return 1.0
+
+def compile_strategy(definition: Dict, name: Optional[str] = None) -> CompiledStrategy:
+    """Compiles a strategy definition (the parsed 'json' field of a stored strategy).
+
+    Raises:
+        StrategyError: if the definition can't be executed
+    """
+    if isinstance(definition, str):
+        try:
+            definition = json.loads(definition)
+        except json.JSONDecodeError as e:
+            raise StrategyError(f"Strategy JSON is invalid: {e}") from e
+    entry = _compile_condition(definition.get('entry_condition'), 'entry_condition')
+    exit = _compile_condition(definition.get('exit_condition'), 'exit_condition')
+    stop_loss, take_profit = _risk_levels(definition)
+    return CompiledStrategy(name or definition.get('strategy_name', ''), entry, exit, stop_loss, take_profit,
+                            _position_fraction(definition), definition)
+
+class StrategyCache:
+    """Compiled strategies keyed by (user, name), recompiled only when the stored row changes.
+
+    Strategies that fail to compile are cached as their error, so a bad LLM
+    output is reported without being re-parsed on every request.
+    """
+
+    def __init__(self, store: StrategyStore):
+        self.store = store
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str, name: str) -> Optional[CompiledStrategy]:
+        """Returns the compiled strategy, None if there is no such strategy.
+
+        Raises:
+            StrategyError: if the stored strategy doesn't compile
+        """
+        row = self.store.get(user_id, name)
+        if row is None:
+            return None
+        key = (user_id, name)
+        with self._lock:
+            cached = self._compiled.get(key)
+        if cached is None or cached[0] != row['id']:
+            try:
+                compiled = compile_strategy(row['json'], name)
+            except StrategyError as e:
+                compiled = e
+            cached = (row['id'], compiled)
+            with self._lock:
+                self._compiled[key] = cached
+        if isinstance(cached[1], StrategyError):
+            raise StrategyError(str(cached[1]))
+        return cached[1]
+
+    def discard(self, user_id: str, name: str) -> None:
+        with self._lock:
+            self._compiled.pop((user_id, name), None)
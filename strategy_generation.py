@@ -0,0 +1,370 @@
+from typing import AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+import asyncio
+import json
+import time
+
+import metrics
+
+class StrategyGenerationError(ValueError):
+    """Raised when a single-pass completion can't be split into a summary and strategy JSON."""
+
+SUMMARY_SYSTEM_PROMPT = "You are a Strategy Summarizer Agent. Your task is to analyze the chat history and extract a clear, concise summary of the trading strategy discussed. Your summary should include the following: 1. Entry Condition 2. Exit Condition 3. Position Sizing 4. Stop Loss Condition 5. Take Profit Condition \n\n"
+
+JSON_SYSTEM_PROMPT = """You are an expert in creating trading strategies. Your task is to convert the provided strategy summary into a structured JSON representation.
+             Example strategy summary:
+             Strategy Name: Simple Moving Average Crossover Strategy
+             Strategy Summary: Using a fast period of 10, and slow period of 50, entry condition is when the fast SMA crosses over the slow SMA. Exit condition is when fast SMA crosses below the slow SMA. Use a fixed position size of 100. Stop loss will be 2 percent below entry price. Take profit will be 5 percent above entry price.
+             
+             Example output (not perfect formatting, just to convey the example):
+             strategy_name: Simple Moving Average Crossover Strategy
+
+             entry_condition: {
+             indicator: SMA,
+             parameter_1: {
+             name: fast_period,
+             value: 10
+             },
+             parameter_2: {
+             name: slow_period,
+             value: 50
+             },
+             parameter_3: {
+             name: N/A,
+             value: 0
+             },
+             condition: fast SMA crosses above slow SMA
+             }
+             
+             exit_condition: {
+             indicator: SMA,
+             parameter_1: {
+             name: fast_period,
+             value: 10
+             },
+             parameter_2: {
+             name: slow_period,
+             value: 50
+             },
+             parameter_3: {
+             name: N/A,
+             value: 0
+             },
+             condition: fast SMA crosses below slow SMA
+             }
+
+             position_size: {
+             type: fixed,
+             value: 100
+             }
+
+             stop_loss: {
+             parameter_1: {
+             name: percentage of entry price,
+             value: 2
+             },
+             parameter_2: {
+             name: N/A
+             value: 0
+             },
+             parameter_3: {
+             name: N/A,
+             value: 0
+             },
+             condition: price falls below entry price
+             }
+
+             take_profit: {
+             parameter_1: {
+             name: percentage of entry price,
+             value: 5
+             },
+             parameter_2: {
+             name: N/A
+             value: 0
+             },
+             parameter_3: {
+             name: N/A,
+             value: 0
+             },
+             condition: price goes above entry price             
+             }
+
+             """
+
+# The structured output schema already fixes the shape, so the single pass only
+# needs the conventions the inlined example conveyed in the two-stage prompt
+SINGLE_PASS_SYSTEM_PROMPT = (
+    "You are an expert in creating trading strategies. Analyze the chat history and describe the trading "
+    "strategy discussed. First write strategy_summary: a clear, concise summary covering 1. Entry Condition "
+    "2. Exit Condition 3. Position Sizing 4. Stop Loss Condition 5. Take Profit Condition. Then fill in the "
+    "structured fields so they match the summary. Indicators are SMA or EMA; parameter_1 is the fast period and "
+    "parameter_2 the slow period. Stop loss and take profit parameter_1 is a percentage of entry price. "
+    "Unused parameters have name N/A and value 0."
+)
+
+def _object(properties: Dict) -> Dict:
+    # Strict structured outputs require every property and no others
+    return {
+        "type": "object",
+        "properties": properties,
+        "required": list(properties),
+        "additionalProperties": False
+    }
+
+STRING = {"type": "string"}
+INTEGER = {"type": "integer"}
+PARAMETER = _object({"name": STRING, "value": INTEGER})
+
+def _with_parameters(**fields) -> Dict:
+    # A block with its own fields followed by parameter_1..parameter_3
+    return _object({**fields, **{f"parameter_{i}": PARAMETER for i in range(1, 4)}})
+
+STRATEGY_PROPERTIES = {
+    "strategy_name": STRING,
+    "entry_condition": _with_parameters(indicator=STRING, condition=STRING),
+    "exit_condition": _with_parameters(indicator=STRING, condition=STRING),
+    "position_size": _object({"type": STRING, "value": INTEGER}),
+    "stop_loss": _with_parameters(condition=STRING),
+    "take_profit": _with_parameters(condition=STRING),
+}
+STRATEGY_SCHEMA = _object(STRATEGY_PROPERTIES)
+# Summary first: structured outputs are generated in schema order, so it can be streamed before the rest
+SINGLE_PASS_SCHEMA = _object({"strategy_summary": STRING, **STRATEGY_PROPERTIES})
+
+def _response_format(name: str, schema: Dict) -> Dict:
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+def summarize_strategy_request(chat_history, model: str) -> Dict:
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Summarize the trading strategy from this chat history:\n\n{chat_history}"}
+        ]
+    )
+
+def generate_strategy_json_request(strategy_summary, model: str) -> Dict:
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": JSON_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Create a JSON representation of this strategy:\n\n{strategy_summary}"}
+        ],
+        response_format=_response_format("strategy_to_json", STRATEGY_SCHEMA)
+    )
+
+def single_pass_request(chat_history, model: str) -> Dict:
+    return dict(
+        model=model,
+        messages=[
+            {"role": "system", "content": SINGLE_PASS_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Describe the trading strategy from this chat history:\n\n{chat_history}"}
+        ],
+        response_format=_response_format("strategy_with_summary", SINGLE_PASS_SCHEMA)
+    )
+
+def split_single_pass(content: Optional[str]) -> Tuple[str, str]:
+    """Splits a single-pass completion into (strategy_summary, strategy_json).
+
+    strategy_json is serialized in the same shape generate_strategy_json returns.
+
+    Raises:
+        StrategyGenerationError: if the completion is missing, truncated or off-schema
+    """
+    try:
+        data = json.loads(content or '')
+    except json.JSONDecodeError as e:
+        raise StrategyGenerationError(f"Single-pass output is not valid JSON: {e}") from e
+    if not isinstance(data, dict) or not isinstance(data.get('strategy_summary'), str) \
+            or any(key not in data for key in STRATEGY_PROPERTIES):
+        raise StrategyGenerationError("Single-pass output does not match the strategy schema")
+    summary = data.pop('strategy_summary')
+    return summary, json.dumps(data)
+
+class SummaryStream:
+    """Pulls the strategy_summary string out of a streamed single-pass completion.
+
+    feed() takes raw JSON text deltas and returns the newly decoded summary
+    text, so the summary can be shown while the rest of the JSON is generated.
+    """
+
+    KEY = '"strategy_summary"'
+
+    def __init__(self):
+        self.raw = ''
+        self._start = None  # index of the first character of the summary value
+        self._pos = None    # raw index decoded up to
+        self.done = False
+
+    def feed(self, text: str) -> str:
+        self.raw += text
+        if self.done:
+            return ''
+        if self._start is None:
+            key = self.raw.find(self.KEY)
+            if key < 0:
+                return ''
+            colon = self.raw.find(':', key + len(self.KEY))
+            quote = self.raw.find('"', colon + 1) if colon >= 0 else -1
+            if quote < 0:
+                return ''
+            self._start = self._pos = quote + 1
+        return self._decode()
+
+    def _decode(self) -> str:
+        # Decode up to the last complete escape sequence, or to the closing quote
+        raw, i, end = self.raw, self._pos, self._pos
+        while i < len(raw):
+            c = raw[i]
+            if c == '"':
+                self.done = True
+                break
+            if c != '\\':
+                i += 1
+                end = i
+                continue
+            if i + 1 >= len(raw):
+                break
+            if raw[i + 1] != 'u':
+                i += 2
+            elif i + 6 > len(raw):
+                break
+            # A high surrogate is only decodable together with the low surrogate after it
+            elif 0xD800 <= int(raw[i + 2:i + 6], 16) <= 0xDBFF:
+                if i + 12 > len(raw):
+                    break
+                i += 12
+            else:
+                i += 6
+            end = i
+        piece = json.loads('"' + raw[self._pos:end] + '"')
+        self._pos = end
+        return piece
+
+class SyncCompletions:
+    """The model and response cache as the generation coroutines below see them, for the sync client.
+
+    Calls block the calling thread; the Flask routes drive the coroutines with
+    run_sync and iterate_sync.
+
+    Args:
+        create: create(kwargs) returns a non-streamed completion through the response cache
+        stream: stream(kwargs) returns the chunks of a streamed completion
+        cache: the ResponseCache
+        no_fallback: exceptions raised as they are instead of falling back to the two-stage path
+    """
+
+    def __init__(self, create: Callable, stream: Callable, cache, no_fallback: Tuple[type, ...] = ()):
+        self._create = create
+        self._stream = stream
+        self.cache = cache
+        self.no_fallback = no_fallback
+
+    async def complete(self, kwargs: Dict):
+        return self._create(kwargs)
+
+    async def stream(self, kwargs: Dict) -> AsyncIterator:
+        for chunk in self._stream(kwargs):
+            yield chunk
+
+    async def _cache(self, method: Callable, *args):
+        return method(*args)
+
+    async def lookup(self, kwargs: Dict):
+        return await self._cache(self.cache.lookup, kwargs)
+
+    async def store_content(self, kwargs: Dict, content: str) -> None:
+        await self._cache(self.cache.store_content, kwargs, content)
+
+    async def discard(self, kwargs: Dict) -> None:
+        await self._cache(self.cache.discard, kwargs)
+
+class AsyncCompletions(SyncCompletions):
+    """SyncCompletions for the async client: create and stream are awaited, cache calls run on a thread."""
+
+    async def complete(self, kwargs: Dict):
+        return await self._create(kwargs)
+
+    async def stream(self, kwargs: Dict) -> AsyncIterator:
+        async for chunk in self._stream(kwargs):
+            yield chunk
+
+    async def _cache(self, method: Callable, *args):
+        return await asyncio.to_thread(method, *args)
+
+def run_sync(coroutine):
+    # Runs a generation coroutine over SyncCompletions on the calling thread
+    return asyncio.run(coroutine)
+
+def iterate_sync(events: AsyncIterator) -> Iterator:
+    # Steps an async generator over SyncCompletions on a private event loop, one item per next()
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(anext(events))
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.close()
+
+async def generate_two_stage(completions: SyncCompletions, chat_history, model: str) -> Tuple[str, str]:
+    # Summarize, then convert the summary to JSON: two round-trips, used when the single pass fails
+    response = await completions.complete(summarize_strategy_request(chat_history, model))
+    strategy_summary = response.choices[0].message.content
+    response = await completions.complete(generate_strategy_json_request(strategy_summary, model))
+    return strategy_summary, response.choices[0].message.content
+
+async def generate_single_pass(completions: SyncCompletions, chat_history, model: str) -> Tuple[str, str]:
+    """(strategy_summary, strategy_json) from one schema-constrained call, falling back to two stages."""
+    kwargs = single_pass_request(chat_history, model)
+    try:
+        response = await completions.complete(kwargs)
+        try:
+            return split_single_pass(response.choices[0].message.content)
+        except StrategyGenerationError:
+            await completions.discard(kwargs)
+            raise
+    except completions.no_fallback:
+        raise
+    except Exception as e:
+        print(f'Single-pass strategy generation failed, using two stages: {e}')
+        return await generate_two_stage(completions, chat_history, model)
+
+async def generate_strategy_events(completions: SyncCompletions, chat_history, model: str) -> AsyncIterator[Dict]:
+    """Streams single-pass generation.
+
+    Yields {'summary_delta'} payloads while the summary is generated, then one
+    {'strategy_summary', 'strategy_json'} payload. A cached completion yields
+    only the final payload. If the single pass fails, the two-stage path
+    produces the final payload instead.
+    """
+    started = time.perf_counter()
+    kwargs = single_pass_request(chat_history, model)
+    summary_stream = SummaryStream()
+    try:
+        cached = await completions.lookup(kwargs)
+        if cached is not None:
+            summary_stream.feed(cached.choices[0].message.content)
+            try:
+                strategy_summary, strategy_json = split_single_pass(summary_stream.raw)
+            except StrategyGenerationError:
+                await completions.discard(kwargs)
+                raise
+        else:
+            async for chunk in completions.stream(kwargs):
+                delta = summary_stream.feed(chunk.choices[0].delta.content or '') if chunk.choices else ''
+                if delta:
+                    if started is not None:
+                        metrics.TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - started, route='/generate_strategy')
+                        started = None
+                    yield {'summary_delta': delta}
+            strategy_summary, strategy_json = split_single_pass(summary_stream.raw)
+            await completions.store_content(kwargs, summary_stream.raw)
+    except completions.no_fallback:
+        raise
+    except Exception as e:
+        print(f'Single-pass strategy generation failed, using two stages: {e}')
+        strategy_summary, strategy_json = await generate_two_stage(completions, chat_history, model)
+    yield {'strategy_summary': strategy_summary, 'strategy_json': strategy_json}
@@ -0,0 +1,123 @@
+from typing import Dict, List, Optional
+import glob
+import json
+import os
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS strategies (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    summary TEXT NOT NULL DEFAULT '',
+    json TEXT NOT NULL,
+    UNIQUE (user_id, name)
+);
+CREATE TABLE IF NOT EXISTS migrated_files (
+    path TEXT PRIMARY KEY
+);
+"""
+
+class StrategyStore:
+    """SQLite-backed strategy storage, one row per strategy.
+
+    Name lookups go through the unique (user_id, name) index and saves/deletes
+    touch a single row. WAL mode lets several worker processes read while one
+    writes. Rows are never updated in place, so a row id identifies one
+    version of a strategy.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections can't be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        return {'name': row['name'], 'summary': row['summary'], 'json': row['json']}
+
+    def list(self, user_id: str) -> List[Dict]:
+        rows = self._connect().execute(
+            'SELECT name, summary, json FROM strategies WHERE user_id = ? ORDER BY id', (user_id,))
+        return [self._to_dict(row) for row in rows]
+
+    def get(self, user_id: str, name: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            'SELECT id, name, summary, json FROM strategies WHERE user_id = ? AND name = ?', (user_id, name)).fetchone()
+        if row is None:
+            return None
+        return {'id': row['id'], **self._to_dict(row)}
+
+    def exists(self, user_id: str, name: str) -> bool:
+        row = self._connect().execute(
+            'SELECT 1 FROM strategies WHERE user_id = ? AND name = ?', (user_id, name)).fetchone()
+        return row is not None
+
+    def add_unique(self, user_id: str, strategy: Dict) -> str:
+        """Inserts a strategy under the first free name of 'Name', 'Name (1)', 'Name (2)', ...
+
+        The taken names are read with one range scan of the (user_id, name) index
+        inside the write transaction, so concurrent saves can't pick the same name.
+        Returns the name the strategy was saved under.
+        """
+        base = strategy['name']
+        prefix = f"{base} ("
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute(
+                'SELECT name FROM strategies WHERE user_id = ? AND (name = ? OR (name >= ? AND name < ?))',
+                (user_id, base, prefix, prefix + '\U0010ffff'))
+            taken = {row['name'] for row in rows}
+            name, counter = base, 1
+            while name in taken:
+                name = f"{base} ({counter})"
+                counter += 1
+            conn.execute('INSERT INTO strategies (user_id, name, summary, json) VALUES (?, ?, ?, ?)',
+                         (user_id, name, strategy.get('summary') or '', strategy['json']))
+        return name
+
+    def delete(self, user_id: str, name: str) -> bool:
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute('DELETE FROM strategies WHERE user_id = ? AND name = ?', (user_id, name))
+        return cursor.rowcount > 0
+
+    def migrate_legacy_files(self, directory: str) -> int:
+        """Imports {user_id}_strategies.json files that haven't been imported yet.
+
+        Files are left in place; strategies whose names already exist are skipped.
+        Returns the number of strategies imported.
+        """
+        imported = 0
+        conn = self._connect()
+        for path in sorted(glob.glob(os.path.join(directory, '*_strategies.json'))):
+            key = os.path.abspath(path)
+            with conn:
+                # Serializes workers that start at the same time
+                conn.execute('BEGIN IMMEDIATE')
+                if conn.execute('SELECT 1 FROM migrated_files WHERE path = ?', (key,)).fetchone():
+                    continue
+                user_id = os.path.basename(path)[:-len('_strategies.json')]
+                with open(path, 'r') as f:
+                    strategies = json.load(f)
+                for strategy in strategies:
+                    cursor = conn.execute(
+                        'INSERT OR IGNORE INTO strategies (user_id, name, summary, json) VALUES (?, ?, ?, ?)',
+                        (user_id, strategy['name'], strategy.get('summary') or '', strategy['json']))
+                    imported += cursor.rowcount
+                conn.execute('INSERT INTO migrated_files (path) VALUES (?)', (key,))
+        return imported
@@ -0,0 +1,153 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import copy
+import itertools
+import os
+import numpy as np
+
+import backtest
+from indicators import IndicatorCache, SeriesIndicators
+from strategy import CompiledStrategy, compile_strategy
+
+MAX_COMBINATIONS = 10000
+
+# Friendly names for the strategy fields that are usually swept together. Any
+# other dotted path into the strategy JSON (e.g. 'entry_condition.parameter_3')
+# is accepted as-is.
+SWEEP_ALIASES = {
+    'fast_period': ['entry_condition.parameter_1', 'exit_condition.parameter_1'],
+    'slow_period': ['entry_condition.parameter_2', 'exit_condition.parameter_2'],
+    'stop_loss': ['stop_loss.parameter_1'],
+    'take_profit': ['take_profit.parameter_1'],
+}
+# Metrics results can be ranked by; lower is better for ASCENDING_METRICS
+METRICS = set(backtest.compute_metrics(np.empty(0), np.empty(0)))
+ASCENDING_METRICS = {'max_drawdown'}
+
+SHARED_FIELDS = ('time', 'open', 'high', 'low', 'close')
+
+def expand_range(spec) -> List[int]:
+    """Accepts {'start', 'stop', 'step'} (stop inclusive, step defaults to 1) or a list of explicit values."""
+    if isinstance(spec, dict):
+        start, stop, step = int(spec['start']), int(spec['stop']), int(spec.get('step', 1))
+        if step <= 0:
+            raise ValueError("Range step must be positive")
+        return list(range(start, stop + 1, step))
+    if isinstance(spec, (list, tuple)):
+        return [int(v) for v in spec]
+    raise ValueError("Each range must be {'start', 'stop', 'step'} or a list of values")
+
+def build_grid(ranges: Dict) -> Tuple[List[str], List[Tuple[int, ...]]]:
+    names = list(ranges)
+    grid = list(itertools.product(*(expand_range(ranges[name]) for name in names)))
+    # Crossovers need the fast average to be shorter than the slow one
+    if 'fast_period' in names and 'slow_period' in names:
+        fast, slow = names.index('fast_period'), names.index('slow_period')
+        grid = [combo for combo in grid if combo[fast] < combo[slow]]
+    if len(grid) > MAX_COMBINATIONS:
+        raise ValueError(f"Sweep has {len(grid)} combinations, the limit is {MAX_COMBINATIONS}")
+    return names, grid
+
+def apply_params(strategy: Dict, names: Sequence[str], values: Sequence[int]) -> Dict:
+    strategy = copy.deepcopy(strategy)
+    for name, value in zip(names, values):
+        for path in SWEEP_ALIASES.get(name, [name]):
+            target = strategy
+            *parents, leaf = path.split('.')
+            for key in parents:
+                target = target[key]
+            if not isinstance(target.get(leaf), dict):
+                raise KeyError(f"'{name}' is not a sweepable strategy parameter")
+            target[leaf]['value'] = value
+    return strategy
+
+# Per-worker state set up once by _init_worker
+_worker = {}
+
+def _shared_columns(shm: shared_memory.SharedMemory, n: int) -> Dict[str, np.ndarray]:
+    # SHARED_FIELDS laid out back to back, all 8-byte values
+    columns = {}
+    for i, field in enumerate(SHARED_FIELDS):
+        dtype = np.int64 if field == 'time' else np.float64
+        columns[field] = np.ndarray((n,), dtype=dtype, buffer=shm.buf, offset=i * n * 8)
+    return columns
+
+def _init_worker(shm_name: str, n: int, lo: int, hi: int, definition: Dict, names: List[str],
+                 timeframe: str) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    series = _shared_columns(shm, n)
+    candles = {field: values[lo:hi] for field, values in series.items()}
+    # Averages over the whole series, sliced to the window, as in-process; a private cache
+    # because a forked worker would otherwise inherit the parent's entries
+    _worker.update(shm=shm, candles=candles, definition=definition, names=names, timeframe=timeframe,
+                   indicators=SeriesIndicators(series, ('sweep',), lo, hi, cache=IndicatorCache()))
+
+def _evaluate(values: Tuple[int, ...], state: Optional[Dict] = None) -> Dict:
+    state = state or _worker
+    # Compiling is cheap next to a backtest and validates the swept values
+    strategy = compile_strategy(apply_params(state['definition'], state['names'], values))
+    result = backtest.run_backtest(state['candles'], strategy, timeframe=state['timeframe'],
+                                   indicators=state['indicators'])
+    return result['metrics']
+
+def run_sweep(candles: Dict[str, np.ndarray], strategy: CompiledStrategy, ranges: Dict, timeframe: str = '1h',
+              metric: str = 'sharpe', processes: Optional[int] = None,
+              indicators: Optional[SeriesIndicators] = None) -> List[Dict]:
+    """Backtests every combination of the given parameter ranges and ranks the results.
+
+    Candle columns are copied once into a shared memory block that the worker
+    processes map directly, so tasks only carry their parameter tuple. Each
+    worker keeps its own indicator cache, and tasks are handed out in chunks of
+    neighbouring grid points so the moving averages a worker computes are reused.
+    The block holds the whole series behind `indicators`, so pooled and
+    in-process runs see the same warmed-up averages and give identical results.
+
+    Args:
+        candles (Dict[str, np.ndarray]): OHLCV columns
+        strategy (CompiledStrategy): base strategy whose definition the ranges override
+        ranges (Dict): {field: {'start', 'stop', 'step'} or [values...]}, see SWEEP_ALIASES
+        timeframe (str): candle timeframe
+        metric (str): metric to rank by
+        processes (int): worker count, defaults to the CPU count; 1 runs in-process
+        indicators (SeriesIndicators): indicators over the series `candles` is a window of
+
+    Returns:
+        List[Dict]: [{'rank', 'params', 'metrics'}], best first
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(sorted(METRICS))}")
+    names, grid = build_grid(ranges)
+    processes = processes or os.cpu_count() or 1
+    processes = min(processes, max(1, len(grid) // 8))
+
+    if indicators is None:
+        indicators = SeriesIndicators(candles, ('sweep',), cache=IndicatorCache())
+
+    if processes == 1:
+        state = {'candles': candles, 'definition': strategy.definition, 'names': names, 'timeframe': timeframe,
+                 'indicators': indicators}
+        results = [_evaluate(values, state) for values in grid]
+    else:
+        series = indicators.candles
+        n = len(series['close'])
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(SHARED_FIELDS) * n * 8))
+        try:
+            shared = _shared_columns(shm, n)
+            for field in SHARED_FIELDS:
+                shared[field][:] = series[field]
+            # Views must be released before the block can be closed
+            del shared
+            chunksize = max(1, len(grid) // (processes * 4))
+            initargs = (shm.name, n, indicators.lo, indicators.hi, strategy.definition, names, timeframe)
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=initargs) as pool:
+                results = list(pool.map(_evaluate, grid, chunksize=chunksize))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    ranked = [{'params': dict(zip(names, values)), 'metrics': metrics} for values, metrics in zip(grid, results)]
+    ranked.sort(key=lambda r: r['metrics'][metric], reverse=metric not in ASCENDING_METRICS)
+    for i, row in enumerate(ranked, 1):
+        row['rank'] = i
+    return ranked
@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+import numpy as np
+import pytest
+
+# Tests import the top-level modules directly; importing app needs its required settings,
+# and its caches go to a scratch directory so earlier runs can't answer for the model
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_scratch = tempfile.mkdtemp(prefix='tests-')
+for key, value in (('OPENAI_API_KEY', 'test'), ('FLASK_SECRET_KEY', 'test'),
+                   ('RESPONSE_CACHE_DB', os.path.join(_scratch, 'response_cache.db')),
+                   ('RESULTS_DB', os.path.join(_scratch, 'results.db'))):
+    os.environ.setdefault(key, value)
+
+def _parameter(name, value):
+    return {'name': name, 'value': value}
+
+@pytest.fixture
+def definition():
+    # A saved SMA crossover strategy, in the format the strategy JSON step produces
+    condition = lambda text: {'indicator': 'SMA', 'condition': text, 'parameter_1': _parameter('fast_period', 10),
+                              'parameter_2': _parameter('slow_period', 40), 'parameter_3': _parameter('N/A', 0)}
+    stop = lambda value: {'condition': 'percentage', 'parameter_1': _parameter('percentage', value),
+                          'parameter_2': _parameter('N/A', 0), 'parameter_3': _parameter('N/A', 0)}
+    return {'strategy_name': 'Test Crossover',
+            'entry_condition': condition('SMA10 crosses above SMA40'),
+            'exit_condition': condition('SMA10 crosses below SMA40'),
+            'position_size': {'type': 'percentage', 'value': 50},
+            'stop_loss': stop(3), 'take_profit': stop(6)}
+
+@pytest.fixture
+def candles():
+    # 3000 hourly bars of a seeded random walk
+    n = 3000
+    rng = np.random.default_rng(7)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.005, n)) * close
+    return {'time': 1_600_000_000 + 3600 * np.arange(n, dtype=np.int64), 'open': open_,
+            'high': np.maximum(open_, close) + spread, 'low': np.minimum(open_, close) - spread,
+            'close': close, 'volume': rng.exponential(10, n)}
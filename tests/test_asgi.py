@@ -0,0 +1,163 @@
+import asyncio
+import json
+import httpx
+import pytest
+from tenacity import wait_none
+
+import app
+import asgi
+import metrics
+from async_llm import AsyncLLM
+
+def _chunk(delta, finish_reason=None):
+    return {'id': 'mock', 'object': 'chat.completion.chunk', 'created': 0, 'model': app.GPT_MODEL,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+def _stream(chunks, fail_after=None):
+    # A streamed completion; with fail_after the connection drops after that many chunks
+    async def body():
+        for i, chunk in enumerate(chunks):
+            if i == fail_after:
+                raise httpx.ReadError("connection lost")
+            yield f"data: {json.dumps(chunk)}\n\n".encode()
+        yield b"data: [DONE]\n\n"
+    return httpx.Response(200, headers={'content-type': 'text/event-stream'}, content=body())
+
+def text_stream(*pieces, fail_after=None):
+    return _stream([_chunk({'content': piece}) for piece in pieces] + [_chunk({}, 'stop')], fail_after)
+
+def tool_call_stream(name, arguments='{}'):
+    call = {'index': 0, 'id': 'call_1', 'type': 'function', 'function': {'name': name, 'arguments': arguments}}
+    return _stream([_chunk({'tool_calls': [call]}), _chunk({}, 'tool_calls')])
+
+def server_error():
+    return httpx.Response(500, json={'error': {'message': "mock failure", 'type': 'server_error'}})
+
+class MockCompletions:
+    """Chat completions endpoint answering each request with the next scripted response."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(json.loads(request.content))
+        return self.responses.pop(0)
+
+class Reply:
+    def __init__(self, messages):
+        start = next(m for m in messages if m['type'] == 'http.response.start')
+        self.status = start['status']
+        self.headers = dict(start['headers'])
+        bodies = [m for m in messages if m['type'] == 'http.response.body']
+        self.complete = not bodies[-1].get('more_body', False)
+        self.body = b''.join(m.get('body', b'') for m in bodies).decode()
+
+    def events(self):
+        # (event, data) per server-sent event
+        events = []
+        for frame in self.body.split('\n\n')[:-1]:
+            lines = frame.split('\n')
+            event = next((line[len('event: '):] for line in lines if line.startswith('event: ')), 'message')
+            events.append((event, '\n'.join(line[len('data: '):] for line in lines if line.startswith('data: '))))
+        return events
+
+    def text(self):
+        return ''.join(data for event, data in self.events() if event == 'message')
+
+    def conversation(self):
+        cookie = self.headers[b'set-cookie'].decode().split(';')[0].split('=', 1)[1]
+        session = app.app.session_interface.get_signing_serializer(app.app).loads(cookie)
+        return app.conversation_store.load(session['conversation_id'])['memory']
+
+@pytest.fixture(autouse=True)
+def no_retry_wait(monkeypatch):
+    monkeypatch.setattr(AsyncLLM._create.retry, 'wait', wait_none())
+
+def post(completions, path, body, busy=False, **llm_options):
+    """Sends one request through asgi.application with the LLM client talking to `completions`."""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': json.dumps(body).encode(), 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        llm = asgi._llm = AsyncLLM(api_key='test', transport=httpx.MockTransport(completions.handle), **llm_options)
+        if busy:
+            for _ in range(llm.max_concurrency):
+                await llm._slots.acquire()
+        try:
+            await asgi.application({'type': 'http', 'method': 'POST', 'path': path, 'headers': []}, receive, send)
+        finally:
+            await llm.aclose()
+            asgi._llm = None
+
+    asyncio.run(run())
+    return Reply(messages)
+
+def _counter(counter, **labels):
+    return sum(s['value'] for s in counter.snapshot() if s['labels'] == labels)
+
+def test_chat_streams_the_reply_and_records_it():
+    completions = MockCompletions(text_stream("Hello", " there", "\nfriend"))
+    reply = post(completions, '/chat', {'message': "hi"})
+    assert reply.status == 200
+    assert reply.headers[b'content-type'] == b'text/event-stream'
+    assert reply.text() == "Hello there\nfriend"
+    assert reply.events()[-1] == ('done', '[DONE]')
+    assert reply.complete
+    assert completions.requests[0]['stream'] is True
+    assert reply.conversation()[-1] == {'role': 'assistant', 'content': "Hello there\nfriend"}
+
+def test_full_queue_gets_503():
+    completions = MockCompletions()
+    reply = post(completions, '/chat', {'message': "hi"}, busy=True, max_concurrency=1, queue_timeout=0.01)
+    assert reply.status == 503
+    assert json.loads(reply.body)['status'] == 'error'
+    assert completions.requests == []
+
+def test_failed_completion_is_retried_then_gets_502():
+    retries = _counter(metrics.LLM_RETRIES, function='_create')
+    errors = _counter(metrics.LLM_ERRORS, client='async')
+    completions = MockCompletions(server_error(), server_error(), server_error())
+    reply = post(completions, '/chat', {'message': "hi"})
+    assert reply.status == 502
+    assert json.loads(reply.body) == {"status": "error", "message": "The language model request failed"}
+    assert len(completions.requests) == 3
+    assert _counter(metrics.LLM_RETRIES, function='_create') == retries + 2
+    assert _counter(metrics.LLM_ERRORS, client='async') == errors + 1
+
+def test_stream_failing_part_way_ends_with_an_error_event():
+    completions = MockCompletions(text_stream("Hello", " there", " friend", fail_after=1))
+    reply = post(completions, '/chat', {'message': "hi"})
+    assert reply.status == 200
+    assert reply.text() == "Hello"
+    assert reply.events()[-1] == ('error', "The language model request failed")
+    assert reply.complete
+
+def test_failed_tool_follow_up_keeps_the_tool_messages():
+    completions = MockCompletions(tool_call_stream('list_strategies'), server_error(), server_error(),
+                                  server_error())
+    reply = post(completions, '/chat', {'message': "What strategies do I have?"})
+    assert reply.status == 200
+    assert reply.text() == "Unable to complete the response after running tools."
+    assert reply.events()[-1] == ('done', '[DONE]')
+    memory = reply.conversation()
+    assert [m['role'] for m in memory[-3:]] == ['assistant', 'tool', 'assistant']
+    assert memory[-3]['tool_calls'][0]['function']['name'] == 'list_strategies'
+    assert memory[-1]['content'] == "Unable to complete the response after running tools."
+
+def test_strategy_generation_streams_the_summary(definition):
+    strategy = {'strategy_summary': "Buy when the 10 SMA crosses above the 40 SMA.", **definition}
+    content = json.dumps(strategy)
+    completions = MockCompletions(text_stream(*(content[i:i + 8] for i in range(0, len(content), 8))))
+    reply = post(completions, '/generate_strategy', {'chat_history': "User: an SMA crossover", 'stream': True})
+    assert reply.status == 200
+    payloads = [json.loads(data) for event, data in reply.events()]
+    summary = ''.join(p.get('summary_delta', '') for p in payloads)
+    assert summary == strategy['strategy_summary']
+    assert payloads[-1]['strategy_summary'] == strategy['strategy_summary']
+    assert json.loads(payloads[-1]['strategy_json']) == definition
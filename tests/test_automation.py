@@ -0,0 +1,43 @@
+import time
+import numpy as np
+import pytest
+
+import backtest
+from automation import AutomationEngine, StrategyRunner, replay_feed
+from strategy import compile_strategy
+
+def _variant(definition, kind, stop, take_profit):
+    for condition in ('entry_condition', 'exit_condition'):
+        definition[condition]['indicator'] = kind
+    definition['stop_loss']['parameter_1']['value'] = stop
+    definition['take_profit']['parameter_1']['value'] = take_profit
+    return compile_strategy(definition)
+
+def _wait(engine, runner_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = next(s for s in engine.status() if s['id'] == runner_id)
+        if not status['running']:
+            return status
+        time.sleep(0.01)
+    raise TimeoutError("Replay didn't finish")
+
+@pytest.mark.parametrize('kind, stop, take_profit', [('SMA', 0, 0), ('SMA', 3, 6), ('EMA', 0, 0), ('EMA', 2, 4)])
+def test_replayed_runners_trade_like_the_backtester(candles, definition, kind, stop, take_profit):
+    strategy = _variant(definition, kind, stop, take_profit)
+    expected = backtest.run_backtest(candles, strategy)['trades']
+    engine = AutomationEngine(lambda key: replay_feed(candles))
+    runner = StrategyRunner(strategy, 'BTC/USD', '1h')
+    status = _wait(engine, engine.add(('replay', 'BTC/USD', '1h'), runner))
+
+    assert status['error'] is None
+    assert status['bars'] == len(candles['close'])
+    assert runner.num_trades == len(expected['return']) > 0
+    # The runner keeps the latest HISTORY_LIMIT trades
+    trades = runner.trades
+    n = len(trades)
+    assert [t['entry_time'] for t in trades] == expected['entry_time'][-n:].tolist()
+    assert [t['exit_time'] for t in trades] == expected['exit_time'][-n:].tolist()
+    assert [t['exit_reason'] for t in trades] == expected['exit_reason'][-n:].tolist()
+    np.testing.assert_allclose([t['exit_price'] for t in trades], expected['exit_price'][-n:])
+    np.testing.assert_allclose([t['return'] for t in trades], expected['return'][-n:])
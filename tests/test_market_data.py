@@ -0,0 +1,42 @@
+import asyncio
+import numpy as np
+
+from market_data import MarketDataBus, synthetic_ticks
+from resample import TIMEFRAME_SECONDS, resample
+
+def test_bus_bars_match_resampled_ticks_including_the_last():
+    timeframes = ['1h', '4h', '1d']
+
+    async def run():
+        bus = MarketDataBus(['BTC/USD'], timeframes)
+        subscriptions = {tf: bus.subscribe('BTC/USD', tf) for tf in timeframes}
+        ticks = []
+
+        async def recorded():
+            async for tick in synthetic_ticks(30000, 1_600_000_000, seconds_per_tick=45, seed=3, limit=5000):
+                ticks.append(tick)
+                yield tick
+
+        async def collect(subscription):
+            bars = []
+            async for bar in subscription:
+                bars.append(bar)
+            return bars
+
+        readers = {tf: asyncio.create_task(collect(s)) for tf, s in subscriptions.items()}
+        await bus.run('BTC/USD', recorded())
+        while any(s.cursor < s.topic.seq for s in subscriptions.values()):
+            await asyncio.sleep(0)
+        for subscription in subscriptions.values():
+            await subscription.aclose()
+        return ticks, {tf: await reader for tf, reader in readers.items()}
+
+    ticks, bars = asyncio.run(run())
+    times, prices, sizes = (np.array(column) for column in zip(*ticks))
+    candles = {'time': times.astype(np.int64), 'open': prices, 'high': prices, 'low': prices, 'close': prices,
+               'volume': sizes}
+    for tf in timeframes:
+        expected = resample(candles, TIMEFRAME_SECONDS[tf])
+        assert [bar['time'] for bar in bars[tf]] == expected['time'].tolist()
+        for field in ('open', 'high', 'low', 'close', 'volume'):
+            np.testing.assert_allclose([bar[field] for bar in bars[tf]], expected[field])
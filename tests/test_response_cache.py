@@ -0,0 +1,41 @@
+import threading
+
+from response_cache import ResponseCache
+
+def _totals(cache):
+    conn = cache._connect()
+    return (conn.execute('SELECT entries, bytes FROM totals').fetchone(),
+            conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone())
+
+def test_totals_follow_writes_and_eviction(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_bytes=300)
+    for i in range(3):
+        cache.put(f'key{i}', 'x' * 100)
+    assert cache.get('key0') is not None  # now the most recently used
+    cache.put('key1', 'y' * 50)  # replaced in place
+    totals, actual = _totals(cache)
+    assert totals == actual == (3, 250)
+    cache.put('key3', 'z' * 100)
+    assert cache.get('key2') is None
+    assert all(cache.get(k) is not None for k in ('key0', 'key1', 'key3'))
+    totals, actual = _totals(cache)
+    assert totals == actual == (3, 250)
+    cache.clear()
+    assert cache.stats()['entries'] == cache.stats()['bytes'] == 0
+
+def test_counters_from_many_threads(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    cache.put('hit', 'response')
+
+    def lookups():
+        for _ in range(200):
+            cache.get('hit')
+            cache.get('miss')
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1600, 1600)
@@ -0,0 +1,51 @@
+import numpy as np
+
+from result_store import MAX_POINTS, ResultStore, equity_points, trade_page
+
+def _result(n, seed=0):
+    rng = np.random.default_rng(seed)
+    times = 1_600_000_000 + 3600 * np.arange(n, dtype=np.int64)
+    equity = 10000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    trades = {'entry_time': times[:10:2], 'return': rng.normal(0, 0.02, 5)}
+    return times, equity, trades
+
+def test_equity_points_are_capped():
+    times, equity, _ = _result(3 * MAX_POINTS)
+    curve = {'time': times, 'equity': equity}
+    for method in ('lttb', 'minmax'):
+        points = equity_points(curve, 10 ** 9, method)
+        assert points['total_points'] == len(times)
+        assert len(points['time']) <= MAX_POINTS
+    assert len(equity_points(curve, 500)['time']) == 500
+    assert len(equity_points(curve, 2, 'minmax')['time']) <= 4
+
+def test_descending_trade_page_keeps_ties_in_time_order():
+    trades = {'entry_time': np.arange(6), 'return': np.array([0.1, 0.3, 0.1, 0.3, 0.2, 0.1])}
+    page = trade_page(trades, sort='return', descending=True)
+    assert [t['entry_time'] for t in page['trades']] == [1, 3, 4, 0, 2, 5]
+
+def test_eviction_keeps_the_most_recently_used_results(tmp_path):
+    times, equity, trades = _result(1000)
+    store = ResultStore(str(tmp_path / 'results.db'), max_bytes=10 ** 9)
+    first = store.save('user', times, equity, trades)
+    size = store._connect().execute('SELECT bytes FROM totals').fetchone()[0]
+    store.max_bytes = 3 * size
+    ids = [first] + [store.save('user', times, equity, trades) for _ in range(2)]
+    assert store.load('user', first) is not None  # now the most recently used
+    ids.append(store.save('user', times, equity, trades))
+    assert store.load('user', ids[1]) is None
+    assert all(store.load('user', i) is not None for i in (ids[0], ids[2], ids[3]))
+    assert store.load('other', ids[3]) is None
+    conn = store._connect()
+    assert conn.execute('SELECT bytes FROM totals').fetchone()[0] == conn.execute('SELECT SUM(size) FROM results').fetchone()[0]
+
+def test_totals_are_seeded_from_an_existing_table(tmp_path):
+    path = str(tmp_path / 'results.db')
+    times, equity, trades = _result(100)
+    store = ResultStore(path)
+    store.save('user', times, equity, trades)
+    conn = store._connect()
+    conn.executescript('DROP TRIGGER results_insert; DROP TRIGGER results_delete; DROP TABLE totals;')
+    reopened = ResultStore(path)
+    expected = conn.execute('SELECT SUM(size) FROM results').fetchone()[0]
+    assert reopened._connect().execute('SELECT bytes FROM totals').fetchone()[0] == expected
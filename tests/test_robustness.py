@@ -0,0 +1,20 @@
+import pytest
+
+import robustness
+from strategy import compile_strategy
+
+def test_walk_forward_runs_the_best_train_combination_on_each_test_window(candles, definition):
+    result = robustness.walk_forward(candles, compile_strategy(definition), 1000, 500,
+                                     ranges={'fast_period': [5, 10, 15], 'slow_period': [30, 50]})
+    assert len(result['windows']) == 4
+    for window in result['windows']:
+        assert window['params']['fast_period'] in (5, 10, 15)
+
+def test_walk_forward_refuses_oversized_work(candles, definition):
+    strategy = compile_strategy(definition)
+    with pytest.raises(ValueError, match="combinations"):
+        robustness.walk_forward(candles, strategy, 1000, 500,
+                                ranges={'fast_period': {'start': 1, 'stop': 20}, 'slow_period': {'start': 21, 'stop': 40}})
+    # 2951 single-bar test windows, each with a train and a test backtest
+    with pytest.raises(ValueError, match="backtests"):
+        robustness.walk_forward(candles, strategy, 49, 1)
@@ -0,0 +1,48 @@
+import asyncio
+
+import sse
+
+def test_encode_event_keeps_newlines():
+    assert sse.encode_event("one\ntwo") == "data: one\ndata: two\n\n"
+    assert sse.encode_event("a\r\nb\rc", 'error') == "event: error\ndata: a\ndata: b\ndata: c\n\n"
+    assert sse.encode_event("") == "data: \n\n"
+
+def test_tokens_are_coalesced_after_the_first():
+    frames = list(sse.stream_events(iter(["Hel", "", "lo", " there"]), interval=60))
+    assert frames == [sse.encode_event("Hel"), sse.encode_event("lo there"), sse.DONE_EVENT]
+    frames = list(sse.stream_events(iter(["a", "bb", "cc", "d"]), interval=60, max_bytes=4))
+    assert frames == [sse.encode_event("a"), sse.encode_event("bbcc"), sse.encode_event("d"), sse.DONE_EVENT]
+
+async def _tokens(script, closed):
+    # Yields text, or sleeps for a float
+    try:
+        for item in script:
+            if isinstance(item, float):
+                await asyncio.sleep(item)
+            else:
+                yield item
+    finally:
+        closed.append(True)
+
+def test_async_stream_flushes_when_the_interval_ends():
+    async def run():
+        closed = []
+        events = sse.astream_events(_tokens(["a", "b", "c", 0.2, "d"], closed), interval=0.05)
+        return [frame async for frame in events], closed
+
+    frames, closed = asyncio.run(run())
+    assert frames == [sse.encode_event("a"), sse.encode_event("bc"), sse.encode_event("d"), sse.DONE_EVENT]
+    assert closed == [True]
+
+def test_async_stream_closed_while_waiting_for_a_token():
+    async def run():
+        closed = []
+        events = sse.astream_events(_tokens(["a", "b", 60.0, "c"], closed), interval=0.01)
+        frames = [await anext(events), await anext(events)]
+        # Paused at the timeout flush with the next token still being awaited
+        await events.aclose()
+        return frames, closed
+
+    frames, closed = asyncio.run(run())
+    assert frames == [sse.encode_event("a"), sse.encode_event("b")]
+    assert closed == [True]
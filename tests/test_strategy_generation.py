@@ -0,0 +1,64 @@
+import json
+from types import SimpleNamespace
+
+import app
+from response_cache import ResponseCache
+from strategy_generation import SyncCompletions, generate_single_pass, iterate_sync, generate_strategy_events, run_sync
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def _chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+class Model:
+    """Answers by response format: the single pass, the JSON stage, or the summary stage."""
+
+    def __init__(self, definition, single_pass=None):
+        self.definition = definition
+        self.single_pass = single_pass
+        self.requests = []
+
+    def answer(self, kwargs):
+        self.requests.append(kwargs)
+        name = kwargs.get('response_format', {}).get('json_schema', {}).get('name')
+        if name == 'strategy_with_summary':
+            return self.single_pass or json.dumps({'strategy_summary': "Single pass summary", **self.definition})
+        if name == 'strategy_to_json':
+            return json.dumps(self.definition)
+        return "Two-stage summary"
+
+    def completions(self, tmp_path):
+        cache = ResponseCache(str(tmp_path / 'cache.db'))
+        return SyncCompletions(lambda kwargs: _completion(self.answer(kwargs)),
+                               lambda kwargs: (_chunk(c) for c in self.answer(kwargs)), cache)
+
+def test_single_pass(definition, tmp_path):
+    model = Model(definition)
+    summary, strategy_json = run_sync(generate_single_pass(model.completions(tmp_path), "chat", 'model'))
+    assert summary == "Single pass summary"
+    assert json.loads(strategy_json) == definition
+    assert len(model.requests) == 1
+
+def test_off_schema_single_pass_falls_back_to_two_stages(definition, tmp_path):
+    model = Model(definition, single_pass='{"strategy_summary": "truncated')
+    completions = model.completions(tmp_path)
+    events = list(iterate_sync(generate_strategy_events(completions, "chat", 'model')))
+    assert events[-1] == {'strategy_summary': "Two-stage summary", 'strategy_json': json.dumps(definition)}
+    assert ''.join(e.get('summary_delta', '') for e in events) == "truncated"
+    # The bad single pass isn't cached
+    assert len(model.requests) == 3
+    list(iterate_sync(generate_strategy_events(completions, "chat", 'model')))
+    assert len(model.requests) == 6
+
+def test_streamed_route_serves_the_cached_single_pass_without_deltas(definition, monkeypatch, tmp_path):
+    model = Model(definition)
+    monkeypatch.setattr(app, 'strategy_completions', model.completions(tmp_path))
+    client = app.app.test_client()
+    for expected_deltas in (True, False):
+        response = client.post('/generate_strategy', json={'chat_history': "chat", 'stream': True})
+        payloads = [json.loads(frame[len('data: '):]) for frame in response.get_data(as_text=True).split('\n\n')
+                    if frame]
+        assert any('summary_delta' in p for p in payloads) == expected_deltas
+        assert payloads[-1] == {'strategy_summary': "Single pass summary", 'strategy_json': json.dumps(definition)}
+    assert len(model.requests) == 1
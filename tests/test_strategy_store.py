@@ -0,0 +1,32 @@
+import json
+import pytest
+
+import app
+from strategy_store import StrategyStore
+
+def test_add_unique_suffixes_taken_names(tmp_path, definition):
+    store = StrategyStore(str(tmp_path / 'strategies.db'))
+    strategy = {'name': 'Crossover', 'summary': '', 'json': json.dumps(definition)}
+    assert [store.add_unique('user', strategy) for _ in range(3)] == ['Crossover', 'Crossover (1)', 'Crossover (2)']
+    assert store.add_unique('other', strategy) == 'Crossover'
+    assert [s['name'] for s in store.list('user')] == ['Crossover', 'Crossover (1)', 'Crossover (2)']
+
+@pytest.mark.parametrize('body', [
+    None, [], {'summary': 'no name', 'json': '{}'}, {'name': '  ', 'json': '{}'}, {'name': 'No json'},
+    {'name': 'Bad json', 'json': '{"truncated'}, {'name': 'Not an object', 'json': '[1, 2]'},
+    {'name': 'Bad summary', 'summary': 3, 'json': '{}'},
+])
+def test_save_strategy_rejects_malformed_bodies(monkeypatch, tmp_path, body):
+    monkeypatch.setattr(app, 'strategy_store', StrategyStore(str(tmp_path / 'strategies.db')))
+    response = app.app.test_client().post('/save_strategy', json=body)
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+    assert app.strategy_store.list('default_user') == []
+
+def test_save_strategy(monkeypatch, tmp_path, definition):
+    monkeypatch.setattr(app, 'strategy_store', StrategyStore(str(tmp_path / 'strategies.db')))
+    body = {'name': 'Crossover', 'summary': 'SMA 10/40', 'json': json.dumps(definition)}
+    response = app.app.test_client().post('/save_strategy', json=body)
+    assert response.status_code == 200
+    assert response.get_json()['name'] == 'Crossover'
+    assert app.strategy_store.list('default_user') == [body]
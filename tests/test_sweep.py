@@ -0,0 +1,40 @@
+import app
+from indicators import IndicatorCache, SeriesIndicators
+from strategy import compile_strategy
+import sweep
+
+def test_pooled_and_in_process_sweeps_agree_on_a_window(candles, definition):
+    # A window that starts mid-series; EMAs computed over the window alone are seeded differently
+    lo, hi = 800, 2600
+    window = {field: values[lo:hi] for field, values in candles.items()}
+    for condition in ('entry_condition', 'exit_condition'):
+        definition[condition]['indicator'] = 'EMA'
+    strategy = compile_strategy(definition)
+    ranges = {'fast_period': {'start': 5, 'stop': 12}, 'slow_period': {'start': 30, 'stop': 60, 'step': 10}}
+
+    def run(processes):
+        indicators = SeriesIndicators(candles, ('test',), lo, hi, cache=IndicatorCache())
+        results = sweep.run_sweep(window, strategy, ranges, processes=processes, indicators=indicators)
+        return {tuple(r['params'].values()): r['metrics'] for r in results}
+
+    in_process, pooled = run(1), run(2)
+    assert len(in_process) == 32
+    assert pooled == in_process
+
+def test_lists_are_explicit_values():
+    assert sweep.expand_range([5, 10, 20]) == [5, 10, 20]
+    assert sweep.expand_range({'start': 5, 'stop': 20, 'step': 5}) == [5, 10, 15, 20]
+    names, grid = sweep.build_grid({'fast_period': [5, 10, 20], 'slow_period': [15]})
+    assert grid == [(5, 15), (10, 15)]
+
+def test_sweep_route_checks_top_and_metric_first(monkeypatch, definition):
+    def fail(*args, **kwargs):
+        raise AssertionError("sweep started")
+
+    monkeypatch.setattr(sweep, 'run_sweep', fail)
+    monkeypatch.setattr(app.compiled_strategies, 'get', lambda user_id, name: compile_strategy(definition))
+    client = app.app.test_client()
+    ranges = {'fast_period': [5, 10, 20]}
+    for body in ({'top': "10"}, {'top': 0}, {'metric': 'profit'}):
+        response = client.post('/run_sweep', json={'name': 'SMA', 'ranges': ranges, **body})
+        assert response.status_code == 400